@@ -56,6 +56,11 @@ android {
         buildConfig = true
     }
 
+    androidResources {
+        // OverrideAsset memory-maps overrides.bin straight from the APK
+        noCompress += "bin"
+    }
+
     testOptions {
         unitTests {
             isIncludeAndroidResources = true
@@ -62,6 +62,10 @@ class JWOrgRepository(
     private fun lfbCatalog(lang: String = langCode) =
         lfbCatalogByLang.getOrPut(lang) { LfbLessonCatalog(context, apiService, lang) }
 
+    init {
+        JWOrgContentUrls.loadAsset(context)
+    }
+
     /** Active content language code derived from user preference / device locale. */
     val langCode: String get() = LanguagePreference.get(context)
 
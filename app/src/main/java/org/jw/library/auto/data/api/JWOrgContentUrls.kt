@@ -1,5 +1,6 @@
 package org.jw.library.auto.data.api
 
+import android.content.Context
 import java.time.LocalDate
 import java.time.format.DateTimeFormatter
 
@@ -10,24 +11,44 @@ object JWOrgContentUrls {
     private const val WORKBOOK_FALLBACK = "https://b.jw-cdn.org/files/media_audio/mwb/202412_mwb_E.mp3"
     private const val WATCHTOWER_FALLBACK = "https://b.jw-cdn.org/files/media_audio/w/202401_w_E.mp3"
 
+    // Binary override asset (see OverrideAsset); the maps below are the fallback when it is missing or unreadable
+    @Volatile private var asset: OverrideAsset? = null
+    @Volatile private var assetLoaded = false
+
+    /** Opens the bundled override asset once; safe to call from every repository instance. */
+    fun loadAsset(context: Context) {
+        if (assetLoaded) return
+        synchronized(this) {
+            if (!assetLoaded) {
+                asset = OverrideAsset.fromAssets(context.applicationContext)
+                assetLoaded = true
+            }
+        }
+    }
+
+    /** Replaces the override asset; null restores the generated maps. */
+    internal fun install(overrideAsset: OverrideAsset?) {
+        asset = overrideAsset
+        assetLoaded = true
+    }
+
     fun meetingWorkbookUrl(weekStart: LocalDate): String {
-        val key = weekStart.toString()
-        val override = WORKBOOK_OVERRIDES[key]
+        val override = workbookOverrideUrl(weekStart)
         if (override != null) return override
         val yearMonth = YEAR_MONTH_FORMAT.format(weekStart)
         return "https://b.jw-cdn.org/files/media_audio/mwb/${yearMonth}_mwb_E.mp3"
     }
 
     fun watchtowerStudyUrl(weekStart: LocalDate): String {
-        val key = weekStart.toString()
-        val override = WATCHTOWER_OVERRIDES[key]
-        if (override != null) return override
-        return WATCHTOWER_FALLBACK
+        return watchtowerOverrideUrl(weekStart) ?: WATCHTOWER_FALLBACK
     }
 
     /** Returns the override URL if one is present for this week, null otherwise. */
     fun watchtowerOverrideUrl(weekStart: LocalDate): String? =
-        WATCHTOWER_OVERRIDES[weekStart.toString()]
+        asset?.watchtowerUrl(weekStart) ?: WATCHTOWER_OVERRIDES[weekStart.toString()]
+
+    private fun workbookOverrideUrl(weekStart: LocalDate): String? =
+        asset?.workbookUrl(weekStart) ?: WORKBOOK_OVERRIDES[weekStart.toString()]
 
     private val WORKBOOK_OVERRIDES = mapOf(
         "2025-11-03" to "https://cfp2.jw-cdn.org/a/b5898cd/1/o/mwb_E_202511_01.mp3",
@@ -0,0 +1,186 @@
+package org.jw.library.auto.data.api
+
+import android.content.Context
+import java.io.File
+import java.io.FileNotFoundException
+import java.io.IOException
+import java.io.RandomAccessFile
+import java.nio.ByteBuffer
+import java.nio.channels.FileChannel
+import java.time.LocalDate
+
+/**
+ * Week overrides read from the binary asset written by
+ * `scripts/generate_jw_overrides.py --binary` (layout documented there).
+ *
+ * Nothing is decoded up front: the asset is memory-mapped, a lookup binary-searches
+ * the sorted epoch-day array of its table, and only the URLs it returns are decoded.
+ * Every offset and index is range-checked once when the asset is opened, so a truncated
+ * or mismatched asset is rejected there (the factories return null) instead of failing
+ * a later lookup.
+ */
+class OverrideAsset private constructor(private val buffer: ByteBuffer) {
+    private val workbookCount: Int
+    private val watchtowerCount: Int
+    private val sectionCount: Int
+    private val workbookDays: Int
+    private val workbookUrls: Int
+    private val watchtowerDays: Int
+    private val watchtowerUrls: Int
+    private val sectionDays: Int
+    private val sectionOffsets: Int
+    private val trackUrls: Int
+    private val trackDurations: Int
+    private val stringOffsets: Int
+    private val stringData: Int
+
+    init {
+        require(buffer.limit() >= HEADER_SIZE) { "Truncated override asset" }
+        require(buffer.getInt(0) == MAGIC) { "Not an override asset" }
+        require(buffer.getShort(4).toInt() == VERSION) { "Unsupported override asset version" }
+        workbookCount = buffer.getInt(8)
+        watchtowerCount = buffer.getInt(12)
+        sectionCount = buffer.getInt(16)
+        val trackCount = buffer.getInt(20)
+        val stringCount = buffer.getInt(24)
+        workbookDays = HEADER_SIZE
+        workbookUrls = workbookDays + 4 * workbookCount
+        watchtowerDays = workbookUrls + 4 * workbookCount
+        watchtowerUrls = watchtowerDays + 4 * watchtowerCount
+        sectionDays = watchtowerUrls + 4 * watchtowerCount
+        sectionOffsets = sectionDays + 4 * sectionCount
+        trackUrls = sectionOffsets + 4 * (2 * sectionCount + 1)
+        trackDurations = trackUrls + 4 * trackCount
+        stringOffsets = trackDurations + 4 * trackCount
+        require(minOf(workbookCount, watchtowerCount, sectionCount, trackCount, stringCount) >= 0) {
+            "Corrupt override asset header"
+        }
+        val tableInts = 2L * workbookCount + 2L * watchtowerCount + 3L * sectionCount + 1 +
+            2L * trackCount + stringCount + 1
+        require(HEADER_SIZE + 4 * tableInts <= buffer.limit()) { "Truncated override asset" }
+        stringData = stringOffsets + 4 * (stringCount + 1)
+
+        checkAscending(stringOffsets, stringCount + 1, buffer.limit() - stringData)
+        checkAscending(sectionOffsets, 2 * sectionCount + 1, trackCount)
+        checkIndexes(workbookUrls, workbookCount, stringCount)
+        checkIndexes(watchtowerUrls, watchtowerCount, stringCount)
+        checkIndexes(trackUrls, trackCount, stringCount)
+    }
+
+    /** Requires [count] ints at [at] to run from 0 upwards without exceeding [max]. */
+    private fun checkAscending(at: Int, count: Int, max: Int) {
+        var previous = 0
+        for (i in 0 until count) {
+            val value = buffer.getInt(at + 4 * i)
+            require(value in previous..max) { "Corrupt override asset offsets" }
+            previous = value
+        }
+    }
+
+    private fun checkIndexes(at: Int, count: Int, size: Int) {
+        for (i in 0 until count) {
+            require(buffer.getInt(at + 4 * i) in 0 until size) { "Corrupt override asset string index" }
+        }
+    }
+
+    fun workbookUrl(weekStart: LocalDate): String? {
+        val index = indexOf(workbookDays, workbookCount, weekStart)
+        return if (index < 0) null else string(buffer.getInt(workbookUrls + 4 * index))
+    }
+
+    fun watchtowerUrl(weekStart: LocalDate): String? {
+        val index = indexOf(watchtowerDays, watchtowerCount, weekStart)
+        return if (index < 0) null else string(buffer.getInt(watchtowerUrls + 4 * index))
+    }
+
+    fun bibleReadingUrls(weekStart: LocalDate): List<String> =
+        tracks(weekStart, BIBLE_READING) { string(buffer.getInt(trackUrls + 4 * it)) }
+
+    fun congregationStudyUrls(weekStart: LocalDate): List<String> =
+        tracks(weekStart, CONGREGATION_STUDY) { string(buffer.getInt(trackUrls + 4 * it)) }
+
+    /** Track durations in milliseconds, 0 where unknown. */
+    fun bibleReadingDurationsMs(weekStart: LocalDate): List<Long> =
+        tracks(weekStart, BIBLE_READING) { buffer.getInt(trackDurations + 4 * it).toLong() }
+
+    fun congregationStudyDurationsMs(weekStart: LocalDate): List<Long> =
+        tracks(weekStart, CONGREGATION_STUDY) { buffer.getInt(trackDurations + 4 * it).toLong() }
+
+    private fun indexOf(days: Int, count: Int, weekStart: LocalDate): Int {
+        val day = weekStart.toEpochDay().toInt()
+        var low = 0
+        var high = count - 1
+        while (low <= high) {
+            val mid = (low + high) ushr 1
+            val value = buffer.getInt(days + 4 * mid)
+            when {
+                value < day -> low = mid + 1
+                value > day -> high = mid - 1
+                else -> return mid
+            }
+        }
+        return -1
+    }
+
+    private fun <T> tracks(weekStart: LocalDate, part: Int, read: (Int) -> T): List<T> {
+        val week = indexOf(sectionDays, sectionCount, weekStart)
+        if (week < 0) return emptyList()
+        val start = buffer.getInt(sectionOffsets + 4 * (2 * week + part))
+        val end = buffer.getInt(sectionOffsets + 4 * (2 * week + part + 1))
+        return (start until end).map(read)
+    }
+
+    private fun string(index: Int): String {
+        val start = buffer.getInt(stringOffsets + 4 * index)
+        val end = buffer.getInt(stringOffsets + 4 * (index + 1))
+        // Absolute reads only: no shared position between threads, and no ByteBuffer.position(int),
+        // whose covariant (Java 9+) signature older Android runtimes don't have
+        val bytes = ByteArray(end - start) { buffer.get(stringData + start + it) }
+        return String(bytes, Charsets.UTF_8)
+    }
+
+    companion object {
+        const val ASSET_NAME = "overrides.bin"
+
+        private const val MAGIC = 0x4A574F56 // "JWOV"
+        private const val VERSION = 1
+        private const val HEADER_SIZE = 28
+        private const val BIBLE_READING = 0
+        private const val CONGREGATION_STUDY = 1
+
+        /**
+         * Maps the asset from the APK (stored uncompressed, see noCompress in build.gradle.kts);
+         * a compressed one is read into memory instead. Returns null if there is no asset or it
+         * cannot be read, so callers keep using the generated Kotlin maps.
+         */
+        fun fromAssets(context: Context, name: String = ASSET_NAME): OverrideAsset? = load {
+            try {
+                context.assets.openFd(name).use { fd ->
+                    fd.createInputStream().channel.use { channel ->
+                        channel.map(FileChannel.MapMode.READ_ONLY, fd.startOffset, fd.length)
+                    }
+                }
+            } catch (e: FileNotFoundException) {
+                // openFd() only works for uncompressed assets
+                context.assets.open(name).use { ByteBuffer.wrap(it.readBytes()) }
+            }
+        }
+
+        fun fromFile(file: File): OverrideAsset? = load {
+            RandomAccessFile(file, "r").use { raf ->
+                raf.channel.map(FileChannel.MapMode.READ_ONLY, 0, raf.length())
+            }
+        }
+
+        private inline fun load(read: () -> ByteBuffer): OverrideAsset? = try {
+            OverrideAsset(read())
+        } catch (e: IOException) {
+            null
+        } catch (e: IllegalArgumentException) {
+            // Bad magic or version, or a truncated/corrupt asset (see init)
+            null
+        } catch (e: IndexOutOfBoundsException) {
+            null
+        }
+    }
+}
@@ -1,10 +1,17 @@
 package org.jw.library.auto.data.api
 
+import java.io.File
 import java.time.LocalDate
+import org.junit.After
 import org.junit.Assert.assertEquals
 import org.junit.Test
 
 class JWOrgContentUrlsTest {
+    @After
+    fun restoreMaps() {
+        JWOrgContentUrls.install(null)
+    }
+
     @Test
     fun `meeting workbook url uses override when available`() {
         val novemberWeek = LocalDate.of(2025, 11, 3)
@@ -29,4 +36,27 @@ class JWOrgContentUrlsTest {
         )
     }
 
+    @Test
+    fun `override asset takes precedence and maps fill its gaps`() {
+        val fixture = File(javaClass.getResource("/override_asset.bin")!!.toURI())
+        JWOrgContentUrls.install(OverrideAsset.fromFile(fixture))
+
+        assertEquals(
+            "https://cdn.test/mwb_E_202511_01.mp3",
+            JWOrgContentUrls.meetingWorkbookUrl(LocalDate.of(2025, 11, 3))
+        )
+        assertEquals(
+            "https://cdn.test/w_E_202509_01.mp3",
+            JWOrgContentUrls.watchtowerOverrideUrl(LocalDate.of(2025, 11, 10))
+        )
+        // Weeks missing from the asset still resolve through the generated maps
+        assertEquals(
+            "https://cfp2.jw-cdn.org/a/5fc7877/1/o/mwb_E_202511_05.mp3",
+            JWOrgContentUrls.meetingWorkbookUrl(LocalDate.of(2025, 12, 1))
+        )
+        assertEquals(
+            "https://cfp2.jw-cdn.org/a/4edd2f/1/o/w_E_202509_04.mp3",
+            JWOrgContentUrls.watchtowerStudyUrl(LocalDate.of(2025, 12, 1))
+        )
+    }
 }
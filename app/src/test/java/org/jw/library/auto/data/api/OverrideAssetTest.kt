@@ -0,0 +1,87 @@
+package org.jw.library.auto.data.api
+
+import java.io.File
+import java.time.LocalDate
+import org.junit.Assert.assertEquals
+import org.junit.Assert.assertNotNull
+import org.junit.Assert.assertNull
+import org.junit.Assert.assertTrue
+import org.junit.Rule
+import org.junit.Test
+import org.junit.rules.TemporaryFolder
+
+/** Reads override_asset.bin, written by render_binary() in scripts/generate_jw_overrides.py. */
+class OverrideAssetTest {
+    @get:Rule
+    val temp = TemporaryFolder()
+
+    private val fixture = File(javaClass.getResource("/override_asset.bin")!!.toURI())
+    private val asset = OverrideAsset.fromFile(fixture)!!
+
+    @Test
+    fun `reads workbook and watchtower urls`() {
+        assertEquals(
+            "https://cdn.test/mwb_E_202511_01.mp3",
+            asset.workbookUrl(LocalDate.of(2025, 11, 3))
+        )
+        assertEquals(
+            "https://cdn.test/w_E_202509_01.mp3",
+            asset.watchtowerUrl(LocalDate.of(2025, 11, 10))
+        )
+        // Stored once, referenced from both tables
+        assertEquals(
+            asset.workbookUrl(LocalDate.of(2025, 11, 10)),
+            asset.watchtowerUrl(LocalDate.of(2025, 11, 17))
+        )
+        assertEquals(
+            "https://cdn.test/w_RO_202509_03_înțelepciune.mp3",
+            asset.watchtowerUrl(LocalDate.of(2025, 11, 24))
+        )
+    }
+
+    @Test
+    fun `reads section tracks and durations`() {
+        val week = LocalDate.of(2025, 11, 3)
+        assertEquals(
+            listOf("https://cdn.test/bi12_E_23_58.mp3", "https://cdn.test/bi12_E_23_59.mp3"),
+            asset.bibleReadingUrls(week)
+        )
+        assertEquals(listOf(301400L, 0L), asset.bibleReadingDurationsMs(week))
+        assertEquals(listOf("https://cdn.test/lfb_E_036.mp3"), asset.congregationStudyUrls(week))
+        assertEquals(listOf(0L), asset.congregationStudyDurationsMs(week))
+        assertEquals(
+            listOf("https://cdn.test/lfb_E_037.mp3"),
+            asset.congregationStudyUrls(LocalDate.of(2025, 11, 10))
+        )
+    }
+
+    @Test
+    fun `unknown weeks return null or empty lists`() {
+        val week = LocalDate.of(2025, 12, 1)
+        assertNull(asset.workbookUrl(week))
+        assertNull(asset.watchtowerUrl(LocalDate.of(2025, 11, 3)))
+        assertTrue(asset.bibleReadingUrls(week).isEmpty())
+        assertTrue(asset.congregationStudyDurationsMs(week).isEmpty())
+    }
+
+    @Test
+    fun `truncated asset is rejected`() {
+        val bytes = fixture.readBytes()
+        for (size in 0 until bytes.size) {
+            val file = temp.newFile("truncated_$size.bin")
+            file.writeBytes(bytes.copyOf(size))
+            assertNull("accepted $size of ${bytes.size} bytes", OverrideAsset.fromFile(file))
+        }
+    }
+
+    @Test
+    fun `other version or missing file is rejected`() {
+        val bytes = fixture.readBytes()
+        bytes[5] = 2
+        val file = temp.newFile("v2.bin")
+        file.writeBytes(bytes)
+        assertNull(OverrideAsset.fromFile(file))
+        assertNull(OverrideAsset.fromFile(File(temp.root, "missing.bin")))
+        assertNotNull(OverrideAsset.fromFile(fixture))
+    }
+}
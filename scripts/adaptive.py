@@ -0,0 +1,225 @@
+"""
+Adaptive per-host concurrency (AIMD) for bulk fetches
+Each host gets a controller holding a concurrency limit. The limit starts
+small and, in slow start, doubles every round trip (one slot per successful
+request) up to the host's connection cap: a short run still reaches full
+parallelism within a few round trips, without opening at the level most
+likely to be rate limited. The first 429/5xx response, connection error or
+latency spike ends slow start; from then on the limit is cut multiplicatively
+on those signals and grows back by about one slot per window of successful
+requests while latency stays near its baseline. Callers' --concurrency still
+caps the worker threads. The transport reports every request's latency and
+outcome (http_transport.request); bulk loops run through map_ordered(), which
+keeps the number of in-flight tasks per host within the current limit.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 6
+INITIAL_LIMIT = 2           # a new host's limit; slow start doubles it each round trip until congestion
+DECREASE_FACTOR = 0.5       # on 429/5xx/connection errors
+SPIKE_DECREASE_FACTOR = 0.75  # on a latency spike
+SPIKE_RATIO = 2.5           # latency above this multiple of the baseline p95 is a spike
+MIN_SAMPLES = 8             # samples needed before latency spikes are judged
+WINDOW = 64                 # latencies kept for percentiles
+
+# host -> maximum limit; http_transport points this at its per-host connection caps
+_max_limit_for = None
+
+
+def set_max_limit_source(func):
+    """Use func(host) as the upper bound for each host's limit"""
+    global _max_limit_for
+    _max_limit_for = func
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit on in-flight tasks for one host, after a slow start"""
+
+    def __init__(self, host, initial=INITIAL_LIMIT, minimum=MIN_LIMIT, maximum=DEFAULT_MAX_LIMIT):
+        self.host = host
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.slow_start = True
+        self.in_flight = 0
+        self.latencies = deque(maxlen=WINDOW)
+        self.baseline_p95 = None
+        self.increases = 0
+        self.decreases = 0
+        self.errors = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    # Gating
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    # Feedback
+
+    def observe(self, latency, status=None, error=False):
+        """Record one request: its latency in seconds and HTTP status, or error=True"""
+        with self._cond:
+            self.latencies.append(latency)
+            if error or status == 429 or (status is not None and status >= 500):
+                self.errors += 1
+                self._decrease(DECREASE_FACTOR)
+            elif self._is_spike(latency):
+                self._decrease(SPIKE_DECREASE_FACTOR)
+            else:
+                self._increase()
+            self._cond.notify_all()
+
+    def _is_spike(self, latency):
+        if len(self.latencies) < MIN_SAMPLES:
+            return False
+        p95 = percentile(self.latencies, 0.95)
+        if self.baseline_p95 is None:
+            self.baseline_p95 = p95
+        # The baseline follows p95 slowly, so a sustained shift becomes the new normal
+        self.baseline_p95 = 0.9 * self.baseline_p95 + 0.1 * p95
+        return latency > SPIKE_RATIO * self.baseline_p95
+
+    def _increase(self):
+        before = int(self.limit)
+        # Slow start: +1 per success doubles the limit every round trip;
+        # then +1/limit per success: about one extra slot per window of `limit` requests
+        step = 1.0 if self.slow_start else 1.0 / self.limit
+        self.limit = min(self.maximum, self.limit + step)
+        if int(self.limit) > before:
+            self.increases += 1
+
+    def _decrease(self, factor):
+        self.slow_start = False
+        now = time.monotonic()
+        # Requests already in flight when the limit was cut report the same
+        # congestion; only cut once per recent round trip
+        p50 = percentile(self.latencies, 0.5) or 0.0
+        if now - self._last_decrease < max(0.05, p50):
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * factor)
+        self.decreases += 1
+
+    def metrics(self):
+        with self._cond:
+            samples = list(self.latencies)
+            return {
+                'host': self.host,
+                'limit': int(self.limit),
+                'max_limit': self.maximum,
+                'slow_start': self.slow_start,
+                'in_flight': self.in_flight,
+                'samples': len(samples),
+                'p50_ms': round(percentile(samples, 0.5) * 1000, 1) if samples else None,
+                'p95_ms': round(percentile(samples, 0.95) * 1000, 1) if samples else None,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'errors': self.errors,
+            }
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def controller_for(host):
+    with _controllers_lock:
+        controller = _controllers.get(host)
+        if controller is None:
+            maximum = _max_limit_for(host) if _max_limit_for else DEFAULT_MAX_LIMIT
+            controller = _controllers[host] = AIMDController(host, maximum=maximum)
+        return controller
+
+
+def observe(host, latency, status=None, error=False):
+    controller_for(host).observe(latency, status, error)
+
+
+def metrics():
+    """Current limit and latency percentiles for every host seen so far"""
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return [controller.metrics() for controller in controllers]
+
+
+def report():
+    for row in metrics():
+        print(f"  {row['host']:<24} limit {row['limit']}/{row['max_limit']}  "
+              f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  "
+              f"(+{row['increases']} / -{row['decreases']}, {row['errors']} errors)")
+
+
+def host_of(url):
+    return urlsplit(url).hostname
+
+
+def _limited(func, host):
+    """func wrapped to run within its item's host limit; host is a hostname or a function of the item"""
+    host_for = host if callable(host) else (lambda _item: host)
+
+    def run(item):
+        controller = controller_for(host_for(item))
+        controller.acquire()
+        try:
+            return func(item)
+        finally:
+            controller.release()
+    return run
+
+
+def map_ordered(func, items, host, max_workers=DEFAULT_MAX_LIMIT):
+    """Run func over items with per-host adaptive concurrency; results come back in item order
+
+    host is a hostname, or a function returning the hostname for an item.
+    max_workers caps the threads; the host controller decides how many run at once.
+    """
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        return list(executor.map(_limited(func, host), items))
+
+
+def map_completed(func, items, host, max_workers=DEFAULT_MAX_LIMIT):
+    """Like map_ordered, but yield (index, result) pairs as soon as each item finishes"""
+    items = list(items)
+    if not items:
+        return
+    run = _limited(func, host)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        futures = {executor.submit(run, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def in_order(pairs):
+    """Reorder buffer: yield (index, result) pairs by index, each as soon as all earlier ones have arrived"""
+    waiting = {}
+    next_index = 0
+    for index, result in pairs:
+        waiting[index] = result
+        while next_index in waiting:
+            yield next_index, waiting.pop(next_index)
+            next_index += 1
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the data scripts
+Starts fake_jw_server.py in-process, points the scripts at it and at a scratch
+data/cache directory, runs each one as a subprocess and records wall time,
+requests served, bytes sent and peak RSS. Results are saved as JSON so runs
+can be compared with --compare.
+
+Peak RSS is measured inside each child (VmHWM at exit, through a small
+wrapper), not from wait4's ru_maxrss: a forked child keeps the high-water
+mark of the process that forked it, so that figure included the harness.
+
+--sweep-langs also runs `jwauto.py pipeline` once for each leading subset
+of --langs (E, then E,F, then E,F,M, ...), each from cold caches, to show
+how the pipeline scales with the number of languages.
+
+The first round runs against empty caches; later rounds (--repeat) measure
+warm caches. Each script's pub-media lookup latencies (p50/p95/p99) are
+recorded too; --hedge both runs everything with and without hedged requests
+(each against its own cold caches) and reports the tail latency of each.
+
+Usage:
+  python3 scripts/bench_pipeline.py
+  python3 scripts/bench_pipeline.py --weeks 18 --latency-ms 40 --jitter-ms 80 --error-rate 0.02
+  python3 scripts/bench_pipeline.py --repeat 2 --compare .cache/bench/previous.json
+  python3 scripts/bench_pipeline.py --slow-rate 0.04 --slow-ms 1500 --hedge both
+  python3 scripts/bench_pipeline.py --langs E,F,M,S --sweep-langs --scripts ''
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from fake_jw_server import FakeJWServer, add_months, scenario_arguments, scenario_from_args
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+ROOT = SCRIPTS_DIR.parent
+RESULTS_DIR = ROOT / '.cache' / 'bench'
+SCRIPTS = ['update_meeting_workbook', 'update_watchtower_study', 'generate_subsections_csv',
+           'extract_jw_audio', 'generate_jw_overrides']
+METRICS = ['wall_s', 'requests', 'bytes', 'peak_rss_mb', 'p95_ms', 'p99_ms']
+VARIANTS = {'off': ['baseline'], 'on': ['hedged'], 'both': ['baseline', 'hedged']}
+
+# Settings that would make a run read or write outside the scratch directory
+ISOLATED_ENV = ['JW_AUTO_CATALOG', 'JW_AUTO_CACHE_DIR', 'JW_AUTO_NO_CACHE', 'JW_AUTO_HEDGE',
+                'JW_AUTO_LATENCY_LOG']
+
+
+def workbook_issues(today, count=2):
+    """The next `count` bimonthly workbook issue codes from today"""
+    year, month = today.year, today.month - (today.month + 1) % 2
+    issues = []
+    for _ in range(count):
+        issues.append(f"{year}{month:02}")
+        year, month = add_months(year, month, 2)
+    return issues
+
+
+# Runs a script (argv[2:]) and at exit writes its peak RSS in kB to the file argv[1].
+# VmHWM belongs to the process's own address space, which exec replaces; ru_maxrss
+# keeps the high-water mark inherited from the parent that forked the child.
+PEAK_RSS_WRAPPER = """
+import atexit, os, runpy, sys
+
+def report(path=sys.argv[1]):
+    try:
+        with open('/proc/self/status') as status:
+            peak = next(line.split()[1] for line in status if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):  # No procfs (macOS): ru_maxrss is the best there is
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == 'darwin' else 1)
+    with open(path, 'w') as out:
+        out.write(str(peak))
+
+atexit.register(report)
+sys.argv = sys.argv[2:]
+sys.path[0] = os.path.dirname(os.path.abspath(sys.argv[0]))
+runpy.run_path(sys.argv[0], run_name='__main__')
+"""
+
+
+def script_commands(server, workdir):
+    download = (f"{server.origin}/download/?issue={{}}&output=html&pub=mwb&fileformat=MP3%2CAAC"
+                "&alllangs=0&langwritten=E&txtCMSLang=E&isBible=0")
+    extra = {
+        'extract_jw_audio': [download.format(issue) for issue in workbook_issues(date.today())],
+        'generate_jw_overrides': ['--write', str(workdir / 'overrides.kt')],
+    }
+    return {name: [str(SCRIPTS_DIR / f"{name}.py"), *extra.get(name, [])] for name in SCRIPTS}
+
+
+def pipeline_command(workdir, langs):
+    return [str(SCRIPTS_DIR / 'jwauto.py'), 'pipeline', '--langs', ','.join(langs),
+            '--overrides-out', str(workdir / 'overrides.kt')]
+
+
+def peak_rss_mb(path):
+    """Peak RSS the wrapper recorded (kB in the file), or None if the script didn't exit normally"""
+    try:
+        return round(int(path.read_text(encoding='utf-8')) / 1024, 1)
+    except (OSError, ValueError):
+        return None
+
+
+def latency_summary(path):
+    """Lookup latency percentiles (ms) and hedge counts from a JW_AUTO_LATENCY_LOG file"""
+    try:
+        records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines() if line]
+    except OSError:
+        records = []
+    latencies = sorted(record['latency'] * 1000 for record in records)
+
+    def pick(fraction):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 1)
+
+    return {
+        'lookups': len(records),
+        'p50_ms': pick(0.5),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+        'max_ms': round(latencies[-1], 1) if latencies else None,
+        'hedges': sum(1 for record in records if record['hedged']),
+        'hedges_won': sum(1 for record in records if record['hedge_won']),
+    }
+
+
+def run_script(name, command, env, server, log_path):
+    server.reset()
+    latency_log = log_path.with_suffix('.latency.jsonl')
+    rss_path = log_path.with_suffix('.rss')
+    env = dict(env, JW_AUTO_LATENCY_LOG=str(latency_log))
+    with open(log_path, 'wb') as log:
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, '-c', PEAK_RSS_WRAPPER, str(rss_path), *command],
+                                 env=env, cwd=str(ROOT), stdout=log, stderr=subprocess.STDOUT)
+        wall = time.perf_counter() - start
+    stats = server.snapshot()
+    return {
+        'script': name,
+        'exit_code': process.returncode,
+        'wall_s': round(wall, 3),
+        'requests': stats['requests'],
+        'bytes': stats['bytes'],
+        'errors_injected': stats['errors_injected'],
+        'not_found': stats['not_found'],
+        'peak_rss_mb': peak_rss_mb(rss_path),
+        **latency_summary(latency_log),
+    }
+
+
+def _ms(value):
+    return f"{value:.0f}" if value is not None else '-'
+
+
+def _mb(value):
+    return f"{value:.1f}" if value is not None else '-'
+
+
+def print_table(results):
+    print(f"\n{'script':<26} {'variant':<9} {'round':>5} {'wall s':>8} {'requests':>9} {'bytes':>11} "
+          f"{'RSS MB':>7} {'p95 ms':>7} {'p99 ms':>7}  exit")
+    for row in results:
+        print(f"{row['script']:<26} {row['variant']:<9} {row['round']:>5} {row['wall_s']:>8.2f} "
+              f"{row['requests']:>9} {row['bytes']:>11} {_mb(row['peak_rss_mb']):>7} "
+              f"{_ms(row['p95_ms']):>7} {_ms(row['p99_ms']):>7}  {row['exit_code']}")
+
+
+def print_tail_latency(results):
+    """Lookup tail latency without vs with hedging, per script and round"""
+    by_key = {(row['script'], row['round'], row['variant']): row for row in results}
+    print(f"\nTail latency of pub-media lookups (ms): baseline -> hedged")
+    print(f"{'script':<26} {'round':>5} {'p50':>13} {'p95':>13} {'p99':>13} {'max':>13} {'hedges won':>11}")
+    for (script, round_number, variant), hedged in by_key.items():
+        baseline = by_key.get((script, round_number, 'baseline'))
+        if variant != 'hedged' or baseline is None or not hedged['lookups']:
+            continue
+        cells = [f"{_ms(baseline[key]):>6}->{_ms(hedged[key]):<6}" for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')]
+        print(f"{script:<26} {round_number:>5} {' '.join(cells)} {hedged['hedges_won']:>4}/{hedged['hedges']:<6}")
+
+
+def print_comparison(results, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+    previous = {(row['script'], row.get('variant', 'baseline'), row['round']): row for row in baseline['results']}
+    print(f"\nChange vs {baseline_path}")
+    print(f"{'script':<26} {'variant':<9} {'round':>5} " + ' '.join(f"{metric:>12}" for metric in METRICS))
+    for row in results:
+        old = previous.get((row['script'], row['variant'], row['round']))
+        if old is None:
+            continue
+        cells = []
+        for metric in METRICS:
+            if old.get(metric) is None or row.get(metric) is None:
+                cells.append(f"{'-':>12}")
+            elif old[metric]:
+                cells.append(f"{(row[metric] - old[metric]) / old[metric]:>+12.1%}")
+            else:
+                cells.append(f"{row[metric] - old[metric]:>+12}")
+        print(f"{row['script']:<26} {row['variant']:<9} {row['round']:>5} " + ' '.join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data scripts against a local fake jw.org")
+    scenario_arguments(parser)
+    parser.add_argument("--hedge", choices=sorted(VARIANTS), default="off",
+                        help="Run with hedged pub-media lookups off, on, or both (to compare tail latency)")
+    parser.add_argument("--repeat", type=int, default=1, help="Rounds to run; caches stay warm after the first")
+    parser.add_argument("--scripts", default=','.join(SCRIPTS), help="Comma-separated subset of scripts to run")
+    parser.add_argument("--sweep-langs", action="store_true",
+                        help="Also run jwauto.py pipeline for each leading subset of --langs (E; E,F; ...)")
+    parser.add_argument("--output", help="Results JSON path (default .cache/bench/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="Earlier results file to compare against")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory (logs, CSVs, caches)")
+    args = parser.parse_args(argv)
+
+    selected = [name for name in args.scripts.split(',') if name]
+    unknown = sorted(set(selected) - set(SCRIPTS))
+    if unknown:
+        parser.error(f"unknown script(s): {', '.join(unknown)}")
+
+    server = FakeJWServer(scenario_from_args(args))
+    server.start()
+    results = []
+    tmp = tempfile.mkdtemp(prefix='jwauto-bench-')
+    try:
+        base_env = {key: value for key, value in os.environ.items() if key not in ISOLATED_ENV}
+        base_env.update({
+            'JW_AUTO_PUB_MEDIA_URL': server.pub_media_url,
+            'JW_AUTO_JW_ORG_URL': server.origin,
+            'PYTHONDONTWRITEBYTECODE': '1',
+        })
+        print(f"Fake server at {server.origin}; scratch directory {tmp}")
+
+        for variant in VARIANTS[args.hedge]:
+            # Each variant starts from empty data and caches of its own
+            workdir = Path(tmp) / variant
+            (workdir / 'data').mkdir(parents=True)
+            env = dict(base_env, JW_AUTO_DATA_DIR=str(workdir / 'data'), JW_AUTO_CACHE_ROOT=str(workdir / 'cache'))
+            if variant == 'hedged':
+                env['JW_AUTO_HEDGE'] = '1'
+            commands = script_commands(server, workdir)
+            runs = [(name, commands[name], workdir, env) for name in selected]
+            if args.sweep_langs:
+                langs = server.scenario.langs
+                for count in range(1, len(langs) + 1):
+                    # Every language count starts from cold caches too
+                    sweep_dir = workdir / f"langs-{count}"
+                    (sweep_dir / 'data').mkdir(parents=True)
+                    sweep_env = dict(env, JW_AUTO_DATA_DIR=str(sweep_dir / 'data'),
+                                     JW_AUTO_CACHE_ROOT=str(sweep_dir / 'cache'))
+                    runs.append((f"pipeline:{','.join(langs[:count])}", pipeline_command(sweep_dir, langs[:count]),
+                                 sweep_dir, sweep_env))
+
+            for round_number in range(1, args.repeat + 1):
+                for name, command, run_dir, run_env in runs:
+                    log_path = run_dir / f"{name.replace(':', '-').replace(',', '')}.{round_number}.log"
+                    row = run_script(name, command, run_env, server, log_path)
+                    row.update(variant=variant, round=round_number)
+                    results.append(row)
+                    print(f"  {variant} round {round_number} {name}: {row['wall_s']:.2f}s, "
+                          f"{row['requests']} requests, exit {row['exit_code']}")
+                    if row['exit_code'] != 0:
+                        tail = log_path.read_text(encoding='utf-8', errors='replace').strip().splitlines()[-3:]
+                        for line in tail:
+                            print(f"    | {line}")
+    finally:
+        server.shutdown()
+        server.server_close()
+        if args.keep:
+            print(f"Scratch directory kept at {tmp}")
+        else:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    print_table(results)
+    if args.hedge == 'both':
+        print_tail_latency(results)
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenario': server.scenario.to_json(),
+        'repeat': args.repeat,
+        'hedge': args.hedge,
+        'results': results,
+    }, indent=2) + '\n', encoding='utf-8')
+    print(f"\n✓ Results saved to {output}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+    return 1 if any(row['exit_code'] != 0 for row in results) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
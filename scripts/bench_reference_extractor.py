@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: single-pass reference extractor vs. the legacy regex scans
+Builds large synthetic week pages (Title Case navigation, scripture citations
+that aren't book names, tag soup) and times both approaches on them.
+
+Usage:
+  python3 scripts/bench_reference_extractor.py
+  python3 scripts/bench_reference_extractor.py --sizes 100000,1000000 --repeat 5
+"""
+
+import argparse
+import random
+import re
+import timeit
+
+from bible_books import BIBLE_BOOKS
+from reference_extractor import extract_references
+
+LEGACY_BOOK_PATTERN = r'((?:[12] )?[A-Z][a-z]+(?: [A-Z][a-z]+)*)\s+(\d+)(?::(\d+))?(?:[–-](\d+))?(?::(\d+))?'
+LEGACY_LESSON_PATTERN = r'lfb[^<]*?lesson[s]?\s+(\d+)(?:\s*[,\-]\s*(?:and\s+)?(?:lesson\s+)?(\d+))?'
+
+FILLER_WORDS = ["Meeting", "Schedule", "Living", "As", "Christians", "Treasures", "From", "God's",
+                "Word", "Apply", "Yourself", "To", "The", "Field", "Ministry", "Song", "Prayer",
+                "Watchtower", "Library", "Publications", "Chapter", "Part", "Week", "Study"]
+
+
+def legacy_extract(html):
+    """The pre-extractor approach: two full findall scans of the raw HTML"""
+    bible = None
+    for match in re.findall(LEGACY_BOOK_PATTERN, html):
+        book = match[0].strip()
+        if book in BIBLE_BOOKS:
+            start_ch = int(match[1])
+            end_ch = int(match[3]) if match[3] else start_ch
+            bible = (book, list(range(start_ch, end_ch + 1)))
+            break
+
+    lessons = []
+    for match in re.findall(LEGACY_LESSON_PATTERN, html, re.IGNORECASE):
+        lesson1 = int(match[0])
+        lessons.append(lesson1)
+        if match[1]:
+            lesson2 = int(match[1])
+            if lesson2 > lesson1:
+                lessons.extend(l for l in range(lesson1 + 1, lesson2 + 1) if l not in lessons)
+            elif lesson2 not in lessons:
+                lessons.append(lesson2)
+    return bible, lessons
+
+
+def synthetic_page(size, seed=1, position=0.5):
+    """A page of about `size` characters with the references placed at `position`"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    inserted = False
+    while length < size:
+        if not inserted and length >= size * position:
+            parts.append('<h3 class="du-color--gold">Bible Reading</h3>'
+                         '<p><a href="/bible/isa/">Isaiah 6:1–7:13</a></p>'
+                         '<p>Congregation Bible Study (30 min.) lfb lessons 36-37</p>')
+            inserted = True
+        words = ' '.join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(3, 12)))
+        chunk = f'<div class="item" data-pid="{rng.randint(1, 999)}"><span>{words} {rng.randint(1, 150)}</span></div>\n'
+        parts.append(chunk)
+        length += len(chunk)
+    return ''.join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the week page reference extractor")
+    parser.add_argument("--sizes", default="50000,250000,1000000", help="Comma-separated page sizes in characters")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    args = parser.parse_args(argv)
+
+    print(f"{'page size':>10} {'refs at':>8} {'legacy ms':>10} {'single-pass ms':>15} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        for position in (0.1, 0.5, 0.9):
+            html = synthetic_page(size, position=position)
+            bible, lessons = extract_references(html)
+            legacy_bible, legacy_lessons = legacy_extract(html)
+            assert lessons and (bible.book, bible.chapters) == legacy_bible and lessons == legacy_lessons
+
+            legacy = min(timeit.repeat(lambda: legacy_extract(html), number=1, repeat=args.repeat))
+            single = min(timeit.repeat(lambda: extract_references(html), number=1, repeat=args.repeat))
+            print(f"{size:>10} {position:>8.0%} {legacy * 1000:>10.2f} {single * 1000:>15.2f} {legacy / single:>7.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
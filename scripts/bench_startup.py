@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for extract_jw_audio.py
+Runs the script as a fresh interpreter for each case (--help, a usage error,
+a download page read through the __NEXT_DATA__ fast path, and a week page
+read by the full HTML parse) against fake_jw_server.py, and reports the
+median and best wall time plus the number of modules imported. --script
+times another copy of the script (e.g. one saved from an older commit) so
+the two can be compared on the same machine.
+
+Usage:
+  python3 scripts/bench_startup.py
+  git show HEAD~1:scripts/extract_jw_audio.py > /tmp/extract_old.py
+  python3 scripts/bench_startup.py --script /tmp/extract_old.py --script scripts/extract_jw_audio.py
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from fake_jw_server import WEEK_PAGE_PREFIX, FakeJWServer, Scenario
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DEFAULT_SCRIPT = SCRIPTS_DIR / 'extract_jw_audio.py'
+
+
+def cases(server):
+    download = (f"{server.origin}/download/?issue=202511&output=html&pub=mwb&fileformat=MP3%2CAAC"
+                "&alllangs=0&langwritten=E&txtCMSLang=E&isBible=0")
+    week = (f"{server.origin}{WEEK_PAGE_PREFIX}november-december-2025-mwb/"
+            "Life-and-Ministry-Meeting-Schedule-for-November-3-9-2025/")
+    return {
+        'help': ['--help'],
+        'usage error': [],
+        'download page': [download],
+        'week page': [week],
+    }
+
+
+def run_once(script, args, env):
+    """(wall seconds, exit code, modules imported) for one cold run"""
+    command = [sys.executable, '-X', 'importtime', str(script), *args]
+    start = time.perf_counter()
+    process = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False)
+    wall = time.perf_counter() - start
+    imports = sum(1 for line in process.stderr.decode('utf-8', 'replace').splitlines()
+                  if line.startswith('import time:') and not line.rstrip().endswith('imported package'))
+    return wall, process.returncode, imports - 1  # Minus the header line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extract_jw_audio.py start-up")
+    parser.add_argument("--script", action="append", type=Path,
+                        help="Copy of the script to time; may be repeated (default: scripts/extract_jw_audio.py)")
+    parser.add_argument("--repeat", type=int, default=10, help="Cold runs per case (median and best are reported)")
+    args = parser.parse_args(argv)
+
+    server = FakeJWServer(Scenario())
+    server.start()
+    env = dict(os.environ, JW_AUTO_JW_ORG_URL=server.origin, JW_AUTO_PUB_MEDIA_URL=server.pub_media_url,
+               JW_AUTO_NO_CACHE='1', PYTHONPATH=str(SCRIPTS_DIR), PYTHONDONTWRITEBYTECODE='1')
+    try:
+        print(f"{'script':<32} {'case':<14} {'median ms':>10} {'best ms':>8} {'modules':>8}  exit")
+        for script in args.script or [DEFAULT_SCRIPT]:
+            for name, case_args in cases(server).items():
+                runs = [run_once(script, case_args, env) for _ in range(args.repeat)]
+                walls = [wall for wall, _, _ in runs]
+                _, code, imports = runs[-1]
+                print(f"{script.name:<32} {name:<14} {statistics.median(walls) * 1000:>10.1f} "
+                      f"{min(walls) * 1000:>8.1f} {imports:>8}  {code}")
+    finally:
+        server.shutdown()
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
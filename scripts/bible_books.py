@@ -0,0 +1,34 @@
+"""
+Bible book names, numbers and chapter counts
+Shared by every script that resolves Bible readings to bi12 audio
+"""
+
+# Format: "Book": (book_number, chapter_count)
+BOOKS = {
+    'Genesis': (1, 50), 'Exodus': (2, 40), 'Leviticus': (3, 27), 'Numbers': (4, 36),
+    'Deuteronomy': (5, 34), 'Joshua': (6, 24), 'Judges': (7, 21), 'Ruth': (8, 4),
+    '1 Samuel': (9, 31), '2 Samuel': (10, 24), '1 Kings': (11, 22), '2 Kings': (12, 25),
+    '1 Chronicles': (13, 29), '2 Chronicles': (14, 36), 'Ezra': (15, 10), 'Nehemiah': (16, 13),
+    'Esther': (17, 10), 'Job': (18, 42), 'Psalms': (19, 150), 'Proverbs': (20, 31),
+    'Ecclesiastes': (21, 12), 'Song of Solomon': (22, 8), 'Isaiah': (23, 66), 'Jeremiah': (24, 52),
+    'Lamentations': (25, 5), 'Ezekiel': (26, 48), 'Daniel': (27, 12), 'Hosea': (28, 14),
+    'Joel': (29, 3), 'Amos': (30, 9), 'Obadiah': (31, 1), 'Jonah': (32, 4),
+    'Micah': (33, 7), 'Nahum': (34, 3), 'Habakkuk': (35, 3), 'Zephaniah': (36, 3),
+    'Haggai': (37, 2), 'Zechariah': (38, 14), 'Malachi': (39, 4), 'Matthew': (40, 28),
+    'Mark': (41, 16), 'Luke': (42, 24), 'John': (43, 21), 'Acts': (44, 28),
+    'Romans': (45, 16), '1 Corinthians': (46, 16), '2 Corinthians': (47, 13), 'Galatians': (48, 6),
+    'Ephesians': (49, 6), 'Philippians': (50, 4), 'Colossians': (51, 4), '1 Thessalonians': (52, 5),
+    '2 Thessalonians': (53, 3), '1 Timothy': (54, 6), '2 Timothy': (55, 4), 'Titus': (56, 3),
+    'Philemon': (57, 1), 'Hebrews': (58, 13), 'James': (59, 5), '1 Peter': (60, 5),
+    '2 Peter': (61, 3), '1 John': (62, 5), '2 John': (63, 1), '3 John': (64, 1),
+    'Jude': (65, 1), 'Revelation': (66, 22),
+}
+
+# Bible book name to number mapping
+BIBLE_BOOKS = {name: number for name, (number, _) in BOOKS.items()}
+
+# Book number to name / chapter count
+BOOK_NAMES = {number: name for name, (number, _) in BOOKS.items()}
+CHAPTER_COUNTS = {number: chapters for number, chapters in BOOKS.values()}
+
+TOTAL_CHAPTERS = sum(CHAPTER_COUNTS.values())  # 1,189
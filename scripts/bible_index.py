@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Whole-Bible chapter index for bi12 audio
+Prefetches every book of the bi12 catalog in parallel and stores a compact
+(book, chapter) -> URL/size/duration index on disk, so resolving a weekly
+Bible reading is a dictionary lookup instead of an HTTP request.
+
+Usage:
+  python3 scripts/bible_index.py            # build the index if missing or incomplete
+  python3 scripts/bible_index.py --rebuild  # refetch every book
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from collections import namedtuple
+from urllib.parse import urlencode
+
+import adaptive
+import config
+import http_cache
+from bible_books import BOOK_NAMES, CHAPTER_COUNTS, TOTAL_CHAPTERS
+
+INDEX_DIR = config.CACHE_ROOT / "bible"
+INDEX_VERSION = 1
+BASE_URL = config.PUB_MEDIA_URL
+DEFAULT_CONCURRENCY = 8
+
+ChapterMedia = namedtuple('ChapterMedia', ['url', 'filesize', 'duration'])
+
+_TRAILING_NUMBER = re.compile(r'(\d+)\s*$')
+_URL_CHAPTER = re.compile(r'_(\d+)\.mp3$', re.IGNORECASE)
+
+
+def index_path(lang='E'):
+    return INDEX_DIR / f"bi12_{lang}.v{INDEX_VERSION}.json"
+
+
+def chapter_number(item):
+    """Work out the chapter an item belongs to (track, then title, then URL)"""
+    track = item.get('track')
+    if isinstance(track, int) and track > 0:
+        return track
+    match = _TRAILING_NUMBER.search(item.get('title', ''))
+    if match:
+        return int(match.group(1))
+    match = _URL_CHAPTER.search(item.get('file', {}).get('url', ''))
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def fetch_book(book_num, lang='E'):
+    """Fetch one book of the bi12 catalog and return {chapter: ChapterMedia}"""
+    params = {
+        'pub': 'bi12',
+        'fileformat': 'MP3',
+        'booknum': str(book_num),
+        'output': 'json',
+        'langwritten': lang
+    }
+
+    url = f"{BASE_URL}?{urlencode(params)}"
+    data = http_cache.fetch_json(url, timeout=15)
+
+    chapters = {}
+    if data and 'files' in data:
+        for lang_data in data['files'].values():
+            for item in lang_data.get('MP3', []):
+                mp3_url = item.get('file', {}).get('url', '')
+                chapter = chapter_number(item)
+                if not mp3_url or chapter is None or chapter > CHAPTER_COUNTS[book_num]:
+                    continue
+                # Keep the first file per chapter, as the per-book fetchers did
+                chapters.setdefault(chapter, ChapterMedia(
+                    mp3_url, item.get('filesize'), item.get('duration')))
+    return chapters
+
+
+class BibleIndex:
+    """In-memory (book, chapter) -> ChapterMedia lookup"""
+
+    def __init__(self, lang='E', books=None):
+        self.lang = lang
+        self.books = books or {}
+
+    def __len__(self):
+        return sum(len(chapters) for chapters in self.books.values())
+
+    def lookup(self, book_num, chapter):
+        """Return ChapterMedia for a chapter, or None if it isn't indexed"""
+        return self.books.get(book_num, {}).get(chapter)
+
+    def chapter_urls(self, book_num):
+        """Return {chapter: url} for a book"""
+        return {chapter: media.url for chapter, media in self.books.get(book_num, {}).items()}
+
+    def missing_books(self):
+        return [num for num in CHAPTER_COUNTS if not self.books.get(num)]
+
+    def to_json(self):
+        return {
+            'version': INDEX_VERSION,
+            'lang': self.lang,
+            'built_at': int(time.time()),
+            'books': {
+                str(book): {str(ch): list(media) for ch, media in sorted(chapters.items())}
+                for book, chapters in sorted(self.books.items())
+            },
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        books = {
+            int(book): {int(ch): ChapterMedia(*media) for ch, media in chapters.items()}
+            for book, chapters in data.get('books', {}).items()
+        }
+        return cls(data.get('lang', 'E'), books)
+
+    def save(self, path=None):
+        path = path or index_path(self.lang)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.to_json(), separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, path)
+
+
+def prefetch(index, book_nums, concurrency=DEFAULT_CONCURRENCY):
+    """Fetch the given books in parallel into index; failed books are left out"""
+    def fetch(book_num):
+        try:
+            return book_num, fetch_book(book_num, index.lang)
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"  Error fetching Bible book {book_num}: {e}")
+            return book_num, {}
+
+    for book_num, chapters in adaptive.map_ordered(fetch, book_nums, adaptive.host_of(BASE_URL), concurrency):
+        if chapters:
+            index.books[book_num] = chapters
+    return index
+
+
+def load_index(lang='E', rebuild=False, concurrency=DEFAULT_CONCURRENCY):
+    """Load the stored index, fetching any books that are missing from it"""
+    path = index_path(lang)
+    index = BibleIndex(lang)
+    if not rebuild and path.exists():
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+            if data.get('version') == INDEX_VERSION:
+                index = BibleIndex.from_json(data)
+        except ValueError:
+            pass  # Corrupt index; rebuild below
+
+    missing = index.missing_books()
+    if missing:
+        print(f"Prefetching {len(missing)} Bible book(s) into the chapter index...")
+        prefetch(index, missing, concurrency)
+        index.save(path)
+    return index
+
+
+_loaded = {}
+
+
+def get_index(lang='E'):
+    """Return the process-wide index for a language, loading it on first use"""
+    if lang not in _loaded:
+        _loaded[lang] = load_index(lang)
+    return _loaded[lang]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the whole-Bible bi12 chapter index")
+    parser.add_argument("--lang", default="E", help="Language code (langwritten), default E")
+    parser.add_argument("--rebuild", action="store_true", help="Refetch every book")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Books fetched in parallel")
+    args = parser.parse_args(argv)
+
+    index = load_index(args.lang, rebuild=args.rebuild, concurrency=args.concurrency)
+    missing = index.missing_books()
+    books = len(CHAPTER_COUNTS)
+    print(f"✓ Indexed {len(index)}/{TOTAL_CHAPTERS} chapters across {books - len(missing)}/{books} books")
+    print(f"✓ Index file: {index_path(args.lang)}")
+    if missing:
+        print(f"✗ Missing books: {', '.join(BOOK_NAMES[num] for num in missing)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
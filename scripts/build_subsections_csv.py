@@ -5,103 +5,27 @@ Fast and reliable generation of Bible Reading and CBS MP3 URLs
 """
 
 import csv
-import json
-from urllib.request import urlopen
-from urllib.parse import urlencode
 from pathlib import Path
 from meeting_schedule_data import MEETING_SCHEDULE
+from bible_books import BIBLE_BOOKS
+import bible_index
+import pub_media
 
 # Configuration
 OUTPUT_CSV = Path(__file__).parent.parent / "meeting_subsections_mp3s.csv"
-BASE_URL = "https://b.jw-cdn.org/apis/pub-media/GETPUBMEDIALINKS"
 
-# Bible book to number mapping
-BIBLE_BOOKS = {
-    'Song of Solomon': 22,
-    'Isaiah': 23,
-}
-
-# Caches
-BIBLE_CACHE = {}
-LESSON_CACHE = {}
-
-
-def fetch_json(url):
-    """Fetch JSON from URL"""
-    with urlopen(url, timeout=15) as response:
-        return json.loads(response.read().decode('utf-8'))
+# Shared with every other stage in the process
+LESSON_CACHE = pub_media.LESSON_CACHE
 
 
 def get_bible_mp3s(book_num):
-    """Fetch all chapter MP3s for a Bible book"""
-    if book_num in BIBLE_CACHE:
-        return BIBLE_CACHE[book_num]
-
-    print(f"  Fetching Bible book {book_num}...")
-
-    params = {
-        'pub': 'bi12',
-        'fileformat': 'MP3',
-        'booknum': str(book_num),
-        'output': 'json',
-        'langwritten': 'E'
-    }
-
-    url = f"{BASE_URL}?{urlencode(params)}"
-    data = fetch_json(url)
-
-    chapters = {}
-    if data and 'files' in data:
-        for lang_data in data['files'].values():
-            if 'MP3' in lang_data:
-                for item in lang_data['MP3']:
-                    mp3_url = item.get('file', {}).get('url', '')
-                    # Try to extract chapter from title or URL
-                    title = item.get('title', '')
-                    # Title format is usually just the chapter number
-                    try:
-                        chapter_num = int(title)
-                        chapters[chapter_num] = mp3_url
-                    except:
-                        # Try extracting from URL
-                        import re
-                        match = re.search(r'_(\d+)\.mp3', mp3_url)
-                        if match:
-                            chapter_num = int(match.group(1))
-                            chapters[chapter_num] = mp3_url
-
-    BIBLE_CACHE[book_num] = chapters
-    print(f"    Found {len(chapters)} chapters")
-    return chapters
+    """Return {chapter: url} for a Bible book from the chapter index"""
+    return bible_index.get_index().chapter_urls(book_num)
 
 
 def get_lesson_mp3s():
     """Fetch all CBS lesson MP3s"""
-    if LESSON_CACHE:
-        return LESSON_CACHE
-
-    print("Fetching CBS lessons...")
-
-    params = {
-        'pub': 'lfb',
-        'fileformat': 'MP3',
-        'output': 'json',
-        'langwritten': 'E'
-    }
-
-    url = f"{BASE_URL}?{urlencode(params)}"
-    data = fetch_json(url)
-
-    if data and 'files' in data:
-        for lang_data in data['files'].values():
-            if 'MP3' in lang_data:
-                for idx, item in enumerate(lang_data['MP3']):
-                    mp3_url = item.get('file', {}).get('url', '')
-                    if mp3_url:
-                        LESSON_CACHE[idx] = mp3_url
-
-    print(f"  Loaded {len(LESSON_CACHE)} lessons\n")
-    return LESSON_CACHE
+    return pub_media.get_lesson_mp3s()
 
 
 def build_csv():
@@ -111,8 +35,11 @@ def build_csv():
     print("=" * 60)
     print()
 
-    # Fetch lesson data
+    # Fetch lesson data and the Bible chapter index up front
+    print("Fetching CBS lessons...")
     get_lesson_mp3s()
+    print(f"  Loaded {len(LESSON_CACHE)} lessons\n")
+    bible_index.get_index()
 
     all_rows = []
 
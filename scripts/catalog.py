@@ -0,0 +1,564 @@
+"""
+SQLite catalog of meeting media
+One indexed store for the workbook, Watchtower study and meeting subsection
+MP3s, keyed by ISO week-start date, publication and language. The fetchers
+upsert into it, lookups by date are an index seek, and the CSVs and Kotlin
+override maps are exported from it as derived views.
+
+Environment overrides:
+  JW_AUTO_CATALOG  catalog database file (default: <cache root>/catalog.sqlite3)
+"""
+
+import csv
+import io
+import itertools
+import os
+import sqlite3
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+import config
+import csv_index
+import metrics
+import week_key
+
+DB_PATH = Path(os.environ.get('JW_AUTO_CATALOG', config.CACHE_ROOT / 'catalog.sqlite3'))
+SCHEMA_VERSION = 1
+
+BIBLE_READING = 'Bible Reading'
+CONGREGATION_STUDY = 'Congregation Bible Study'
+SECTION_ORDER = {BIBLE_READING: 0, CONGREGATION_STUDY: 1}
+
+# pub -> (CSV file, week column header)
+WEEK_CSVS = {
+    'mwb': (config.DATA_DIR / 'meeting_workbook_mp3s.csv', 'Meeting Week'),
+    'w': (config.DATA_DIR / 'watchtower_study_mp3s.csv', 'Study Week'),
+}
+SECTIONS_CSV = config.DATA_DIR / 'meeting_subsections_mp3s.csv'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weeks (
+    lang        TEXT NOT NULL,
+    pub         TEXT NOT NULL,
+    week_start  TEXT NOT NULL,   -- ISO date of the Monday the week starts on
+    label       TEXT NOT NULL,   -- week label as published, e.g. "November 3-9"
+    url         TEXT NOT NULL,
+    issue       TEXT,
+    checksum    TEXT,
+    filesize    INTEGER,
+    duration    REAL,
+    updated_at  INTEGER NOT NULL,
+    PRIMARY KEY (lang, pub, week_start)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sections (
+    lang        TEXT NOT NULL,
+    week_start  TEXT NOT NULL,
+    section     TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    label       TEXT NOT NULL,
+    reference   TEXT NOT NULL,
+    url         TEXT NOT NULL,
+    checksum    TEXT,
+    filesize    INTEGER,
+    duration    REAL,
+    updated_at  INTEGER NOT NULL,
+    PRIMARY KEY (lang, week_start, section, position)
+) WITHOUT ROWID;
+
+-- Duration/bitrate read from each MP3's header (see mp3_meta.py), by URL and checksum
+CREATE TABLE IF NOT EXISTS media_info (
+    url          TEXT NOT NULL,
+    checksum     TEXT NOT NULL,      -- '' when the catalog has none
+    duration     REAL,
+    bitrate      INTEGER,            -- kbps
+    sample_rate  INTEGER,
+    vbr          INTEGER,
+    filesize     INTEGER,
+    probed_at    INTEGER NOT NULL,
+    PRIMARY KEY (url, checksum)
+) WITHOUT ROWID;
+
+-- Last liveness check of each URL (see link_check.py)
+CREATE TABLE IF NOT EXISTS links (
+    url             TEXT PRIMARY KEY,
+    status          INTEGER,         -- HTTP status, NULL if the host couldn't be reached
+    content_length  INTEGER,
+    final_url       TEXT,
+    method          TEXT,            -- HEAD, or GET with a 1-byte Range
+    checked_at      INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Issues GETPUBMEDIALINKS answered 404 for, i.e. not published yet (see issue_plan.py)
+CREATE TABLE IF NOT EXISTS unpublished_issues (
+    lang        TEXT NOT NULL,
+    pub         TEXT NOT NULL,
+    issue       TEXT NOT NULL,   -- YYYYMM
+    checked_at  INTEGER NOT NULL,
+    PRIMARY KEY (lang, pub, issue)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT NOT NULL
+) WITHOUT ROWID;
+
+-- Last change to each week of each CSV view (pub, or 'sections'); seq only grows, so an
+-- export re-renders just the weeks changed after the seq its CSV index records (see csv_index.py)
+CREATE TABLE IF NOT EXISTS changes (
+    lang        TEXT NOT NULL,
+    view        TEXT NOT NULL,
+    week_start  TEXT NOT NULL,
+    seq         INTEGER NOT NULL,
+    PRIMARY KEY (lang, view, week_start)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS weeks_inserted AFTER INSERT ON weeks BEGIN
+    INSERT INTO changes VALUES (NEW.lang, NEW.pub, NEW.week_start, (SELECT COALESCE(MAX(seq), 0) + 1 FROM changes))
+        ON CONFLICT (lang, view, week_start) DO UPDATE SET seq = excluded.seq;
+END;
+
+-- Only the columns the CSV shows count as a change
+CREATE TRIGGER IF NOT EXISTS weeks_updated AFTER UPDATE ON weeks
+WHEN NEW.label IS NOT OLD.label OR NEW.url IS NOT OLD.url OR NEW.duration IS NOT OLD.duration BEGIN
+    INSERT INTO changes VALUES (NEW.lang, NEW.pub, NEW.week_start, (SELECT COALESCE(MAX(seq), 0) + 1 FROM changes))
+        ON CONFLICT (lang, view, week_start) DO UPDATE SET seq = excluded.seq;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sections_inserted AFTER INSERT ON sections BEGIN
+    INSERT INTO changes VALUES (NEW.lang, 'sections', NEW.week_start, (SELECT COALESCE(MAX(seq), 0) + 1 FROM changes))
+        ON CONFLICT (lang, view, week_start) DO UPDATE SET seq = excluded.seq;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sections_updated AFTER UPDATE ON sections BEGIN
+    INSERT INTO changes VALUES (NEW.lang, 'sections', NEW.week_start, (SELECT COALESCE(MAX(seq), 0) + 1 FROM changes))
+        ON CONFLICT (lang, view, week_start) DO UPDATE SET seq = excluded.seq;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sections_deleted AFTER DELETE ON sections BEGIN
+    INSERT INTO changes VALUES (OLD.lang, 'sections', OLD.week_start, (SELECT COALESCE(MAX(seq), 0) + 1 FROM changes))
+        ON CONFLICT (lang, view, week_start) DO UPDATE SET seq = excluded.seq;
+END;
+
+CREATE INDEX IF NOT EXISTS changes_by_seq ON changes (seq);
+CREATE INDEX IF NOT EXISTS weeks_by_date ON weeks (week_start);
+CREATE INDEX IF NOT EXISTS weeks_by_url ON weeks (url);
+CREATE INDEX IF NOT EXISTS sections_by_url ON sections (url);
+"""
+
+WEEK_COLUMNS = ('week_start', 'label', 'url', 'issue', 'checksum', 'filesize', 'duration')
+SECTION_COLUMNS = ('week_start', 'section', 'position', 'label', 'reference', 'url',
+                   'checksum', 'filesize', 'duration')
+
+
+def week_start_for(label, issue=None):
+    """ISO week-start date for a week label published in issue ("202511"), or None if it can't be parsed"""
+    try:
+        return week_key.key_for(label, issue=issue).week_start
+    except ValueError:
+        return None
+
+
+def media_fields(item):
+    """checksum/filesize/duration from a GETPUBMEDIALINKS file item"""
+    return {
+        'checksum': item.get('file', {}).get('checksum'),
+        'filesize': item.get('filesize'),
+        'duration': item.get('duration'),
+    }
+
+
+def csv_path(pub, lang='E'):
+    """CSV view of a publication ('sections' for subsections); other languages go in DATA_DIR/<lang>/"""
+    path = SECTIONS_CSV if pub == 'sections' else WEEK_CSVS[pub][0]
+    return path if lang == 'E' else path.parent / lang / path.name
+
+
+def duration_cell(seconds):
+    """Duration column value: seconds with up to 3 decimals, empty if unknown"""
+    return '' if seconds is None else f"{seconds:.3f}".rstrip('0').rstrip('.')
+
+
+def _render_csv(rows):
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+def _csv_blocks(header, rows):
+    """(header line, [(week_start, CSV text of that week's rows), ...]) from (week_start, cells) pairs in order"""
+    return _render_csv([header]), [(week_start, _render_csv(cells for _, cells in group))
+                                   for week_start, group in itertools.groupby(rows, key=lambda row: row[0])]
+
+
+class Catalog:
+    """Indexed week/section store backed by one SQLite file"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.db.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+        with self.db:
+            self.db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('catalog_id', ?)", (uuid.uuid4().hex,))
+        # Tells this catalog's change seqs apart from those of a recreated or different one
+        self.catalog_id = self.db.execute("SELECT value FROM meta WHERE key = 'catalog_id'").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+    def is_empty(self):
+        return self.db.execute('SELECT 1 FROM weeks LIMIT 1').fetchone() is None
+
+    # Writes
+
+    def upsert_weeks(self, pub, rows, lang='E'):
+        """Insert or update week rows (dicts with week_start, week, url, ...) in one transaction
+
+        The first label seen for a week is kept, so exported CSVs don't churn
+        when the API changes its punctuation.
+        """
+        now = int(time.time())
+        params = [
+            (lang, pub, row['week_start'], row['week'], row['url'], row.get('issue'),
+             row.get('checksum'), row.get('filesize'), row.get('duration'), now)
+            for row in rows if row.get('week_start')
+        ]
+        with self.db:
+            self.db.executemany("""
+                INSERT INTO weeks (lang, pub, week_start, label, url, issue, checksum, filesize, duration, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (lang, pub, week_start) DO UPDATE SET
+                    url = excluded.url,
+                    issue = COALESCE(excluded.issue, weeks.issue),
+                    checksum = COALESCE(excluded.checksum, weeks.checksum),
+                    filesize = COALESCE(excluded.filesize, weeks.filesize),
+                    duration = COALESCE(excluded.duration, weeks.duration),
+                    updated_at = excluded.updated_at
+            """, params)
+        return len(params)
+
+    def replace_sections(self, rows, lang='E'):
+        """Replace the sections of every week that appears in rows
+
+        Weeks not in rows (e.g. a page that failed to parse this run) keep
+        their previous sections.
+        """
+        now = int(time.time())
+        positions = {}
+        params = []
+        for row in rows:
+            if not row.get('week_start'):
+                continue
+            key = (row['week_start'], row['section'])
+            position = positions.get(key, 0)
+            positions[key] = position + 1
+            params.append((lang, row['week_start'], row['section'], position, row['week'],
+                           row['reference'], row['url'], row.get('checksum'),
+                           row.get('filesize'), row.get('duration'), now))
+        weeks = sorted({week_start for week_start, _ in positions})
+        with self.db:
+            self.db.executemany('DELETE FROM sections WHERE lang = ? AND week_start = ?',
+                                [(lang, week_start) for week_start in weeks])
+            self.db.executemany("""
+                INSERT INTO sections (lang, week_start, section, position, label, reference, url,
+                                      checksum, filesize, duration, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?,
+                        COALESCE(?, (SELECT duration FROM media_info WHERE url = ?7
+                                     ORDER BY probed_at DESC LIMIT 1)), ?)
+            """, params)
+        return len(params)
+
+    def import_csv(self, pub, path=None, lang='E'):
+        """Load one CSV view (pub 'sections' for subsections) into the catalog; returns the number of rows read"""
+        path = Path(path or csv_path(pub, lang))
+        if not path.exists():
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            if pub != 'sections':
+                return self.upsert_weeks(pub, _label_rows(csv.DictReader(f), WEEK_CSVS[pub][1], pub), lang)
+            rows = _label_rows(csv.DictReader(f), 'Meeting Week', 'mwb', self.week_keys('mwb', lang))
+        for row in rows:
+            row['section'] = row['Section'].strip()
+            row['reference'] = row['Reference']
+        return self.replace_sections(rows, lang)
+
+    def import_csvs(self, lang='E'):
+        """Load the three CSVs into the catalog; returns the number of rows read"""
+        # Sections last: their week labels are resolved against the workbook weeks
+        return sum(self.import_csv(pub, lang=lang) for pub in (*WEEK_CSVS, 'sections'))
+
+    def record_media_info(self, results):
+        """Store MP3 header results (dicts with url, checksum, duration, bitrate, sample_rate, vbr, filesize)"""
+        now = int(time.time())
+        with self.db:
+            self.db.executemany("""
+                INSERT OR REPLACE INTO media_info (url, checksum, duration, bitrate, sample_rate, vbr, filesize, probed_at)
+                VALUES (:url, :checksum, :duration, :bitrate, :sample_rate, :vbr, :filesize, :probed_at)
+            """, [dict(result, checksum=result.get('checksum') or '', probed_at=now) for result in results])
+        return len(results)
+
+    def fill_durations(self):
+        """Copy probed durations into week and section rows that have none; returns the rows updated"""
+        updated = 0
+        with self.db:
+            for table in ('weeks', 'sections'):
+                updated += self.db.execute(f"""
+                    UPDATE {table} SET duration = (
+                        SELECT duration FROM media_info
+                        WHERE media_info.url = {table}.url AND media_info.checksum = COALESCE({table}.checksum, '')
+                    )
+                    WHERE duration IS NULL AND EXISTS (
+                        SELECT 1 FROM media_info
+                        WHERE media_info.url = {table}.url AND media_info.checksum = COALESCE({table}.checksum, '')
+                          AND media_info.duration IS NOT NULL
+                    )
+                """).rowcount
+        return updated
+
+    def record_links(self, results):
+        """Store link check results (dicts with url, status, content_length, final_url, method)"""
+        now = int(time.time())
+        with self.db:
+            self.db.executemany("""
+                INSERT INTO links (url, status, content_length, final_url, method, checked_at)
+                VALUES (:url, :status, :content_length, :final_url, :method, :checked_at)
+                ON CONFLICT (url) DO UPDATE SET
+                    status = excluded.status, content_length = excluded.content_length,
+                    final_url = excluded.final_url, method = excluded.method,
+                    checked_at = excluded.checked_at
+            """, [dict(result, checked_at=result.get('checked_at', now)) for result in results])
+        return len(results)
+
+    def record_issue_checks(self, pub, published=(), unpublished=(), lang='E'):
+        """Remember which issues were found missing (404) and forget those that have appeared"""
+        now = int(time.time())
+        with self.db:
+            self.db.executemany(
+                'DELETE FROM unpublished_issues WHERE lang = ? AND pub = ? AND issue = ?',
+                [(lang, pub, issue) for issue in published])
+            self.db.executemany("""
+                INSERT INTO unpublished_issues (lang, pub, issue, checked_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (lang, pub, issue) DO UPDATE SET checked_at = excluded.checked_at
+            """, [(lang, pub, issue, now) for issue in unpublished])
+
+    # Reads
+
+    def week_rows(self, pub, lang='E', start=None):
+        """Every week of a publication (from the week_start start on) as dicts (week, week_start, url, ...), by date"""
+        cursor = self.db.execute(
+            f"SELECT {', '.join(WEEK_COLUMNS)} FROM weeks WHERE lang = ? AND pub = ? AND week_start >= ?"
+            " ORDER BY week_start", (lang, pub, start or ''))
+        return [dict(row, week=row['label']) for row in cursor]
+
+    def week_keys(self, pub, lang='E'):
+        """Normalized label -> WeekKey for every week of a publication"""
+        keys = {}
+        for row in self.week_rows(pub, lang):
+            start = date.fromisoformat(row['week_start'])
+            try:
+                keys[week_key.normalize(row['week'])] = week_key.key_for(row['week'], pub, around=start)
+            except ValueError:
+                continue
+        return keys
+
+    def langs(self):
+        return [row[0] for row in self.db.execute('SELECT DISTINCT lang FROM weeks ORDER BY lang')]
+
+    def week_starts(self, pub, lang='E'):
+        return {row[0] for row in self.db.execute(
+            'SELECT week_start FROM weeks WHERE lang = ? AND pub = ?', (lang, pub))}
+
+    def issues(self, pub, lang='E'):
+        """Issue codes the catalog has weeks from"""
+        return {row[0] for row in self.db.execute(
+            'SELECT DISTINCT issue FROM weeks WHERE lang = ? AND pub = ? AND issue IS NOT NULL', (lang, pub))}
+
+    def unpublished_issues(self, pub, lang='E', since=0):
+        """Issue codes last found missing at or after the Unix time since"""
+        return {row[0] for row in self.db.execute(
+            'SELECT issue FROM unpublished_issues WHERE lang = ? AND pub = ? AND checked_at >= ?',
+            (lang, pub, int(since)))}
+
+    def section_weeks(self, lang='E'):
+        """Week-start dates that have subsections"""
+        return {row[0] for row in self.db.execute('SELECT DISTINCT week_start FROM sections WHERE lang = ?', (lang,))}
+
+    def section_rows(self, lang='E', week_start=None, start=None):
+        """Subsection rows (week, section, reference, url, ...) in CSV order, of one week or from start on"""
+        query = f"SELECT {', '.join(SECTION_COLUMNS)} FROM sections WHERE lang = ?"
+        params = [lang]
+        if week_start is not None:
+            query += ' AND week_start = ?'
+            params.append(week_start)
+        if start is not None:
+            query += ' AND week_start >= ?'
+            params.append(start)
+        rows = [dict(row, week=row['label']) for row in self.db.execute(query, params)]
+        rows.sort(key=lambda row: (row['week_start'], SECTION_ORDER.get(row['section'], 2),
+                                   row['section'], row['position']))
+        return rows
+
+    def url_rows(self, lang=None):
+        """Every MP3 URL in the catalog with where it is used: (url, lang, kind, week_start, checksum, filesize)
+
+        kind is the publication for week rows and the section name for subsection rows.
+        """
+        query = """
+            SELECT url, lang, pub AS kind, week_start, checksum, filesize FROM weeks {where}
+            UNION ALL
+            SELECT url, lang, section AS kind, week_start, checksum, filesize FROM sections {where}
+            ORDER BY url, lang, week_start
+        """.format(where='WHERE lang = :lang' if lang else '')
+        return [dict(row) for row in self.db.execute(query, {'lang': lang})]
+
+    def missing_durations(self, lang=None):
+        """(url, checksum) pairs of rows without a duration and without a probed result"""
+        query = """
+            SELECT DISTINCT url, COALESCE(checksum, '') FROM (
+                SELECT url, checksum, lang FROM weeks WHERE duration IS NULL
+                UNION ALL
+                SELECT url, checksum, lang FROM sections WHERE duration IS NULL
+            ) AS rows {where}
+            EXCEPT SELECT url, checksum FROM media_info
+            ORDER BY 1
+        """.format(where='WHERE lang = :lang' if lang else '')
+        return [tuple(row) for row in self.db.execute(query, {'lang': lang})]
+
+    def link_results(self):
+        """url -> last stored link check result"""
+        return {row['url']: dict(row) for row in self.db.execute(
+            'SELECT url, status, content_length, final_url, method, checked_at FROM links')}
+
+    def week_at(self, day, pub, lang='E'):
+        """The week row of a publication that contains day (a date or ISO string), or None
+
+        One index seek on the (lang, pub, week_start) primary key.
+        """
+        day = date.fromisoformat(day) if isinstance(day, str) else day
+        row = self.db.execute(
+            f"SELECT {', '.join(WEEK_COLUMNS)} FROM weeks"
+            " WHERE lang = ? AND pub = ? AND week_start <= ? ORDER BY week_start DESC LIMIT 1",
+            (lang, pub, day.isoformat())).fetchone()
+        if row is None or day >= date.fromisoformat(row['week_start']) + timedelta(days=7):
+            return None
+        return dict(row, week=row['label'])
+
+    def lookup(self, day, lang='E'):
+        """Everything scheduled for the week containing day"""
+        workbook = self.week_at(day, 'mwb', lang)
+        return {
+            'workbook': workbook,
+            'watchtower': self.week_at(day, 'w', lang),
+            'sections': self.section_rows(lang, workbook['week_start']) if workbook else [],
+        }
+
+    # Derived views
+
+    def override_maps(self, lang='E'):
+        """(workbook_rows, watchtower_rows, sections) as generate_jw_overrides renders them"""
+        workbook = [(row['week_start'], row['url']) for row in self.week_rows('mwb', lang)]
+        watchtower = [(row['week_start'], row['url']) for row in self.week_rows('w', lang)]
+        sections = {}
+        for row in self.section_rows(lang):
+            week = sections.setdefault(row['week_start'], {BIBLE_READING: [], CONGREGATION_STUDY: []})
+            week.setdefault(row['section'], []).append(row['url'])
+        return workbook, watchtower, sections
+
+    def section_durations(self, lang='E'):
+        """MP3 URL -> seconds for every subsection with a known duration"""
+        return {row['url']: row['duration'] for row in self.section_rows(lang) if row['duration']}
+
+    def render_week_csv(self, pub, lang='E', start=None):
+        """(header line, [(week_start, CSV rows), ...]) of a publication's CSV view, from start on if given"""
+        _, column = WEEK_CSVS[pub]
+        return _csv_blocks([column, 'MP3 URL', 'Duration'],
+                           ((row['week_start'], [row['week'], row['url'], duration_cell(row['duration'])])
+                            for row in self.week_rows(pub, lang, start)))
+
+    def render_sections_csv(self, lang='E', start=None):
+        """(header line, [(week_start, CSV rows), ...]) of the subsections CSV view, from start on if given"""
+        return _csv_blocks(['Meeting Week', 'Section', 'Reference', 'MP3 URL', 'Duration'],
+                           ((row['week_start'], [row['week'], row['section'], row['reference'], row['url'],
+                                                 duration_cell(row['duration'])])
+                            for row in self.section_rows(lang, start=start)))
+
+    def changes_since(self, view, lang='E', version=None):
+        """(current version, week starts of a CSV view changed after version)
+
+        A version is "<catalog id>:<seq>". The weeks are None when version is
+        missing or from another catalog, i.e. when nothing is known about what
+        the CSV holds.
+        """
+        seq = self.db.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+        current = f"{self.catalog_id}:{seq}"
+        catalog_id, _, since = (version or '').partition(':')
+        if catalog_id != self.catalog_id or not since.isdigit():
+            return current, None
+        return current, {row[0] for row in self.db.execute(
+            'SELECT week_start FROM changes WHERE lang = ? AND view = ? AND seq > ?', (lang, view, int(since)))}
+
+    @metrics.timed('csv.export')
+    def export_csv(self, pub, path=None, lang='E'):
+        """Write a publication's CSV view (pub 'sections' for subsections); True if it changed
+
+        Written under the CSV's lock. Only weeks from the first one changed
+        since the last export are rendered and written (see csv_index.py).
+        A CSV changed outside the catalog (git pull, a hand edit) is imported
+        first, so its rows are kept rather than overwritten.
+        """
+        if pub == 'sections':
+            render = lambda start: self.render_sections_csv(lang, start)
+        else:
+            render = lambda start: self.render_week_csv(pub, lang, start)
+        return csv_index.export(path or csv_path(pub, lang), render,
+                                lambda version: self.changes_since(pub, lang, version),
+                                lambda changed: self.import_csv(pub, changed, lang))
+
+    def export_csvs(self, lang='E'):
+        for pub in (*WEEK_CSVS, 'sections'):
+            self.export_csv(pub, lang=lang)
+
+
+def _label_rows(reader, column, pub, known=None):
+    """CSV rows with week/week_start resolved from their labels
+
+    The year comes from the issue code in each row's MP3 URL; rows without one
+    (subsections) take the week of the same label in known (see week_key.resolve).
+    """
+    rows = list(reader)
+    urls = [row['MP3 URL'].strip() for row in rows]
+    issues = [week_key.issue_from_url(url) for url in urls]
+    keys = week_key.resolve((row[column] for row in rows), pub, issues, known)
+    labelled = []
+    for row, url, issue, key in zip(rows, urls, issues, keys):
+        if key is None:
+            print(f"  Skipping unparseable week label: {row[column]!r}")
+            continue
+        duration = (row.get('Duration') or '').strip()
+        labelled.append(dict(row, week=row[column], week_start=key.week_start, url=url, issue=issue,
+                             duration=float(duration) if duration else None))
+    return labelled
+
+
+_opened = {}
+
+
+def get_catalog(path=None):
+    """Return the process-wide catalog, importing the CSVs the first time it is created"""
+    path = Path(path or DB_PATH)
+    if path not in _opened:
+        store = Catalog(path)
+        if store.is_empty():
+            print(f"Initializing the catalog from the CSVs ({path})...")
+            store.import_csvs()
+        _opened[path] = store
+    return _opened[path]
+
@@ -0,0 +1,21 @@
+"""
+Where the scripts read and write, and which servers they talk to
+Everything can be overridden from the environment, so a run can be pointed at
+a scratch directory and a local stand-in server (see bench_pipeline.py).
+
+Environment overrides:
+  JW_AUTO_DATA_DIR       directory holding the CSVs (default: <repo>)
+  JW_AUTO_CACHE_ROOT     directory for caches, the Bible index and the catalog (default: <repo>/.cache)
+  JW_AUTO_PUB_MEDIA_URL  GETPUBMEDIALINKS endpoint
+  JW_AUTO_JW_ORG_URL     jw.org origin used for week and download pages
+"""
+
+import os
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get('JW_AUTO_DATA_DIR', ROOT))
+CACHE_ROOT = Path(os.environ.get('JW_AUTO_CACHE_ROOT', ROOT / '.cache'))
+
+PUB_MEDIA_URL = os.environ.get('JW_AUTO_PUB_MEDIA_URL', 'https://b.jw-cdn.org/apis/pub-media/GETPUBMEDIALINKS')
+JW_ORG_URL = os.environ.get('JW_AUTO_JW_ORG_URL', 'https://www.jw.org').rstrip('/')
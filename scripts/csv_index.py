@@ -0,0 +1,180 @@
+"""
+Locked, incremental CSV exports with a sidecar week index
+Each catalog CSV is written under an advisory lock (.<name>.lock next to
+it), so overlapping runs (two cron jobs, say) export one after the other
+and the last one writes the newest catalog state. Next to the CSV a sidecar
+index (.<name>.idx) records the file's size and mtime and, for every week in
+file order, the byte offset and a digest of its rows.
+
+An export asks the catalog which weeks changed since the version recorded in
+the index (a change sequence, see Catalog.changes_since) instead of reading
+the file back or rendering every week: with no changed week nothing is
+rendered or touched; otherwise only the weeks from the first changed one on
+are rendered, the file up to that week's offset is copied byte for byte (no
+parsing), and the rendered tail is written after it, through a temp file and
+os.replace. A CSV whose size or mtime no longer matches its index (edited by
+hand or changed by git pull, say) is first handed to the caller to import,
+so its rows are merged into the catalog instead of being overwritten; it and
+an index from another catalog mean a full render.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, exports are still atomic
+    fcntl = None
+
+COPY_CHUNK = 1 << 16
+
+
+def index_path(path):
+    return path.with_name(f".{path.name}.idx")
+
+
+def lock_path(path):
+    return path.with_name(f".{path.name}.lock")
+
+
+def digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+@contextlib.contextmanager
+def locked(path):
+    """Hold the CSV's advisory lock (blocking) for the duration of the block"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path(path), 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_index(path):
+    """The sidecar index of a CSV, or None if it is missing or the CSV changed since it was written"""
+    try:
+        index = json.loads(index_path(path).read_text(encoding='utf-8'))
+        stat = path.stat()
+    except (OSError, ValueError):
+        return None
+    if index.get('size') != stat.st_size or index.get('mtime_ns') != stat.st_mtime_ns:
+        return None
+    return index
+
+
+def _copy_prefix(source, target, length):
+    with open(source, 'rb') as f:
+        while length > 0:
+            chunk = f.read(min(COPY_CHUNK, length))
+            if not chunk:
+                raise OSError(f"{source} is shorter than its index")
+            target.write(chunk)
+            length -= len(chunk)
+
+
+def _write_index(path, header, entries, version=None):
+    stat = path.stat()
+    target = index_path(path)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'header': digest(header),
+                               'version': version, 'weeks': entries}), encoding='utf-8')
+    os.replace(tmp, target)
+
+
+def _entries(header, blocks):
+    entries = []
+    offset = len(header.encode('utf-8'))
+    for key, text, block_digest in blocks:
+        entries.append([key, offset, block_digest])
+        offset += len(text.encode('utf-8'))
+    return entries
+
+
+def _digested(blocks):
+    return [(key, text, digest(text)) for key, text in blocks]
+
+
+def export(path, render, changes=None, reimport=None):
+    """Write the CSV render() describes, under the CSV's lock; True if the file changed
+
+    render(start) returns (header line, [(week key, rows text), ...] in file
+    order, keys sorting in file order), with only the weeks whose key is >=
+    start unless start is None. changes(version) returns (current version,
+    keys changed since version, or None if unknown); without it every export
+    renders in full. reimport(path) is called for an existing CSV without a
+    usable index, before anything is rendered, to load rows written outside
+    the catalog. All three are called with the lock held, so they see every
+    catalog write committed by a run that exported before this one.
+    """
+    path = Path(path)
+    with locked(path):
+        index = load_index(path)
+        if index is None and reimport and path.exists():
+            reimport(path)
+        version, changed = changes(index.get('version') if index else None) if changes else (None, None)
+        if index is None or changed is None:
+            header, blocks = render(None)
+            if index is None or index.get('header') != digest(header):
+                return _write_full(path, header, _digested(blocks), version)
+            start, skip = None, 0
+        elif not changed:
+            return False
+        else:
+            start = min(changed)
+            header, blocks = render(start)
+            if index.get('header') != digest(header):
+                header, blocks = render(None)
+                return _write_full(path, header, _digested(blocks), version)
+            # Weeks before the first changed one are unchanged: keep their bytes and index entries
+            skip = next((i for i, (key, _, _) in enumerate(index['weeks']) if key >= start), len(index['weeks']))
+        blocks = _digested(blocks)
+
+        old = index['weeks']
+        tail = old[skip:]
+        # First week whose key or rows differ from the file on disk
+        first = next((i for i, ((key, _, block_digest), (old_key, _, old_digest)) in enumerate(zip(blocks, tail))
+                      if (key, block_digest) != (old_key, old_digest)), min(len(blocks), len(tail)))
+        if first == len(blocks) == len(tail):
+            if version != index.get('version'):
+                _write_index(path, header, old, version)  # Same bytes; don't ask about these weeks again
+            return False
+
+        cut = skip + first
+        prefix = old[cut][1] if cut < len(old) else index['size']
+        entries = old[:cut]
+        offset = prefix
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            _copy_prefix(path, f, prefix)
+            for key, text, block_digest in blocks[first:]:
+                data = text.encode('utf-8')
+                entries.append([key, offset, block_digest])
+                f.write(data)
+                offset += len(data)
+        os.replace(tmp, path)
+        _write_index(path, header, entries, version)
+    return True
+
+
+def _write_full(path, header, blocks, version=None):
+    """Rewrite a CSV without a usable index (an unchanged file is only indexed); True if it changed"""
+    text = header + ''.join(text for _, text, _ in blocks)
+    try:
+        changed = path.read_text(encoding='utf-8') != text
+    except OSError:
+        changed = True
+    if changed:
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(text, encoding='utf-8')
+        os.replace(tmp, path)
+    _write_index(path, header, _entries(header, blocks), version)
+    return changed
@@ -10,23 +10,52 @@ This script now supports two kinds of URLs:
 Usage:
   ./scripts/extract_jw_audio.py URL1 URL2 ...
   ./scripts/extract_jw_audio.py --from-file meeting_urls.txt
+  ./scripts/extract_jw_audio.py --issue 202511 202601 --ordered --output 'workbook_{issue}.csv'
 
-Outputs CSV (label,page_url,mp3_url).
-Install deps once: python3 -m pip install requests beautifulsoup4
+Outputs CSV (label,page_url,mp3_url). All pages are fetched concurrently over
+the shared connection pool, and each page's rows are written as soon as it
+arrives; with --ordered they are held back until every earlier page is
+written, so the output follows the input order.
+
+Download pages are read with the standard library alone: the file list comes
+from the page's embedded __NEXT_DATA__ JSON. BeautifulSoup is only imported for
+pages without it (week pages, or a download page whose layout changed), and is
+optional: without it those pages go through html.parser. The HTTP transport is
+imported on first use, so --help and argument errors start without it.
+Optional: python3 -m pip install beautifulsoup4
 """
 
+from __future__ import annotations
+
 import argparse
 import csv
+import html
 import json
+import re
 import sys
+from collections.abc import Iterable
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import Iterable, List
-from urllib.parse import urljoin, urlparse
+from urllib.parse import parse_qs, urlencode, urljoin, urlparse
+
+import config
+
+DOWNLOAD_HOST = urlparse(config.JW_ORG_URL).netloc
+
+NEXT_DATA_PATTERN = re.compile(
+    r"""<script\b[^>]*\bid=["']__NEXT_DATA__["'][^>]*>(.*?)</script>""", re.IGNORECASE | re.DOTALL)
+ANCHOR_HREF_PATTERN = re.compile(r"""<a\b[^>]*?\shref\s*=\s*(["'])(.*?)\1""", re.IGNORECASE | re.DOTALL)
+
+# (tag, attribute) pairs that can hold an MP3 link
+WEEK_PAGE_LINKS = (("a", "href"), ("source", "src"), ("audio", "src"))
+DOWNLOAD_PAGE_LINKS = (("a", "href"),)
 
-import requests
-from bs4 import BeautifulSoup
 
-DOWNLOAD_HOST = "www.jw.org"
+def download_page_url(issue: str, lang: str = "E", pub: str = "mwb") -> str:
+    """The jw.org download page listing every MP3/AAC file of an issue"""
+    params = {"issue": issue, "output": "html", "pub": pub, "fileformat": "MP3,AAC",
+              "alllangs": "0", "langwritten": lang, "txtCMSLang": lang, "isBible": "0"}
+    return f"{config.JW_ORG_URL}/download/?{urlencode(params)}"
 
 
 def iter_urls(args: argparse.Namespace) -> Iterable[str]:
@@ -37,31 +66,112 @@ def iter_urls(args: argparse.Namespace) -> Iterable[str]:
             stripped = line.strip()
             if stripped and not stripped.startswith("#"):
                 yield stripped
+    for value in args.issues or []:
+        for issue in value.split(","):
+            if issue.strip():
+                yield download_page_url(issue.strip(), args.lang)
+
+
+def issue_of(url: str) -> str:
+    """The issue code a page URL asks for ("pages" when it names none)"""
+    return parse_qs(urlparse(url).query).get("issue", ["pages"])[-1]
+
+
+class RowWriter:
+    """CSV rows to stdout, or to one file per issue when given an output template"""
+
+    HEADER = ["label", "page_url", "mp3_url"]
+
+    def __init__(self, template: str | None = None):
+        self.template = template
+        self._files = {}
+        self._writers = {}
+
+    def _writer(self, page_url: str):
+        key = self.template.format(issue=issue_of(page_url)) if self.template else None
+        if key not in self._writers:
+            stream = sys.stdout
+            if key is not None:
+                stream = self._files[key] = open(key, "w", encoding="utf-8", newline="")
+            self._writers[key] = csv.writer(stream)
+            self._writers[key].writerow(self.HEADER)
+        return self._writers[key], self._files.get(key, sys.stdout)
+
+    def write_page(self, page_url: str, rows: Iterable[list[str]]) -> None:
+        writer, stream = self._writer(page_url)
+        writer.writerows(rows)
+        stream.flush()  # Rows go out as each page completes, even into a pipe
+
+    def close(self) -> None:
+        for stream in self._files.values():
+            stream.close()
+
+
+class _LinkParser(HTMLParser):
+    """Collects the attribute values of the given (tag, attribute) pairs"""
+
+    def __init__(self, wanted):
+        super().__init__(convert_charrefs=True)
+        self.wanted = wanted
+        self.values = []
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if value and (tag, name) in self.wanted:
+                self.values.append(value)
+
+
+def _page_links(page_html: str, wanted) -> list[str]:
+    """Attribute values of the wanted (tag, attribute) pairs: BeautifulSoup if installed, else html.parser"""
+    try:
+        from bs4 import BeautifulSoup  # Imported only for pages the fast path can't read
+    except ImportError:
+        parser = _LinkParser(set(wanted))
+        parser.feed(page_html)
+        parser.close()
+        return parser.values
+    soup = BeautifulSoup(page_html, "html.parser")
+    return [tag[attribute] for name, attribute in wanted for tag in soup.find_all(name, **{attribute: True})]
+
+
+def _mp3_links(page_url: str, links: Iterable[str]) -> set[str]:
+    return {urljoin(page_url, link) for link in links if link and link.lower().endswith(".mp3")}
 
 
-def fetch_download_page_links(page_url: str, timeout: int = 30) -> List[str]:
-    resp = requests.get(page_url, timeout=timeout)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
-    mp3s = set()
+def _get_text(page_url: str, timeout: int) -> str:
+    import http_transport  # Deferred: pulls in http.client, ssl and the email parser
+    return http_transport.get_text(page_url, timeout=timeout)
+
+
+def next_data_links(page_url: str, page_html: str) -> list[str] | None:
+    """MP3 links from a download page's __NEXT_DATA__ JSON and anchors, or None without it"""
+    match = NEXT_DATA_PATTERN.search(page_html)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(1))
+    except ValueError:
+        return None
+    mp3s = set(_extract_next_data_mp3s(data))
+    # Visible links too, as the full parse would find them
+    mp3s |= _mp3_links(page_url, (html.unescape(m.group(2)) for m in ANCHOR_HREF_PATTERN.finditer(page_html)))
+    return sorted(mp3s)
+
+
+def fetch_download_page_links(page_url: str, timeout: int = 30) -> list[str]:
+    page_html = _get_text(page_url, timeout)
     # JW download pages embed JSON inside a <script id="__NEXT_DATA__">
-    script_tag = soup.find("script", id="__NEXT_DATA__")
-    if script_tag:
-        data = json.loads(script_tag.string)
-        for item in _extract_next_data_mp3s(data):
-            mp3s.add(item)
+    mp3s = next_data_links(page_url, page_html)
+    if mp3s is not None:
+        return mp3s
     # Fallback: scrape visible links in page
-    for tag in soup.find_all("a", href=True):
-        href = tag["href"]
-        if href.lower().endswith(".mp3"):
-            mp3s.add(urljoin(page_url, href))
-    return sorted(mp3s)
+    return sorted(_mp3_links(page_url, _page_links(page_html, DOWNLOAD_PAGE_LINKS)))
 
 
 def _extract_next_data_mp3s(data: dict) -> Iterable[str]:
     try:
         entries = data["props"]["pageProps"]["listData"]["files"]
-    except KeyError:
+    except (KeyError, TypeError):
         return []
     mp3s = []
     for entry in entries:
@@ -71,24 +181,9 @@ def _extract_next_data_mp3s(data: dict) -> Iterable[str]:
     return mp3s
 
 
-def fetch_week_page_links(page_url: str, timeout: int = 30) -> List[str]:
-    resp = requests.get(page_url, timeout=timeout)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
-    mp3s = set()
-
-    def maybe_add(raw_url: str) -> None:
-        if raw_url and raw_url.lower().endswith(".mp3"):
-            mp3s.add(urljoin(page_url, raw_url))
-
-    for tag in soup.find_all("a", href=True):
-        maybe_add(tag["href"])
-    for source in soup.find_all("source", src=True):
-        maybe_add(source["src"])
-    for audio in soup.find_all("audio", src=True):
-        maybe_add(audio["src"])
-
-    return sorted(mp3s)
+def fetch_week_page_links(page_url: str, timeout: int = 30) -> list[str]:
+    page_html = _get_text(page_url, timeout)
+    return sorted(_mp3_links(page_url, _page_links(page_html, WEEK_PAGE_LINKS)))
 
 
 def label_from_url(url: str) -> str:
@@ -105,37 +200,61 @@ def is_download_page(url: str) -> bool:
     return parsed.netloc.endswith(DOWNLOAD_HOST) and "download" in parsed.path
 
 
+def fetch_links(page_url: str, timeout: int) -> tuple[list[str], Exception | None]:
+    try:
+        if is_download_page(page_url):
+            return fetch_download_page_links(page_url, timeout=timeout), None
+        return fetch_week_page_links(page_url, timeout=timeout), None
+    except Exception as exc:  # pylint: disable=broad-except
+        return [], exc
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Extract JW meeting MP3 links")
     parser.add_argument("urls", nargs="*", help="Page URLs to scan")
     parser.add_argument("--from-file", dest="from_file", help="Text file containing URLs (one per line)")
+    parser.add_argument("--issue", dest="issues", nargs="+", action="extend", metavar="YYYYMM",
+                        help="Workbook issue(s) whose download page to scan; may be repeated or comma-separated")
+    parser.add_argument("--lang", default="E", help="Language code (langwritten) for --issue pages, default E")
     parser.add_argument("--timeout", type=int, default=30, help="HTTP timeout in seconds")
+    parser.add_argument("--concurrency", type=int,
+                        help="Maximum pages fetched in parallel (default: the per-host maximum); "
+                             "the adaptive per-host limit may use fewer")
+    parser.add_argument("--ordered", action="store_true",
+                        help="Write pages in input order (a page waits for all earlier ones) instead of as they complete")
+    parser.add_argument("--output", metavar="TEMPLATE",
+                        help="Write to files instead of stdout; {issue} in the name gives one file per issue")
     args = parser.parse_args()
 
-    all_urls = list(iter_urls(args))
+    all_urls = list(dict.fromkeys(iter_urls(args)))
     if not all_urls:
-        parser.error("Provide at least one URL via arguments or --from-file")
+        parser.error("Provide at least one URL via arguments, --from-file or --issue")
+
+    import adaptive  # Deferred with the transport; nothing above needs either
 
-    writer = csv.writer(sys.stdout)
-    writer.writerow(["label", "page_url", "mp3_url"])
+    results = adaptive.map_completed(lambda url: fetch_links(url, args.timeout),
+                                     all_urls, adaptive.host_of, args.concurrency or adaptive.DEFAULT_MAX_LIMIT)
+    if args.ordered:
+        results = adaptive.in_order(results)
 
+    writer = RowWriter(args.output)
     for page_url in all_urls:
-        try:
-            if is_download_page(page_url):
-                mp3s = fetch_download_page_links(page_url, timeout=args.timeout)
-            else:
-                mp3s = fetch_week_page_links(page_url, timeout=args.timeout)
-        except Exception as exc:  # pylint: disable=broad-except
-            print(f"ERROR,{page_url},{exc}", file=sys.stderr)
-            continue
-
-        if not mp3s:
-            print(f"WARNING: no MP3 links found on {page_url}", file=sys.stderr)
-            continue
-
-        label = label_from_url(page_url)
-        for mp3 in mp3s:
-            writer.writerow([label, page_url, mp3])
+        writer.write_page(page_url, [])  # Headers first, so every output exists even without rows
+    try:
+        for index, (mp3s, exc) in results:
+            page_url = all_urls[index]
+            if exc is not None:
+                print(f"ERROR,{page_url},{exc}", file=sys.stderr)
+                continue
+
+            if not mp3s:
+                print(f"WARNING: no MP3 links found on {page_url}", file=sys.stderr)
+                continue
+
+            label = label_from_url(page_url)
+            writer.write_page(page_url, ([label, page_url, mp3] for mp3 in mp3s))
+    finally:
+        writer.close()
 
     return 0
 
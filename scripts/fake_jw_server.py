@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the pub-media API and jw.org pages
+Serves synthetic GETPUBMEDIALINKS JSON (mwb, w, lfb, bi12), meeting workbook
+week pages, download pages and MP3 bodies, at a configurable scale and with
+injected latency and errors, so the scripts can be run and timed offline.
+Point the scripts at it with JW_AUTO_PUB_MEDIA_URL / JW_AUTO_JW_ORG_URL
+(see config.py); bench_pipeline.py does this for you.
+
+Usage:
+  python3 scripts/fake_jw_server.py --port 8765 --latency-ms 40 --error-rate 0.02
+"""
+
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import random
+import re
+import struct
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bible_books import BOOK_NAMES, CHAPTER_COUNTS
+
+PUB_MEDIA_PATH = '/apis/pub-media/GETPUBMEDIALINKS'
+WEEK_PAGE_PREFIX = '/en/library/jw-meeting-workbook/'
+LESSON_COUNT = 104
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+FILLER = ("Treasures From God's Word Apply Yourself to the Field Ministry Living as Christians "
+          "Song and Prayer Opening Comments Spiritual Gems Bible Study Local Needs Concluding Comments ")
+
+
+class Scenario:
+    """Scale and fault settings for the fake server"""
+
+    def __init__(self, weeks=9, langs=('E',), latency_ms=0.0, jitter_ms=0.0,
+                 error_rate=0.0, slow_rate=0.0, slow_ms=0.0, page_kb=64, mp3_kb=32, seed=1,
+                 published_through=None):
+        self.weeks = weeks
+        self.langs = tuple(langs)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.page_kb = page_kb
+        self.mp3_kb = mp3_kb
+        self.seed = seed
+        self.published_through = published_through  # Newer mwb/w issues answer 404
+
+    def to_json(self):
+        return dict(vars(self), langs=list(self.langs))
+
+
+def week_label(monday):
+    sunday = monday + timedelta(days=6)
+    if sunday.month == monday.month:
+        return f"{MONTHS[monday.month - 1]} {monday.day}-{sunday.day}"
+    return f"{MONTHS[monday.month - 1]} {monday.day}–{MONTHS[sunday.month - 1]} {sunday.day}"
+
+
+def first_monday(year, month):
+    day = date(year, month, 1)
+    return day + timedelta(days=(7 - day.weekday()) % 7)
+
+
+def add_months(year, month, months):
+    index = year * 12 + month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+def _stable_int(text):
+    return int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:4], 'big')
+
+
+class FakeJWServer(ThreadingHTTPServer):
+    """Threaded HTTP server that counts requests and bytes sent"""
+
+    daemon_threads = True
+
+    def __init__(self, scenario=None, host='127.0.0.1', port=0):
+        super().__init__((host, port), FakeJWHandler)
+        self.scenario = scenario or Scenario()
+        self.rng = random.Random(self.scenario.seed)
+        self.hits = {}
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def origin(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def pub_media_url(self):
+        return self.origin + PUB_MEDIA_PATH
+
+    def reset(self):
+        with self.lock:
+            self.stats = {'requests': 0, 'bytes': 0, 'errors_injected': 0, 'not_found': 0, 'slow': 0}
+            self.hits = {}
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def record(self, **counts):
+        with self.lock:
+            for key, value in counts.items():
+                self.stats[key] += value
+
+    def random(self):
+        with self.lock:
+            return self.rng.random()
+
+    def draw(self, kind, path):
+        """A uniform [0, 1) value fixed by the seed, the path and how often it was requested
+
+        Slow responses and injected errors use this instead of the shared RNG,
+        so the same requests are affected whatever order concurrent runs send
+        them in, and runs stay comparable.
+        """
+        with self.lock:
+            n = self.hits[kind, path] = self.hits.get((kind, path), 0) + 1
+        return _stable_int(f"{self.scenario.seed}:{kind}:{path}:{n}") / 2 ** 32
+
+    def handle_error(self, request, client_address):
+        # Streaming clients hang up as soon as they have what they need
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name='fake-jw-server', daemon=True)
+        thread.start()
+        return thread
+
+    # Content
+
+    def media_url(self, name):
+        return f"{self.origin}/media/{name}"
+
+    def media_item(self, title, name, track=None):
+        size = self.scenario.mp3_kb * 1024
+        return {
+            'title': title,
+            'track': track,
+            'file': {'url': self.media_url(name), 'checksum': hashlib.md5(self.mp3(name)).hexdigest()},
+            'filesize': size,
+            'duration': round(size / 16000, 3),  # 128 kbps
+        }
+
+    def pub_media(self, params):
+        pub = params.get('pub', '')
+        lang = params.get('langwritten', 'E')
+        issue = params.get('issue', '')
+        if lang not in self.scenario.langs:
+            return None
+        if pub in ('mwb', 'w') and self.scenario.published_through and issue > self.scenario.published_through:
+            return None  # Not published yet
+        if pub == 'mwb' and re.fullmatch(r'\d{6}', issue):
+            year, month = int(issue[:4]), int(issue[4:])
+            if month % 2 == 0:
+                return None  # Workbooks are bimonthly (January, March, ...)
+            monday = first_monday(year, month)
+            items = [self.media_item(week_label(monday + timedelta(weeks=i)), f"mwb_{lang}_{issue}_{i + 1:02}.mp3", i + 1)
+                     for i in range(self.scenario.weeks)]
+        elif pub == 'w' and re.fullmatch(r'\d{6}', issue):
+            monday = first_monday(*add_months(int(issue[:4]), int(issue[4:]), 2))
+            count = max(1, self.scenario.weeks // 2)
+            items = [self.media_item(f"Study Article {i + 1} ({week_label(monday + timedelta(weeks=i))})",
+                                     f"w_{lang}_{issue}_{i + 1:02}.mp3", i + 1)
+                     for i in range(count)]
+        elif pub == 'lfb':
+            items = [self.media_item(f"Lesson {i}", f"lfb_{lang}_{i + 1:03}.mp3", i + 1)
+                     for i in range(LESSON_COUNT)]
+        elif pub == 'bi12' and params.get('booknum', '').isdigit():
+            book = int(params['booknum'])
+            if book not in CHAPTER_COUNTS:
+                return None
+            items = [self.media_item(f"{BOOK_NAMES[book]} {ch}", f"bi12_{book:02}_{lang}_{ch:03}.mp3", ch)
+                     for ch in range(1, CHAPTER_COUNTS[book] + 1)]
+        else:
+            return None
+        return json.dumps({'pubName': pub, 'files': {lang: {'MP3': items}}}).encode('utf-8')
+
+    def padding(self, size, seed):
+        rng = random.Random(seed)
+        parts = []
+        length = 0
+        while length < size:
+            words = FILLER.split()
+            rng.shuffle(words)
+            part = f'<p class="filler">{" ".join(words)}</p>\n'
+            parts.append(part)
+            length += len(part)
+        return ''.join(parts)
+
+    def week_page(self, path):
+        """A workbook week page whose Bible reading and lessons are derived from its URL"""
+        seed = _stable_int(path)
+        book = seed % 66 + 1
+        start = seed // 66 % CHAPTER_COUNTS[book] + 1
+        end = min(CHAPTER_COUNTS[book], start + seed % 3)
+        reading = f"{BOOK_NAMES[book]} {start}" if end == start else f"{BOOK_NAMES[book]} {start}-{end}"
+        lesson = seed % (LESSON_COUNT - 2) + 1
+        size = self.scenario.page_kb * 1024
+        head = self.padding(int(size * 0.3), seed)
+        tail = self.padding(int(size * 0.7), seed + 1)
+        return (
+            '<!DOCTYPE html><html><head><title>Life and Ministry Meeting Schedule</title>'
+            '<script>window.__config = {"books": "Genesis 1 Exodus 2"};</script></head><body>\n'
+            f'{head}'
+            f'<h3>Bible Reading</h3><p><a href="/en/library/bible/">{reading}</a></p>\n'
+            f'<h3>Congregation Bible Study</h3><p>lfb lessons {lesson}-{lesson + 1}</p>\n'
+            f'<p><a href="{self.media_url(f"week_{seed:08x}.mp3")}">Download audio</a></p>\n'
+            f'{tail}</body></html>'
+        ).encode('utf-8')
+
+    def download_page(self, params):
+        data = self.pub_media(dict(params, pub=params.get('pub', 'mwb')))
+        if data is None:
+            return None
+        items = [item for lang in json.loads(data)['files'].values() for item in lang['MP3']]
+        next_data = {'props': {'pageProps': {'listData': {'files': [
+            {'title': item['title'], 'fileUrl': item['file']['url']} for item in items]}}}}
+        links = ''.join(f'<li><a href="{item["file"]["url"]}">{item["title"]}</a></li>\n' for item in items)
+        return (
+            '<!DOCTYPE html><html><head><title>Download</title></head><body>\n'
+            f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script>\n'
+            f'<ul>{links}</ul>{self.padding(self.scenario.page_kb * 256, len(items))}</body></html>'
+        ).encode('utf-8')
+
+    def mp3(self, name):
+        return _mp3_body(name, self.scenario.mp3_kb * 1024)
+
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, stereo: 417-byte frames of 1152 samples
+MP3_FRAME_HEADER = b'\xff\xfb\x90\x00'
+MP3_FRAME_BYTES = 417
+
+
+@functools.lru_cache(maxsize=256)
+def _mp3_body(name, size):
+    """A parseable CBR MP3: a small ID3v2 tag, an Info frame with the frame count, then frames"""
+    title = name.encode('utf-8')
+    frame = b'TIT2' + struct.pack('>I', len(title) + 1) + b'\x00\x00\x00' + title
+    tag = b'ID3\x03\x00\x00' + bytes((len(frame) >> 21 & 0x7F, len(frame) >> 14 & 0x7F,
+                                        len(frame) >> 7 & 0x7F, len(frame) & 0x7F)) + frame
+    frames = max(2, (size - len(tag)) // MP3_FRAME_BYTES)
+    info = MP3_FRAME_HEADER + bytes(32) + b'Info' + struct.pack('>III', 3, frames - 1, (frames - 1) * MP3_FRAME_BYTES)
+    block = hashlib.sha256(title).digest()
+    audio = MP3_FRAME_HEADER + (block * (MP3_FRAME_BYTES // len(block) + 1))[:MP3_FRAME_BYTES - 4]
+    body = tag + info.ljust(MP3_FRAME_BYTES, b'\x00') + audio * (frames - 1)
+    return body[:size] if len(body) >= size else body + bytes(size - len(body))
+
+
+def byte_range(header, length):
+    """(start, end) inclusive for a single "bytes=" Range header, or None to send everything"""
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (header or '').strip())
+    if not match or not length or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(0, length - int(last)), length - 1  # Suffix range: the last N bytes
+    else:
+        start, end = int(first), min(length - 1, int(last)) if last else length - 1
+    return (start, end) if start <= end else None
+
+
+class FakeJWHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so the pooled transport is exercised
+    server_version = 'FakeJW/1.0'
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def route(self):
+        """Return (status, content type, body)"""
+        parts = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        server = self.server
+        if parts.path == PUB_MEDIA_PATH:
+            body = server.pub_media(params)
+            return (200, 'application/json', body) if body is not None else (404, 'application/json', b'{}')
+        if parts.path.startswith(WEEK_PAGE_PREFIX) and 'Meeting-Schedule' in parts.path:
+            return 200, 'text/html; charset=utf-8', server.week_page(parts.path)
+        if parts.path.rstrip('/') == '/download':
+            body = server.download_page(params)
+            return (200, 'text/html; charset=utf-8', body) if body is not None else (404, 'text/html', b'')
+        if parts.path.startswith('/media/') and parts.path.endswith('.mp3'):
+            return 200, 'audio/mpeg', server.mp3(parts.path[len('/media/'):])
+        return 404, 'text/plain', b'not found'
+
+    def respond(self, send_body):
+        scenario = self.server.scenario
+        delay_ms = scenario.latency_ms + scenario.jitter_ms * self.server.random()
+        if scenario.slow_rate and self.server.draw('slow', self.path) < scenario.slow_rate:
+            delay_ms += scenario.slow_ms  # Tail latency: a few responses are much slower
+            self.server.record(slow=1)
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+        if scenario.error_rate and self.server.draw('error', self.path) < scenario.error_rate:
+            status, content_type, body = 503, 'text/plain', b'injected failure'
+            self.server.record(errors_injected=1)
+        else:
+            status, content_type, body = self.route()
+            if status == 404:
+                self.server.record(not_found=1)
+
+        requested = byte_range(self.headers.get('Range'), len(body)) if status == 200 else None
+        if requested is not None:
+            start, end = requested
+            status, total, body = 206, len(body), body[start:end + 1]
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if requested is not None:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{total}")
+        if len(body) > 1024 and 'gzip' in self.headers.get('Accept-Encoding', '') \
+                and not content_type.startswith('audio/'):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        sent = 0
+        if send_body:
+            try:
+                self.wfile.write(body)
+                sent = len(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Streaming clients hang up once they have what they need
+        self.server.record(requests=1, bytes=sent)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.respond(send_body=True)
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        self.respond(send_body=False)
+
+
+def scenario_arguments(parser):
+    """Add the Scenario options to an argparse parser"""
+    parser.add_argument("--weeks", type=int, default=9, help="Workbook weeks per issue (default 9)")
+    parser.add_argument("--langs", default="E", help="Comma-separated languages served (default E)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra latency, up to this much")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of responses delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=2000.0, help="Extra delay for slow responses")
+    parser.add_argument("--page-kb", type=int, default=64, help="Approximate size of each week page")
+    parser.add_argument("--mp3-kb", type=int, default=32, help="Size of each MP3 body")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for latency jitter and injected errors")
+    parser.add_argument("--published-through", metavar="YYYYMM",
+                        help="Answer 404 for workbook and Watchtower issues after this one")
+
+
+def scenario_from_args(args):
+    return Scenario(weeks=args.weeks, langs=[lang for lang in args.langs.split(',') if lang],
+                    latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                    slow_rate=args.slow_rate, slow_ms=args.slow_ms,
+                    page_kb=args.page_kb, mp3_kb=args.mp3_kb, seed=args.seed,
+                    published_through=args.published_through)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthetic pub-media JSON and jw.org pages locally")
+    parser.add_argument("--port", type=int, default=8765)
+    scenario_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = FakeJWServer(scenario_from_args(args), port=args.port)
+    print(f"Serving on {server.origin}")
+    print(f"  export JW_AUTO_PUB_MEDIA_URL={server.pub_media_url}")
+    print(f"  export JW_AUTO_JW_ORG_URL={server.origin}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
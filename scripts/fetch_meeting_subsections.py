@@ -4,48 +4,33 @@ Fetch individual section MP3 URLs for each meeting workbook week
 Extracts Bible Reading and Congregation Bible Study MP3s
 """
 
+import argparse
 import csv
-import json
-import re
-from urllib.request import urlopen
 from urllib.parse import urlencode, quote
 from urllib.error import HTTPError
 from pathlib import Path
 
+from bible_books import BIBLE_BOOKS
+from reference_extractor import fetch_references, parse_html_references
+
+import bible_index
+import http_cache
+import http_transport
+import pub_media
+
 # Configuration
 CSV_FILE = Path(__file__).parent.parent / "meeting_subsections_mp3s.csv"
 BASE_URL = "https://b.jw-cdn.org/apis/pub-media/GETPUBMEDIALINKS"
 MONTHS_TO_FETCH = 6
 
-# Bible book name to number mapping
-BIBLE_BOOKS = {
-    'Genesis': 1, 'Exodus': 2, 'Leviticus': 3, 'Numbers': 4, 'Deuteronomy': 5,
-    'Joshua': 6, 'Judges': 7, 'Ruth': 8, '1 Samuel': 9, '2 Samuel': 10,
-    '1 Kings': 11, '2 Kings': 12, '1 Chronicles': 13, '2 Chronicles': 14,
-    'Ezra': 15, 'Nehemiah': 16, 'Esther': 17, 'Job': 18, 'Psalms': 19,
-    'Proverbs': 20, 'Ecclesiastes': 21, 'Song of Solomon': 22, 'Isaiah': 23,
-    'Jeremiah': 24, 'Lamentations': 25, 'Ezekiel': 26, 'Daniel': 27,
-    'Hosea': 28, 'Joel': 29, 'Amos': 30, 'Obadiah': 31, 'Jonah': 32,
-    'Micah': 33, 'Nahum': 34, 'Habakkuk': 35, 'Zephaniah': 36, 'Haggai': 37,
-    'Zechariah': 38, 'Malachi': 39, 'Matthew': 40, 'Mark': 41, 'Luke': 42,
-    'John': 43, 'Acts': 44, 'Romans': 45, '1 Corinthians': 46, '2 Corinthians': 47,
-    'Galatians': 48, 'Ephesians': 49, 'Philippians': 50, 'Colossians': 51,
-    '1 Thessalonians': 52, '2 Thessalonians': 53, '1 Timothy': 54, '2 Timothy': 55,
-    'Titus': 56, 'Philemon': 57, 'Hebrews': 58, 'James': 59, '1 Peter': 60,
-    '2 Peter': 61, '1 John': 62, '2 John': 63, '3 John': 64, 'Jude': 65,
-    'Revelation': 66
-}
-
-# Cache for lesson mappings
-LESSON_CACHE = {}
+# Shared with every other stage in the process
+LESSON_CACHE = pub_media.LESSON_CACHE
 
 
 def fetch_json(url):
     """Fetch JSON data from URL"""
     try:
-        with urlopen(url, timeout=15) as response:
-            data = response.read().decode('utf-8')
-            return json.loads(data)
+        return http_cache.fetch_json(url, timeout=15)
     except HTTPError as e:
         if e.code == 404:
             return None
@@ -59,8 +44,7 @@ def fetch_json(url):
 def fetch_html(url):
     """Fetch HTML content from URL"""
     try:
-        with urlopen(url, timeout=15) as response:
-            return response.read().decode('utf-8')
+        return http_transport.get_text(url, timeout=15)
     except Exception as e:
         print(f"Error fetching {url}: {e}")
         return None
@@ -68,32 +52,7 @@ def fetch_html(url):
 
 def get_lesson_mapping():
     """Fetch and cache lesson number to MP3 URL mapping"""
-    if LESSON_CACHE:
-        return LESSON_CACHE
-
-    params = {
-        'pub': 'lfb',
-        'fileformat': 'MP3',
-        'output': 'json',
-        'langwritten': 'E'
-    }
-
-    url = f"{BASE_URL}?{urlencode(params)}"
-    data = fetch_json(url)
-
-    if not data or 'files' not in data:
-        return {}
-
-    # Extract lesson mappings
-    for lang_data in data['files'].values():
-        if 'MP3' in lang_data:
-            for idx, item in enumerate(lang_data['MP3']):
-                mp3_url = item.get('file', {}).get('url', '')
-                if mp3_url:
-                    # Lesson numbers start at 0 in the API
-                    LESSON_CACHE[idx] = mp3_url
-
-    return LESSON_CACHE
+    return pub_media.get_lesson_mp3s()
 
 
 def get_bible_chapter_url(book_name, chapter):
@@ -102,13 +61,8 @@ def get_bible_chapter_url(book_name, chapter):
     if not book_num:
         return None
 
-    # Format: bi12_{booknum}_Ca_E_{chapter}.mp3
-    # Note: book number needs to be zero-padded to 2 digits, chapter doesn't
-    chapter_str = str(chapter).zfill(2)
-    book_str = str(book_num).zfill(2)
-
-    # Construct URL - this is the known pattern for Bible audio
-    return f"https://cfp2.jw-cdn.org/a/bi12_{book_str}_Ca_E_{chapter_str}.mp3"
+    media = bible_index.get_index().lookup(book_num, chapter)
+    return media.url if media else None
 
 
 def parse_week_page(html_content, week_name):
@@ -116,51 +70,39 @@ def parse_week_page(html_content, week_name):
     if not html_content:
         return []
 
+    bible, lessons = parse_html_references(html_content)
+    return build_sections(bible, lessons, week_name)
+
+
+def build_sections(bible, lessons, week_name):
+    """Turn an extracted Bible reading and lesson list into CSV sections"""
     sections = []
 
-    # Extract Bible reading - look for patterns like "Song of Solomon 2:1-17"
-    # The pattern is typically: Book Chapter:Verses
-    bible_pattern = r'((?:[12] )?[A-Z][a-z]+(?: [A-Z][a-z]+)*)\s+(\d+):(\d+(?:-\d+)?)'
-    bible_matches = re.findall(bible_pattern, html_content)
+    if bible:
+        chapters = bible.chapters
+        for chapter_num in chapters:
+            # Get MP3 URL for this chapter
+            mp3_url = get_bible_chapter_url(bible.book, chapter_num)
+            if mp3_url:
+                sections.append({
+                    'week': week_name,
+                    'section': 'Bible Reading',
+                    'reference': bible.reference if len(chapters) == 1 else f"{bible.book} {chapter_num}",
+                    'url': mp3_url
+                })
 
-    if bible_matches:
-        # Get the first match (main Bible reading)
-        book, chapter, verses = bible_matches[0]
-        book = book.strip()
-        chapter_num = int(chapter)
+    lesson_map = get_lesson_mapping()
 
-        # Get MP3 URL for this chapter
-        mp3_url = get_bible_chapter_url(book, chapter_num)
+    for lesson_num in lessons:
+        mp3_url = lesson_map.get(lesson_num)
         if mp3_url:
             sections.append({
                 'week': week_name,
-                'section': 'Bible Reading',
-                'reference': f"{book} {chapter}:{verses}",
+                'section': 'Congregation Bible Study',
+                'reference': f"Lesson {lesson_num}",
                 'url': mp3_url
             })
 
-    # Extract Congregation Bible Study lesson references
-    # Look for patterns like "lfb lesson 32" or "lessons 32-33"
-    cbs_pattern = r'lfb["\s]+(?:lesson|lessons)\s+(\d+)(?:\s*[,\-]\s*(\d+))?'
-    cbs_matches = re.findall(cbs_pattern, html_content, re.IGNORECASE)
-
-    lesson_map = get_lesson_mapping()
-
-    if cbs_matches:
-        for match in cbs_matches:
-            lesson1 = int(match[0])
-            lesson2 = int(match[1]) if match[1] else lesson1
-
-            for lesson_num in range(lesson1, lesson2 + 1):
-                mp3_url = lesson_map.get(lesson_num)
-                if mp3_url:
-                    sections.append({
-                        'week': week_name,
-                        'section': 'Congregation Bible Study',
-                        'reference': f"Lesson {lesson_num}",
-                        'url': mp3_url
-                    })
-
     return sections
 
 
@@ -201,11 +143,12 @@ def fetch_meeting_weeks():
     return weeks
 
 
-def fetch_all_subsections():
+def fetch_all_subsections(stream=True):
     """Fetch all sub-section MP3s for all meeting weeks"""
     print("Fetching lesson mappings...")
     get_lesson_mapping()
     print(f"Loaded {len(LESSON_CACHE)} lessons")
+    print(f"Loaded {len(bible_index.get_index())} Bible chapters")
 
     print("\nFetching meeting weeks...")
     weeks = fetch_meeting_weeks()
@@ -237,14 +180,22 @@ def fetch_all_subsections():
         page_url = f"https://www.jw.org/en/library/jw-meeting-workbook/{workbook_issue}/{url_path}/"
 
         print(f"  Fetching: {page_url}")
-        html = fetch_html(page_url)
-
-        if html:
-            sections = parse_week_page(html, week)
-            all_sections.extend(sections)
-            print(f"  Found {len(sections)} sections")
+        if stream:
+            # Parse while downloading; stops reading once both references are found
+            try:
+                sections = build_sections(*fetch_references(page_url, timeout=15), week)
+            except Exception as e:
+                print(f"  Could not fetch page: {e}")
+                continue
         else:
-            print(f"  Could not fetch page")
+            html = fetch_html(page_url)
+            if not html:
+                print(f"  Could not fetch page")
+                continue
+            sections = parse_week_page(html, week)
+
+        all_sections.extend(sections)
+        print(f"  Found {len(sections)} sections")
 
     return all_sections
 
@@ -272,12 +223,17 @@ def write_csv(sections):
     print(f"\n✓ Wrote {len(sections)} sections to {CSV_FILE}")
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch Bible Reading and CBS MP3s for each meeting workbook week")
+    parser.add_argument("--no-stream", dest="stream", action="store_false",
+                        help="Download each week page in full before parsing")
+    args = parser.parse_args(argv)
+
     print("=" * 60)
     print("Meeting Workbook Sub-Section MP3 Fetcher")
     print("=" * 60)
 
-    sections = fetch_all_subsections()
+    sections = fetch_all_subsections(stream=args.stream)
     write_csv(sections)
 
     print("\nDone!")
@@ -4,16 +4,9 @@ set -euo pipefail
 ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 VENV_ACTIVATE="$ROOT_DIR/.venv/bin/activate"
 
-if [[ ! -f "$VENV_ACTIVATE" ]]; then
-  cat <<MSG >&2
-Virtual environment not found at $ROOT_DIR/.venv.
-Create it first:
-  cd $ROOT_DIR
-  python3 -m venv .venv
-  source .venv/bin/activate
-  pip install --upgrade pip requests beautifulsoup4
-MSG
-  exit 1
+# Optional: a venv with beautifulsoup4 is used if present (download pages don't need it)
+if [[ -f "$VENV_ACTIVATE" ]]; then
+  source "$VENV_ACTIVATE"
 fi
 
 # Default issues if none provided
@@ -22,13 +15,7 @@ if [[ $# -gt 0 ]]; then
   issues=("$@")
 fi
 
-source "$VENV_ACTIVATE"
-
-for issue in "${issues[@]}"; do
-  url="https://www.jw.org/download/?issue=${issue}&output=html&pub=mwb&fileformat=MP3%2CAAC&alllangs=0&langwritten=E&txtCMSLang=E&isBible=0"
-  output="$ROOT_DIR/workbook_${issue}.csv"
-  echo "Fetching issue ${issue} -> $output"
-  "$ROOT_DIR/scripts/extract_jw_audio.py" "$url" > "$output"
-done
-
-deactivate
+# One process fetches every issue concurrently and writes workbook_<issue>.csv for each
+echo "Fetching issues ${issues[*]} -> $ROOT_DIR/workbook_<issue>.csv"
+python3 "$ROOT_DIR/scripts/extract_jw_audio.py" --ordered --issue "${issues[@]}" \
+  --output "$ROOT_DIR/workbook_{issue}.csv"
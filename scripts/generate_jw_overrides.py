@@ -1,72 +1,106 @@
 #!/usr/bin/env python3
+import argparse
 import csv
+import hashlib
+import json
+import os
+import struct
+import sys
 from collections import defaultdict
-from datetime import datetime
+from datetime import date
 from pathlib import Path
 
-ROOT = Path(__file__).resolve().parents[1]
-MONTH_ORDER = {m.lower(): i for i, m in enumerate([
-    "January","February","March","April","May","June","July","August","September","October","November","December"], start=1)}
+import config
+import metrics
+import week_key
+
 
 def csv_path(name):
-    return ROOT / name
-
-
-def infer_week_start(label, current_year, last_month):
-    clean = label.replace("—", "-").replace("–", "-")
-    core = clean.split(",")[0].strip()
-    tokens = core.split()
-    month_name = tokens[0]
-    month_index = MONTH_ORDER[month_name.lower()]
-    if last_month is not None and month_index < last_month:
-        current_year += 1
-    day_token = tokens[1]
-    if "-" in day_token:
-        start_day = day_token.split("-")[0]
-    else:
-        start_day = day_token
-    date_obj = datetime.strptime(f"{month_name} {start_day} {current_year}", "%B %d %Y")
-    return date_obj.strftime("%Y-%m-%d"), current_year, month_index
+    return config.DATA_DIR / name
 
 
-def load_rows(path, label_field, start_year):
-    rows = []
-    year = start_year
-    last_month = None
-    with path.open() as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            label = row[label_field].strip()
-            url = row["MP3 URL"].strip()
-            week_start, year, last_month = infer_week_start(label, year, last_month)
-            rows.append((week_start, url))
-    return rows
+def _warn_unparsed(labels, keys):
+    for label, key in zip(labels, keys):
+        if key is None:
+            print(f"Skipping unparseable week label: {label!r}", file=sys.stderr)
+
+
+def week_keys(labelled, pub="mwb"):
+    """WeekKeys for (label, url) pairs, in any order; the year comes from the issue in each MP3 URL"""
+    labelled = list(labelled)
+    keys = week_key.resolve((label for label, _ in labelled), pub,
+                            (week_key.issue_from_url(url) for _, url in labelled))
+    _warn_unparsed((label for label, _ in labelled), keys)
+    return keys
+
+
+def week_rows(labelled, pub="mwb"):
+    """Convert (label, url) pairs to (week_start, url) rows"""
+    labelled = list(labelled)
+    return [(key.week_start, url.strip()) for key, (_, url) in zip(week_keys(labelled, pub), labelled) if key]
+
 
+def week_sections(labelled, known=None):
+    """Group (label, section, url) triples by week start
 
-def load_sections(path, start_year):
+    known maps normalized workbook labels to their WeekKeys, which give each
+    section label its year (see load_known).
+    """
+    labelled = list(labelled)
+    keys = week_key.resolve((label for label, _, _ in labelled), "mwb", known=known)
+    _warn_unparsed((label for label, _, _ in labelled), keys)
     data = defaultdict(lambda: {"Bible Reading": [], "Congregation Bible Study": []})
-    year = start_year
-    last_month = None
-    with path.open() as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            label = row["Meeting Week"].strip()
-            url = row["MP3 URL"].strip()
-            section = row["Section"].strip()
-            week_start, year, last_month = infer_week_start(label, year, last_month)
-            data[week_start][section].append(url)
+    for key, (_, section, url) in zip(keys, labelled):
+        if key:
+            data[key.week_start][section.strip()].append(url.strip())
     return data
 
 
-def emit_map(name, rows):
+def _labelled(path, *fields):
+    with path.open() as f:
+        return [tuple(row[field] for field in fields) for row in csv.DictReader(f)]
+
+
+def load_rows(path, label_field, pub="mwb"):
+    return week_rows(_labelled(path, label_field, "MP3 URL"), pub)
+
+
+def load_known(path, label_field="Meeting Week", pub="mwb"):
+    """Normalized label -> WeekKey for the weeks of a CSV"""
+    labelled = _labelled(path, label_field, "MP3 URL")
+    return {week_key.normalize(label): key for (label, _), key in zip(labelled, week_keys(labelled, pub)) if key}
+
+
+def load_durations(path):
+    """MP3 URL -> seconds from a CSV's Duration column (empty if it has none)"""
+    with path.open() as f:
+        return {row["MP3 URL"].strip(): float(row["Duration"]) for row in csv.DictReader(f) if row.get("Duration")}
+
+
+def load_sections(path, known=None):
+    return week_sections(_labelled(path, "Meeting Week", "Section", "MP3 URL"), known)
+
+
+def render_map(name, rows):
     lines = [f"private val {name} = mapOf("]
     for start, url in rows:
         lines.append(f"    \"{start}\" to \"{url}\",")
     lines.append(")\n")
-    print("\n".join(lines))
+    return "\n".join(lines)
+
+
+def duration_list(urls, durations):
+    """Kotlin listOf() of track durations in milliseconds (0L where unknown)"""
+    return "listOf(" + ", ".join(f"{round(durations[url] * 1000) if durations.get(url) else 0}L" for url in urls) + ")"
 
 
-def emit_sections(data):
+def render_sections(data, durations=None):
+    """MEETING_SECTIONS with per-track durations (url -> seconds; 0L where unknown) for every week
+
+    Every entry names all four MeetingSections parameters, so the generated
+    file doesn't rely on Kotlin default values.
+    """
+    durations = durations or {}
     lines = ["private val MEETING_SECTIONS = mapOf("]
     for week_start, sections in sorted(data.items()):
         bible = sections.get("Bible Reading", [])
@@ -79,19 +113,192 @@ def emit_sections(data):
         lines.append("        congregationStudy = listOf(")
         for url in study:
             lines.append(f"            \"{url}\",")
-        lines.append("        )")
+        lines.append("        ),")
+        lines.append(f"        bibleReadingDurationsMs = {duration_list(bible, durations)},")
+        lines.append(f"        congregationStudyDurationsMs = {duration_list(study, durations)}")
         lines.append("    ),")
     lines.append(")\n")
-    print("\n".join(lines))
+    return "\n".join(lines)
+
+
+def emit_map(name, rows):
+    print(render_map(name, rows))
+
+
+def emit_sections(data, durations=None):
+    print(render_sections(data, durations))
+
+
+@metrics.timed('overrides.render')
+def render_overrides(workbook_rows, watchtower_rows, sections, durations=None):
+    """Render all three Kotlin maps, as printed by main()"""
+    return "\n".join([
+        render_map("WORKBOOK_OVERRIDES", workbook_rows),
+        render_map("WATCHTOWER_OVERRIDES", watchtower_rows),
+        render_sections(sections, durations),
+    ]) + "\n"
+
+
+# Binary override asset (read by OverrideAsset.kt). All integers are big-endian int32:
+#   "JWOV", u16 version, u16 reserved
+#   counts: workbook weeks W, watchtower weeks T, section weeks S, tracks K, strings N
+#   workbook days[W], workbook url ids[W], watchtower days[T], watchtower url ids[T]
+#   section days[S], section offsets[2S + 1], track url ids[K], track durations ms[K]
+#   string offsets[N + 1], then the UTF-8 string data
+# Days are epoch days (LocalDate.toEpochDay()), ascending, so a lookup is a binary search
+# of one array. Week i's Bible reading tracks are offsets[2i]..offsets[2i + 1] and its
+# congregation study tracks offsets[2i + 1]..offsets[2i + 2]. Each URL is stored once.
+BINARY_MAGIC = b"JWOV"
+BINARY_VERSION = 1
+
+
+def epoch_day(week_start):
+    return date.fromisoformat(week_start).toordinal() - date(1970, 1, 1).toordinal()
+
+
+def _ints(values):
+    values = list(values)
+    return struct.pack(f">{len(values)}i", *values)
+
+
+@metrics.timed('overrides.render_binary')
+def render_binary(workbook_rows, watchtower_rows, sections, durations=None):
+    """Render the same overrides as render_overrides() as the compact binary asset (bytes)"""
+    durations = durations or {}
+    strings = {}
+
+    def intern(url):
+        return strings.setdefault(url, len(strings))
+
+    tables = []
+    for rows in (workbook_rows, watchtower_rows):
+        rows = sorted(dict(rows).items())
+        tables.append(([epoch_day(start) for start, _ in rows], [intern(url) for _, url in rows]))
+
+    days, offsets, tracks = [], [0], []
+    for week_start, week_sections in sorted(sections.items()):
+        days.append(epoch_day(week_start))
+        for section in ("Bible Reading", "Congregation Bible Study"):
+            tracks.extend(week_sections.get(section, []))
+            offsets.append(len(tracks))
+    track_ids = [intern(url) for url in tracks]
+    track_ms = [round(durations[url] * 1000) if durations.get(url) else 0 for url in tracks]
+
+    data = [url.encode("utf-8") for url in strings]
+    string_offsets = [0]
+    for encoded in data:
+        string_offsets.append(string_offsets[-1] + len(encoded))
+
+    (workbook_days, workbook_ids), (watchtower_days, watchtower_ids) = tables
+    return b"".join([
+        BINARY_MAGIC, struct.pack(">HH", BINARY_VERSION, 0),
+        _ints([len(workbook_days), len(watchtower_days), len(days), len(tracks), len(strings)]),
+        _ints(workbook_days), _ints(workbook_ids), _ints(watchtower_days), _ints(watchtower_ids),
+        _ints(days), _ints(offsets), _ints(track_ids), _ints(track_ms),
+        _ints(string_offsets), *data,
+    ])
+
+
+def week_hashes(workbook_rows, watchtower_rows, sections, durations=None):
+    """Hash everything emitted for each week, so changes can be reported per week"""
+    content = defaultdict(dict)
+    for week_start, url in workbook_rows:
+        content[week_start]["workbook"] = url
+    for week_start, url in watchtower_rows:
+        content[week_start]["watchtower"] = url
+    for week_start, week_sections in sections.items():
+        content[week_start]["sections"] = week_sections
+        known = {url: durations[url] for urls in week_sections.values() for url in urls if (durations or {}).get(url)}
+        if known:
+            content[week_start]["durations"] = known
+    return {
+        week_start: hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        for week_start, data in sorted(content.items())
+    }
+
+
+def manifest_path(target):
+    target = Path(target)
+    return target.with_name(f".{target.name}.manifest.json")
+
+
+def diff_manifest(old, new):
+    added = sorted(week for week in new if week not in old)
+    removed = sorted(week for week in old if week not in new)
+    changed = sorted(week for week in new if week in old and old[week] != new[week])
+    return added, changed, removed
+
+
+def write_atomic(path, text):
+    """Replace path with text (str, or bytes for the binary asset) through a temp file"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    if isinstance(text, bytes):
+        tmp.write_bytes(text)
+    else:
+        tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+@metrics.timed('overrides.write')
+def write_if_changed(target, text, hashes):
+    """Write the Kotlin file (or binary asset) only if its content differs; returns True if it was rewritten
+
+    A per-week hash manifest next to the target is used to report which weeks
+    were added, changed or removed. Unchanged output leaves the file (and its
+    mtime) alone so Gradle has nothing to recompile.
+    """
+    target = Path(target)
+    manifest = manifest_path(target)
+    try:
+        old_hashes = json.loads(manifest.read_text(encoding="utf-8")).get("weeks", {})
+    except (OSError, ValueError):
+        old_hashes = {}
+    added, changed, removed = diff_manifest(old_hashes, hashes)
+
+    try:
+        unchanged = (target.read_bytes() if isinstance(text, bytes) else target.read_text(encoding="utf-8")) == text
+    except OSError:
+        unchanged = False
+
+    if unchanged:
+        print(f"✓ {target} is up to date (not rewritten)")
+    else:
+        write_atomic(target, text)
+        print(f"✓ Wrote {target}")
+    for label, weeks in (("Added", added), ("Changed", changed), ("Removed", removed)):
+        if weeks:
+            print(f"  {label} {len(weeks)} week(s): {', '.join(weeks)}")
+
+    if hashes != old_hashes:
+        write_atomic(manifest, json.dumps({"weeks": hashes}, indent=2, sort_keys=True) + "\n")
+    return not unchanged
+
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the Kotlin override maps from the CSVs")
+    parser.add_argument("--write", metavar="PATH",
+                        help="Write the Kotlin file directly (only if its content changed) instead of printing")
+    parser.add_argument("--binary", metavar="PATH",
+                        help="Write the compact binary asset read by OverrideAsset.kt (only if its content changed)")
+    args = parser.parse_args(argv)
 
-def main():
-    workbook_rows = load_rows(csv_path("meeting_workbook_mp3s.csv"), "Meeting Week", 2025)
-    watchtower_rows = load_rows(csv_path("watchtower_study_mp3s.csv"), "Study Week", 2025)
-    sections = load_sections(csv_path("meeting_subsections_mp3s.csv"), 2025)
+    workbook_rows = load_rows(csv_path("meeting_workbook_mp3s.csv"), "Meeting Week", "mwb")
+    watchtower_rows = load_rows(csv_path("watchtower_study_mp3s.csv"), "Study Week", "w")
+    known = load_known(csv_path("meeting_workbook_mp3s.csv"))
+    sections = load_sections(csv_path("meeting_subsections_mp3s.csv"), known)
+    durations = load_durations(csv_path("meeting_subsections_mp3s.csv"))
+    if args.write or args.binary:
+        hashes = week_hashes(workbook_rows, watchtower_rows, sections, durations)
+        if args.write:
+            write_if_changed(args.write, render_overrides(workbook_rows, watchtower_rows, sections, durations), hashes)
+        if args.binary:
+            write_if_changed(args.binary, render_binary(workbook_rows, watchtower_rows, sections, durations), hashes)
+        return
     emit_map("WORKBOOK_OVERRIDES", workbook_rows)
     emit_map("WATCHTOWER_OVERRIDES", watchtower_rows)
-    emit_sections(sections)
+    emit_sections(sections, durations)
 
 
 if __name__ == "__main__":
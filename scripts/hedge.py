@@ -0,0 +1,163 @@
+"""
+Hedged requests for pub-media lookups
+When hedging is on and a lookup hasn't answered by the host's observed p95
+latency, a duplicate request is sent (to an alternate endpoint if the host has
+one) and whichever answers first wins. Hedges are paid for from a token bucket
+that refills by HEDGE_RATIO per lookup, so hedging adds at most ~10% load.
+
+Environment overrides:
+  JW_AUTO_HEDGE=1             enable hedging (scripts also take --hedge)
+  JW_AUTO_HEDGE_PERCENTILE    latency percentile that triggers a hedge (default 0.95)
+  JW_AUTO_LATENCY_LOG         append one JSON line per lookup to this file on exit
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from urllib.error import HTTPError
+from urllib.parse import urlsplit, urlunsplit
+
+import http_transport
+import resilience
+from adaptive import percentile
+
+ENABLED = os.environ.get('JW_AUTO_HEDGE') == '1'
+PERCENTILE = float(os.environ.get('JW_AUTO_HEDGE_PERCENTILE', 0.95))
+HEDGE_RATIO = 0.1         # hedge tokens earned per lookup
+HEDGE_BURST = 2.0         # tokens available up front (and the bucket's cap)
+DEFAULT_DELAY = 0.5       # seconds, until a host has MIN_SAMPLES latencies
+MIN_DELAY = 0.02
+MIN_SAMPLES = 5
+WINDOW = 64
+
+# Hosts serving the same API, tried for the duplicate request
+ALTERNATE_HOSTS = {
+    'b.jw-cdn.org': 'app.jw-cdn.org',
+}
+
+LATENCY_LOG = os.environ.get('JW_AUTO_LATENCY_LOG')
+
+_lock = threading.Lock()
+_samples = {}
+_tokens = HEDGE_BURST
+_records = []
+STATS = {'lookups': 0, 'hedges': 0, 'hedges_won': 0, 'hedges_denied': 0}
+
+
+def enable(enabled=True):
+    global ENABLED
+    ENABLED = enabled
+
+
+def hedge_delay(host):
+    """Seconds to wait before hedging a lookup to host (its observed latency percentile)"""
+    with _lock:
+        samples = list(_samples.get(host, ()))
+    if len(samples) < MIN_SAMPLES:
+        return DEFAULT_DELAY
+    return max(MIN_DELAY, percentile(samples, PERCENTILE))
+
+
+def _record(host, latency, hedged, won):
+    global _tokens
+    with _lock:
+        _samples.setdefault(host, deque(maxlen=WINDOW)).append(latency)
+        _tokens = min(HEDGE_BURST, _tokens + HEDGE_RATIO)
+        STATS['lookups'] += 1
+        if won:
+            STATS['hedges_won'] += 1
+        if LATENCY_LOG:
+            _records.append({'host': host, 'latency': round(latency, 4), 'hedged': hedged, 'hedge_won': won})
+
+
+def _take_token():
+    global _tokens
+    with _lock:
+        if _tokens >= 1.0:
+            _tokens -= 1.0
+            STATS['hedges'] += 1
+            return True
+        STATS['hedges_denied'] += 1
+        return False
+
+
+def alternate_url(url):
+    parts = urlsplit(url)
+    alternate = ALTERNATE_HOSTS.get(parts.hostname)
+    if not alternate:
+        return url
+    netloc = alternate if parts.port is None else f"{alternate}:{parts.port}"
+    return urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+
+
+def _is_answer(error):
+    """True for errors that are the server's real answer rather than a failed attempt"""
+    return isinstance(error, HTTPError) and not resilience.is_retryable_status(error.code)
+
+
+def fetch(url, headers=None, timeout=http_transport.DEFAULT_TIMEOUT):
+    """GET url and return (body, response headers), hedging a slow request if enabled
+
+    Errors are raised like http_transport.get. A 404/304 is an answer and wins
+    like a 200; if both requests fail outright, the first request's error is raised.
+    """
+    host = urlsplit(url).hostname
+    started = time.monotonic()
+    if not ENABLED:
+        response = http_transport.get(url, headers=headers, timeout=timeout, buffer=True)
+        body = response.read()
+        _record(host, time.monotonic() - started, hedged=False, won=False)
+        return body, response.headers
+
+    results = queue.Queue()
+
+    def attempt(target, is_hedge):
+        try:
+            response = http_transport.get(target, headers=headers, timeout=timeout, hedge=is_hedge, buffer=True)
+            results.put((is_hedge, response.read(), response.headers, None))
+        except Exception as e:  # pylint: disable=broad-except
+            results.put((is_hedge, None, None, e))
+
+    # Daemon threads: a losing request finishes (or times out) in the background
+    threading.Thread(target=attempt, args=(url, False), daemon=True).start()
+    pending = 1
+    hedged = False
+    try:
+        first = results.get(timeout=hedge_delay(host))
+    except queue.Empty:
+        if _take_token():
+            hedged = True
+            threading.Thread(target=attempt, args=(alternate_url(url), True), daemon=True).start()
+            pending += 1
+        first = results.get()
+    pending -= 1
+
+    errors = {}
+    outcome = first
+    while outcome[3] is not None and not _is_answer(outcome[3]):
+        errors[outcome[0]] = outcome[3]
+        if not pending:
+            _record(host, time.monotonic() - started, hedged, won=False)
+            raise errors.get(False, outcome[3])
+        outcome = results.get()
+        pending -= 1
+
+    is_hedge, body, response_headers, error = outcome
+    _record(host, time.monotonic() - started, hedged, won=is_hedge)
+    if error is not None:
+        raise error  # A definite answer such as 404 or 304 wins like a 200 does
+    return body, response_headers
+
+
+def _write_latency_log():
+    if LATENCY_LOG and _records:
+        with open(LATENCY_LOG, 'a', encoding='utf-8') as f:
+            for record in _records:
+                f.write(json.dumps(record) + '\n')
+
+
+atexit.register(_write_latency_log)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk HTTP cache for GETPUBMEDIALINKS lookups
+Responses are keyed by the normalized request URL, served locally while fresh,
+served stale while a background revalidation runs, and otherwise revalidated
+with If-None-Match / If-Modified-Since so unchanged catalogs cost a 304.
+
+Environment overrides:
+  JW_AUTO_CACHE_DIR        cache directory (default: <cache root>/http)
+  JW_AUTO_CACHE_TTL        seconds a response is served without any request
+  JW_AUTO_CACHE_STALE      extra seconds a stale response is served while revalidating
+  JW_AUTO_CACHE_MAX_BYTES  size cap; least recently used entries are evicted first
+  JW_AUTO_NO_CACHE=1       bypass the cache entirely
+"""
+
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import config
+import hedge
+import metrics
+import resilience
+
+CACHE_DIR = Path(os.environ.get('JW_AUTO_CACHE_DIR', config.CACHE_ROOT / 'http'))
+TTL = int(os.environ.get('JW_AUTO_CACHE_TTL', 6 * 60 * 60))  # 6 hours
+STALE_WHILE_REVALIDATE = int(os.environ.get('JW_AUTO_CACHE_STALE', 7 * 24 * 60 * 60))  # 1 week
+MAX_BYTES = int(os.environ.get('JW_AUTO_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 64 MB
+DISABLED = os.environ.get('JW_AUTO_NO_CACHE') == '1'
+
+_evict_lock = threading.Lock()
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+
+def normalize_url(url):
+    """Normalize a URL so equivalent requests share one cache entry"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+
+def cache_key(url):
+    return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+
+def _paths(key):
+    return CACHE_DIR / f"{key}.json", CACHE_DIR / f"{key}.body"
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def load_entry(url):
+    """Return (meta, body) for a cached URL, or (None, None) if missing"""
+    meta_path, body_path = _paths(cache_key(url))
+    try:
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        body = body_path.read_bytes()
+    except (OSError, ValueError):
+        return None, None
+    if len(body) != meta.get('size'):
+        return None, None  # Torn write from an interrupted run
+    try:
+        os.utime(body_path)  # Body mtime doubles as the LRU access time
+    except OSError:
+        pass
+    return meta, body
+
+
+def store_entry(url, body, headers):
+    """Persist a 200 response and evict old entries if over the size cap"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    meta_path, body_path = _paths(cache_key(url))
+    meta = {
+        'url': normalize_url(url),
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'stored_at': time.time(),
+        'size': len(body),
+    }
+    _write_atomic(body_path, body)
+    _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+    evict()
+
+
+def drop_entry(url):
+    """Delete a cached entry, e.g. one whose body turned out to be unusable"""
+    for path in _paths(cache_key(url)):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def touch_entry(url, meta):
+    """Mark a cached entry as fresh again after a 304"""
+    meta = dict(meta, stored_at=time.time())
+    meta_path, _ = _paths(cache_key(url))
+    _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the cache fits in max_bytes"""
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    with _evict_lock:
+        entries = []
+        total = 0
+        for body_path in CACHE_DIR.glob('*.body'):
+            try:
+                stat = body_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, body_path))
+            total += stat.st_size
+        if total <= max_bytes:
+            return
+        for _, size, body_path in sorted(entries):
+            for path in (body_path, body_path.with_suffix('.json')):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
+            if total <= max_bytes:
+                break
+
+
+def _conditional_fetch(url, meta, timeout):
+    """Fetch url, sending validators from meta; returns (body, headers) or (None, None) on 304"""
+    headers = {}
+    if meta:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        return hedge.fetch(url, headers=headers, timeout=timeout)
+    except HTTPError as e:
+        if e.code == 304 and meta:
+            return None, None
+        raise
+
+
+def revalidate(url, meta, timeout):
+    """Revalidate a cached entry and return the current body"""
+    body, headers = _conditional_fetch(url, meta, timeout)
+    if body is None:
+        metrics.count('cache.not_modified')
+        touch_entry(url, meta)
+        return None
+    _check_length(url, body, headers)
+    metrics.count('cache.stored')
+    store_entry(url, body, headers)
+    return body
+
+
+def _check_length(url, body, headers):
+    """Refuse to cache a body shorter or longer than its Content-Length"""
+    length = headers.get('Content-Length')
+    if headers.get('Content-Encoding') or not (length or '').isdigit():
+        return  # Compressed: the transport checks the stream ends where it should
+    if int(length) != len(body):
+        raise URLError(http.client.IncompleteRead(body, int(length) - len(body)))
+
+
+def _revalidate_in_background(url, meta, timeout):
+    key = cache_key(url)
+    with _revalidating_lock:
+        if key in _revalidating:
+            return
+        _revalidating.add(key)
+
+    def run():
+        try:
+            revalidate(url, meta, timeout)
+        except Exception:  # pylint: disable=broad-except
+            pass  # The stale copy stays in place; the next run tries again
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard(key)
+
+    # Non-daemon so a short script still finishes refreshing the entry on exit
+    threading.Thread(target=run, name=f"revalidate-{key[:8]}").start()
+
+
+def cached_get(url, timeout=15, ttl=None, stale_ttl=None):
+    """GET url through the disk cache and return the response body as bytes
+
+    Raises HTTPError / URLError like urlopen when there is no usable cached copy.
+    A stale copy stands in for connection errors and 5xx responses only; a 4xx
+    answer (the resource was removed) is raised even when a copy is cached.
+    """
+    if DISABLED:
+        metrics.count('cache.bypassed')
+        return hedge.fetch(url, timeout=timeout)[0]
+
+    ttl = TTL if ttl is None else ttl
+    stale_ttl = STALE_WHILE_REVALIDATE if stale_ttl is None else stale_ttl
+    meta, body = load_entry(url)
+
+    if meta is not None:
+        age = time.time() - meta.get('stored_at', 0)
+        if age < ttl:
+            metrics.count('cache.hit')
+            return body
+        if age < ttl + stale_ttl:
+            metrics.count('cache.stale_hit')
+            _revalidate_in_background(url, meta, timeout)
+            return body
+
+    metrics.count('cache.miss' if meta is None else 'cache.revalidated')
+    try:
+        fresh = revalidate(url, meta, timeout)
+    except (URLError, OSError) as e:
+        if isinstance(e, HTTPError) and e.code < 500 and not resilience.is_retryable_status(e.code):
+            raise  # 404 / 410: the resource is gone, so the cached copy is no longer valid
+        if body is not None:
+            metrics.count('cache.offline_hit')
+            return body  # Serve stale rather than fail while offline
+        raise
+    return body if fresh is None else fresh
+
+
+@metrics.timed('parse.json')
+def _decode_json(body):
+    return json.loads(body.decode('utf-8'))
+
+
+def fetch_json(url, timeout=15, **kwargs):
+    """Fetch and decode JSON through the disk cache
+
+    A body that doesn't decode is dropped from the cache, so the next call
+    fetches it again instead of failing the same way for a whole TTL.
+    """
+    body = cached_get(url, timeout=timeout, **kwargs)
+    try:
+        return _decode_json(body)
+    except ValueError:
+        drop_entry(url)
+        raise
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Pooled keep-alive HTTP transport shared by the data scripts
+Reuses connections per host (one TCP/TLS handshake per pooled connection instead
+of one per request), negotiates gzip/deflate with streaming decompression, and
+caps the number of concurrent connections per host. Transient failures are
+retried with backoff and failing hosts are short-circuited (see resilience.py).
+
+Errors are raised as urllib.error.HTTPError / URLError so callers can keep
+their existing urlopen error handling.
+"""
+
+import http.client
+import io
+import json
+import socket
+import threading
+import time
+import zlib
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+
+import adaptive
+import metrics
+import resilience
+
+USER_AGENT = "JW-Auto-Scripts/1.0 (+https://github.com/mikesibiu/JW-Auto)"
+DEFAULT_TIMEOUT = 15
+CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 5
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+
+# Maximum concurrent connections per host
+DEFAULT_HOST_LIMIT = 6
+HOST_LIMITS = {
+    'b.jw-cdn.org': 8,
+    'www.jw.org': 4,
+    'cfp2.jw-cdn.org': 8,
+}
+# Extra connections per host kept for hedged requests, so a hedge never
+# queues behind the slow requests it is meant to overtake
+HEDGE_SLOTS = 2
+
+# Errors that mean a pooled keep-alive connection was closed by the server
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class HostPool:
+    """Idle keep-alive connections for one (scheme, host, port)"""
+
+    def __init__(self, scheme, host, port, limit):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+        self._hedge_slots = threading.BoundedSemaphore(HEDGE_SLOTS)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout, hedge=False):
+        """Wait for a free slot (a reserved one for hedges) and return (connection, reused)
+
+        Waits at most timeout seconds: a Response that is never read or closed
+        keeps its slot, and a host whose slots are all held that way must fail
+        rather than hang every later request.
+        """
+        if not (self._hedge_slots if hedge else self._slots).acquire(timeout=timeout):
+            raise URLError("connection pool exhausted")
+        with self._lock:
+            if self._idle:
+                conn = self._idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=timeout), False
+
+    def release(self, conn, reusable, hedge=False):
+        """Return a connection to the pool, or close it if it can't be reused"""
+        if reusable:
+            with self._lock:
+                self._idle.append(conn)
+        else:
+            conn.close()
+        (self._hedge_slots if hedge else self._slots).release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def host_limit(host):
+    return HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT)
+
+
+def set_host_limit(host, limit):
+    """Change the connection limit for a host; its idle connections are dropped"""
+    HOST_LIMITS[host] = limit
+    with _pools_lock:
+        stale = [key for key in _pools if key[1] == host]
+        pools = [_pools.pop(key) for key in stale]
+    for pool in pools:
+        pool.close()
+
+
+# Adaptive concurrency never goes above a host's connection cap
+adaptive.set_max_limit_source(host_limit)
+
+
+def get_pool(scheme, host, port):
+    key = (scheme, host, port)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = HostPool(scheme, host, port, host_limit(host))
+        return pool
+
+
+def close_all():
+    """Close every idle pooled connection"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _decompressor(encoding):
+    encoding = (encoding or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip'):
+        return zlib.decompressobj(zlib.MAX_WBITS | 16)
+    if encoding == 'deflate':
+        return _DeflateDecompressor()
+    return None
+
+
+class _DeflateDecompressor:
+    """Handles both zlib-wrapped and raw deflate bodies (servers send either)"""
+
+    def __init__(self):
+        self._obj = None
+        self._first = b''
+
+    def decompress(self, data):
+        if self._obj is None:
+            self._first += data
+            if len(self._first) < 2:
+                return b''
+            try:
+                self._obj = zlib.decompressobj()
+                return self._obj.decompress(self._first)
+            except zlib.error:
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+                return self._obj.decompress(self._first)
+        return self._obj.decompress(data)
+
+    @property
+    def eof(self):
+        return self._obj is not None and self._obj.eof
+
+    def flush(self):
+        return self._obj.flush() if self._obj is not None else b''
+
+
+class Response:
+    """A streamed response; the connection returns to the pool once the body is consumed"""
+
+    def __init__(self, url, raw, pool, conn, hedge=False, timing=None):
+        self.url = url
+        self.status = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers
+        self._raw = raw
+        self._pool = pool
+        self._conn = conn
+        self._hedge = hedge
+        self._decoder = _decompressor(raw.headers.get('Content-Encoding'))
+        self._done = False
+        self._wire_bytes = 0
+        self._body = None  # Set by buffer()
+        self._timing = timing  # Only with metrics enabled
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """Yield decompressed body chunks as they arrive (up to chunk_size raw bytes each)"""
+        if self._body is not None:
+            yield self._body
+            return
+        try:
+            while not self._done:
+                data = self._raw.read1(chunk_size)
+                self._wire_bytes += len(data)
+                if self._timing is not None:
+                    self._timing['wire_bytes'] += len(data)
+                if not data:
+                    self._check_complete()
+                    if self._decoder is not None:
+                        tail = self._decoder.flush()
+                        if tail:
+                            yield tail
+                    self._finish(reusable=not self._raw.will_close)
+                    break
+                if self._decoder is not None:
+                    data = self._decoder.decompress(data)
+                if data:
+                    if self._timing is not None:
+                        self._timing['bytes'] += len(data)
+                    yield data
+        except BaseException:
+            self.close()
+            raise
+
+    def _check_complete(self):
+        """Raise IncompleteRead if the server closed the connection before the end of the body"""
+        if self._raw.length:
+            raise http.client.IncompleteRead(b'', self._raw.length)
+        if self._decoder is not None and self._wire_bytes and not self._decoder.eof:
+            raise http.client.IncompleteRead(b'')
+
+    def buffer(self, limit=None):
+        """Read the whole body now (or its first limit bytes, dropping the connection)
+
+        A failure while reading raises URLError, so request() can retry it.
+        Afterwards read() and iter_chunks() return the buffered body.
+        """
+        chunks = []
+        size = 0
+        try:
+            for chunk in self.iter_chunks():
+                chunks.append(chunk)
+                size += len(chunk)
+                if limit is not None and size >= limit:
+                    break
+        except (OSError, http.client.HTTPException, zlib.error) as e:
+            raise URLError(e) from e
+        finally:
+            self.close()
+        self._body = b''.join(chunks)[:limit]
+        return self
+
+    def read(self):
+        return b''.join(self.iter_chunks())
+
+    def text(self):
+        charset = self.headers.get_content_charset() or 'utf-8'
+        return self.read().decode(charset, errors='replace')
+
+    def json(self):
+        return json.loads(self.read().decode('utf-8'))
+
+    def close(self):
+        """Stop reading; an unfinished body means the connection can't be reused"""
+        if not self._done:
+            self._finish(reusable=False)
+
+    def _finish(self, reusable):
+        self._done = True
+        self._raw.close()  # Marks the exchange complete so the connection can send again
+        self._pool.release(self._conn, reusable, self._hedge)
+        if self._timing is not None:
+            timing, self._timing = self._timing, None
+            timing['download'] = round(time.perf_counter() - timing.pop('_received'), 6)
+            timing['complete'] = reusable  # False: the body was abandoned (e.g. a stream stopped early)
+            metrics.record_request(timing)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _open_socket(addresses, timeout, source_address=None):
+    """Connect to the first reachable getaddrinfo() result"""
+    error = None
+    for family, sock_type, proto, _, address in addresses:
+        sock = socket.socket(family, sock_type, proto)
+        try:
+            sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(address)
+            return sock
+        except OSError as e:
+            sock.close()
+            error = e
+    raise error or OSError("getaddrinfo returned no addresses")
+
+
+def _connect(conn, timing):
+    """Open a new connection, timing the DNS lookup and the TCP (and TLS) connect separately
+
+    The host name is resolved once, here: http.client then connects to the
+    resolved addresses instead of resolving the name again, and TLS still uses
+    the host name for SNI and the certificate check.
+    """
+    started = time.perf_counter()
+    addresses = socket.getaddrinfo(conn.host, conn.port, type=socket.SOCK_STREAM)
+    resolved = time.perf_counter()
+    conn._create_connection = lambda _address, timeout, source_address=None: _open_socket(
+        addresses, timeout, source_address)
+    conn.connect()
+    timing['dns'] = round(resolved - started, 6)
+    timing['connect'] = round(time.perf_counter() - resolved, 6)
+
+
+def _record_error(timing, error):
+    if timing is not None:
+        timing.pop('_received', None)
+        metrics.record_request(dict(timing, status=None, error=str(error) or type(error).__name__))
+
+
+def _send(method, url, headers, timeout, hedge=False, attempt=1):
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https'):
+        raise URLError(f"unsupported URL scheme: {url}")
+    port = parts.port or (443 if scheme == 'https' else 80)
+    pool = get_pool(scheme, parts.hostname, port)
+    path = parts.path or '/'
+    if parts.query:
+        path = f"{path}?{parts.query}"
+
+    request_headers = {
+        'User-Agent': USER_AGENT,
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    }
+    request_headers.update(headers or {})
+
+    for retry in range(2):
+        conn, reused = pool.acquire(timeout, hedge)
+        timing = None
+        try:
+            if metrics.ENABLED:
+                timing = {'method': method, 'url': url, 'host': parts.hostname, 'attempt': attempt,
+                          'hedge': hedge, 'reused': reused, 'dns': None, 'connect': None,
+                          'wire_bytes': 0, 'bytes': 0}
+                if conn.sock is None:
+                    _connect(conn, timing)
+                sent = time.perf_counter()
+            conn.request(method, path, headers=request_headers)
+            raw = conn.getresponse()
+            if timing is not None:
+                timing['_received'] = time.perf_counter()
+                timing['ttfb'] = round(timing['_received'] - sent, 6)
+                timing['status'] = raw.status
+        except _STALE_CONNECTION_ERRORS as e:
+            pool.release(conn, False, hedge)
+            if reused and retry == 0:
+                continue  # Server dropped an idle keep-alive connection; retry on a fresh one
+            _record_error(timing, e)
+            raise URLError(e) from e
+        except (OSError, http.client.HTTPException) as e:
+            pool.release(conn, False, hedge)
+            _record_error(timing, e)
+            raise URLError(e) from e
+        return Response(url, raw, pool, conn, hedge, timing)
+
+
+def _read_body(response):
+    """Read a redirect or error body; a connection that fails mid-body raises URLError"""
+    return response.buffer().read()
+
+
+def _request_once(method, url, headers, timeout, follow_redirects, hedge, attempt=1):
+    for _ in range(MAX_REDIRECTS + 1):
+        response = _send(method, url, headers, timeout, hedge, attempt)
+        if follow_redirects and response.status in REDIRECT_CODES and response.headers.get('Location'):
+            _read_body(response)
+            url = urljoin(url, response.headers['Location'])
+            if response.status == 303:
+                method = 'GET'
+            continue
+        if not 200 <= response.status < 300:
+            body = _read_body(response)
+            raise HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(body))
+        return response
+    raise HTTPError(url, response.status, "too many redirects", response.headers, None)
+
+
+def request(method, url, headers=None, timeout=DEFAULT_TIMEOUT, follow_redirects=True, retry=True,
+            hedge=False, buffer=False):
+    """Send a request over a pooled connection and return a streamed Response
+
+    Non-2xx responses raise HTTPError (after following redirects), matching urlopen.
+    Connection errors, timeouts and 408/429/5xx responses are retried with
+    backoff unless retry=False; a host whose circuit is open raises
+    resilience.CircuitOpenError (a URLError) without sending anything.
+    hedge=True sends over the host's reserved hedge connections (see hedge.py).
+    buffer=True reads the body before returning (buffer=N: its first N bytes),
+    so a reset, timeout or truncated body is retried and counted like a
+    connection error; a streamed body is only read after the retries are over.
+    """
+    host = urlsplit(url).hostname
+    breaker = resilience.breaker_for(host)
+    attempt = 0
+    while True:
+        breaker.before_request()
+        attempt += 1
+        started = time.monotonic()
+        try:
+            response = _request_once(method, url, headers, timeout, follow_redirects, hedge, attempt)
+            if buffer:
+                response.buffer(None if buffer is True else buffer)
+        except HTTPError as e:
+            adaptive.observe(host, time.monotonic() - started, status=e.code)
+            if not resilience.is_retryable_status(e.code):
+                breaker.record_success()  # The host answered; 404s and 304s aren't outages
+                raise
+            breaker.record_failure()
+            delay = resilience.next_delay(method, attempt, e.headers) if retry else None
+            if delay is None:
+                raise
+            metrics.count(f"retries.{e.code}")
+        except URLError as e:
+            adaptive.observe(host, time.monotonic() - started, error=True)
+            breaker.record_failure()
+            delay = resilience.next_delay(method, attempt) if retry else None
+            if delay is None:
+                raise
+            metrics.count("retries.connection")
+        except Exception:
+            breaker.record_failure()  # Never leave a half-open probe outstanding
+            raise
+        else:
+            adaptive.observe(host, time.monotonic() - started, status=response.status)
+            breaker.record_success()
+            return response
+        time.sleep(delay)
+
+
+def get(url, headers=None, timeout=DEFAULT_TIMEOUT, hedge=False, buffer=False):
+    return request('GET', url, headers=headers, timeout=timeout, hedge=hedge, buffer=buffer)
+
+
+def get_bytes(url, headers=None, timeout=DEFAULT_TIMEOUT):
+    return get(url, headers=headers, timeout=timeout, buffer=True).read()
+
+
+def get_text(url, headers=None, timeout=DEFAULT_TIMEOUT):
+    return get(url, headers=headers, timeout=timeout, buffer=True).text()
+
+
+def get_json(url, headers=None, timeout=DEFAULT_TIMEOUT):
+    return get(url, headers=headers, timeout=timeout, buffer=True).json()
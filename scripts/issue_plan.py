@@ -0,0 +1,188 @@
+"""
+Which GETPUBMEDIALINKS issues to ask for
+Each publication has its own issue calendar: the Meeting Workbook is
+bimonthly (January, March, ...) and its weeks fall in the issue's own two
+months, while the Watchtower study edition is monthly and its articles are
+studied about two months after the issue month. The window of issue codes
+is worked out from those calendars, by month arithmetic on the current
+week's Monday, so no month is skipped or repeated and no code is asked for
+that can't exist.
+
+A normal run doesn't fetch the whole window. It compares the catalog's
+weeks with the horizon (every Monday from the current week to
+months_ahead months later) and asks only for the issues that could hold a
+missing week and that the catalog has no weeks from yet. Once the catalog
+is complete up to the published issues, that leaves at most the next
+unpublished one; --refresh fetches the whole window again.
+
+Issues appear in order. Issues up to the newest one already in the catalog
+are fetched as before (mostly HTTP cache hits); past it only PROBE_AHEAD
+issues are probed at a time, and probing stops at the first one that isn't
+published yet (a 404, not a request that failed for another reason). A 404 is remembered in the catalog's unpublished_issues
+table, so for UNPUBLISHED_TTL later runs don't ask for that issue (or any
+issue after it) again.
+
+Environment overrides:
+  JW_AUTO_UNPUBLISHED_TTL  seconds a "not published yet" answer is trusted (default 6 hours, 0 = always probe)
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+import adaptive
+import catalog
+import config
+
+UNPUBLISHED_TTL = int(os.environ.get('JW_AUTO_UNPUBLISHED_TTL', 6 * 60 * 60))
+PROBE_AHEAD = 2  # Unpublished issues probed at once past the newest known one
+
+# step: months between issues; lag: months from issue month to the weeks it covers;
+# spill: earlier issues whose weeks can still run into the current month
+Cadence = namedtuple('Cadence', ['step', 'lag', 'spill'])
+
+CADENCES = {
+    'mwb': Cadence(step=2, lag=0, spill=0),
+    'w': Cadence(step=1, lag=2, spill=1),
+}
+
+# (pub, lang, issue) answered 404 during this run; filled from the fetch threads
+_unpublished = set()
+_lock = threading.Lock()
+
+
+def month_index(year, month):
+    return year * 12 + month - 1
+
+
+def issue_code(index):
+    """YYYYMM for a month index (year * 12 + month - 1)"""
+    return f"{index // 12}{index % 12 + 1:02d}"
+
+
+def issue_for(pub, month):
+    """Month index of the issue holding weeks that start in month (a month index)"""
+    cadence = CADENCES[pub]
+    index = month - cadence.lag
+    return index - index % cadence.step  # Issues start in January and every step months after
+
+
+def current_monday(today=None):
+    today = today or date.today()
+    return today - timedelta(days=today.weekday())
+
+
+def issue_window(pub, months_ahead, today=None):
+    """Issue codes covering the weeks from the current one to months_ahead months later, oldest first"""
+    cadence = CADENCES[pub]
+    monday = current_monday(today)
+    current = month_index(monday.year, monday.month)
+    first = issue_for(pub, current) - cadence.spill * cadence.step
+    last = issue_for(pub, current + months_ahead)
+    return [issue_code(index) for index in range(first, last + 1, cadence.step)]
+
+
+def horizon(months_ahead, today=None):
+    """Every Monday from the current week's to months_ahead months after today"""
+    today = today or date.today()
+    monday = current_monday(today)
+    index = month_index(today.year, today.month) + months_ahead
+    try:
+        end = today.replace(year=index // 12, month=index % 12 + 1)
+    except ValueError:  # No such day in the target month (e.g. August 31 -> February)
+        end = date(index // 12, index % 12 + 1, 1) + timedelta(days=27)
+    return [monday + timedelta(weeks=week) for week in range((end - monday).days // 7 + 1)]
+
+
+def gap_weeks(pub, months_ahead, lang='E', store=None, today=None):
+    """Mondays in the horizon the catalog has no week of pub for"""
+    store = store or catalog.get_catalog()
+    have = store.week_starts(pub, lang)
+    return [monday for monday in horizon(months_ahead, today) if monday.isoformat() not in have]
+
+
+def gap_issues(pub, months_ahead, lang='E', store=None, today=None):
+    """Issue codes that could fill the catalog's gaps in the horizon, oldest first
+
+    Issues the catalog already has weeks from are left out: fetching them
+    again can't add a week (a week that isn't in them, e.g. a convention
+    week without a study article, stays a gap without costing a request).
+    """
+    store = store or catalog.get_catalog()
+    cadence = CADENCES[pub]
+    known = store.issues(pub, lang)
+    candidates = set()
+    for monday in gap_weeks(pub, months_ahead, lang, store, today):
+        issue = issue_for(pub, month_index(monday.year, monday.month))
+        candidates.update(issue_code(issue - back * cadence.step) for back in range(cadence.spill + 1))
+    return sorted(candidates - known)
+
+
+def planned_issues(pub, months_ahead, lang='E', store=None, today=None, refresh=False):
+    """The issues a run should fetch: the gap issues, or the whole window with refresh=True"""
+    if refresh:
+        return issue_window(pub, months_ahead, today)
+    return gap_issues(pub, months_ahead, lang, store, today)
+
+
+def note_unpublished(pub, issue, lang='E'):
+    """Record a 404 for an issue (called by the fetchers, from any thread)"""
+    with _lock:
+        _unpublished.add((pub, lang, issue))
+
+
+def _noted_unpublished(pub, lang, issues):
+    """Which of issues note_unpublished() has recorded during this run"""
+    with _lock:
+        return {issue for issue in issues if (pub, lang, issue) in _unpublished}
+
+
+def _take_unpublished(pub, lang):
+    with _lock:
+        found = {issue for key_pub, key_lang, issue in _unpublished if (key_pub, key_lang) == (pub, lang)}
+        _unpublished.difference_update((pub, lang, issue) for issue in found)
+    return found
+
+
+def fetch_issues(pub, fetch, issues, lang='E', concurrency=adaptive.DEFAULT_MAX_LIMIT, store=None):
+    """Fetch issue codes (oldest first); returns ((issue, data) pairs in issue order, issues not asked for)
+
+    fetch(issue, lang) returns the parsed response or None, calling
+    note_unpublished() on a 404. Issues after one known to be unpublished
+    (within UNPUBLISHED_TTL) are not asked for.
+    """
+    store = store or catalog.get_catalog()
+    window = list(issues)
+    newest = max(store.issues(pub, lang), default=None)
+    unpublished = store.unpublished_issues(pub, lang, since=time.time() - UNPUBLISHED_TTL) if UNPUBLISHED_TTL else set()
+    host = adaptive.host_of(config.PUB_MEDIA_URL)
+
+    def run(issues):
+        return dict(zip(issues, adaptive.map_ordered(lambda issue: fetch(issue, lang), issues, host, concurrency)))
+
+    results = run([issue for issue in window if newest and issue <= newest])
+    ahead = [issue for issue in window if not newest or issue > newest]
+    # With nothing in the catalog yet there is no frontier to probe from: ask for the whole window
+    batch = PROBE_AHEAD if newest else len(ahead)
+    while ahead and ahead[0] not in unpublished:
+        probe = ahead[:batch]
+        probe = probe[:next((i for i, issue in enumerate(probe) if issue in unpublished), len(probe))]
+        fetched = run(probe)
+        results.update(fetched)
+        ahead = ahead[len(probe):]
+        # Only a 404 marks the frontier; an issue that failed after its retries says nothing about later ones
+        if _noted_unpublished(pub, lang, probe):
+            break
+
+    missing = _take_unpublished(pub, lang)
+    store.record_issue_checks(pub, [issue for issue, data in results.items() if data], missing, lang)
+    return [(issue, results[issue]) for issue in window if issue in results], ahead
+
+
+def known_window(pub, months_ahead, lang='E', store=None, today=None):
+    """Issue codes in the window that the catalog already has weeks from"""
+    store = store or catalog.get_catalog()
+    known = store.issues(pub, lang)
+    return [issue for issue in issue_window(pub, months_ahead, today) if issue in known]
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+JW-Auto data pipeline command
+Runs the workbook, watchtower, subsections, durations and overrides stages in
+a single process. Stages write to and read from the SQLite catalog instead of
+re-reading the CSVs, share one lfb lesson cache and one Bible chapter index,
+and each stage is timed. With --langs, every language besides English runs
+as its own shard in a process pool (see lang_shards.py).
+
+Usage:
+  python3 scripts/jwauto.py pipeline
+  python3 scripts/jwauto.py pipeline --refresh
+  python3 scripts/jwauto.py pipeline --overrides-out - --skip watchtower
+  python3 scripts/jwauto.py pipeline --langs E,F,M
+  python3 scripts/jwauto.py pipeline --metrics-json metrics.json --profile profiles/
+  python3 scripts/jwauto.py query --date 2025-11-12
+  python3 scripts/jwauto.py verify [--force]
+  python3 scripts/jwauto.py mirror --from 2025-11-10 --weeks 2
+  python3 scripts/jwauto.py export [--kotlin overrides.kt] [--binary overrides.bin]
+  python3 scripts/jwauto.py import
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import adaptive
+import catalog
+import generate_jw_overrides
+import generate_subsections_csv
+import hedge
+import lang_shards
+import link_check
+import metrics
+import mirror
+import mp3_meta
+import update_meeting_workbook
+import update_watchtower_study
+
+ROOT = Path(__file__).resolve().parents[1]
+STAGES = ['workbook', 'watchtower', 'subsections', 'languages', 'durations', 'overrides']
+
+
+class StageTimer:
+    """Collects wall-clock durations for each pipeline stage (and metrics/profiles when enabled)"""
+
+    def __init__(self):
+        self.timings = []
+
+    def run(self, name, func, *args, **kwargs):
+        print(f"\n{'=' * 60}\n▶ Stage: {name}\n{'=' * 60}")
+        start = time.perf_counter()
+        result = metrics.run_stage(name, func, *args, **kwargs)
+        self.timings.append((name, time.perf_counter() - start))
+        return result
+
+    def skip(self, name):
+        metrics.skip_stage(name)
+        self.timings.append((name, None))
+
+    def report(self):
+        print(f"\n{'=' * 60}\nStage timings\n{'=' * 60}")
+        total = 0.0
+        for name, seconds in self.timings:
+            if seconds is None:
+                print(f"  {name:<12} skipped")
+            else:
+                total += seconds
+                print(f"  {name:<12} {seconds:8.2f}s")
+        print(f"  {'total':<12} {total:8.2f}s")
+        if adaptive.metrics():
+            print("\nPer-host concurrency")
+            adaptive.report()
+
+
+def overrides_path(destination, lang):
+    """Kotlin file for a language: the destination itself for English, overrides_<lang>.kt beside it otherwise"""
+    if lang == 'E' or destination == '-':
+        return destination
+    path = Path(destination)
+    return str(path.with_name(f"{path.stem}_{lang}{path.suffix}"))
+
+
+def export_overrides(store, destination, lang='E', binary=None):
+    """Render the Kotlin override maps (and, with binary, the binary asset) for a language from the catalog"""
+    maps = store.override_maps(lang)
+    durations = store.section_durations(lang)
+    hashes = generate_jw_overrides.week_hashes(*maps, durations)
+    if binary:
+        generate_jw_overrides.write_if_changed(binary, generate_jw_overrides.render_binary(*maps, durations), hashes)
+    if not destination:
+        return
+    text = generate_jw_overrides.render_overrides(*maps, durations)
+    if destination == '-':
+        sys.stdout.write(text)
+        return
+    generate_jw_overrides.write_if_changed(destination, text, hashes)
+
+
+def run_pipeline(args):
+    timer = StageTimer()
+    skip = set(args.skip or [])
+    if args.hedge:
+        hedge.enable()
+
+    store = catalog.get_catalog()
+    langs = ['E']
+    if 'languages' not in skip:
+        langs += [lang for lang in (args.langs or '').split(',') if lang and lang != 'E']
+
+    if 'workbook' in skip:
+        timer.skip('workbook')
+    else:
+        timer.run('workbook', update_meeting_workbook.run, args.concurrency, args.refresh)
+
+    if 'watchtower' in skip:
+        timer.skip('watchtower')
+    else:
+        timer.run('watchtower', update_watchtower_study.run, args.concurrency, args.refresh)
+
+    if 'subsections' in skip:
+        timer.skip('subsections')
+    else:
+        timer.run('subsections', generate_subsections_csv.generate_csv,
+                  stream=args.stream, refresh=args.refresh)
+
+    if len(langs) == 1:
+        timer.skip('languages')
+    else:
+        timer.run('languages', lang_shards.run, store, langs, args.concurrency, args.jobs, args.hedge,
+                  metrics.ENABLED, args.refresh)
+
+    if 'durations' in skip:
+        timer.skip('durations')
+    else:
+        timer.run('durations', mp3_meta.run)
+
+    if 'overrides' in skip:
+        timer.skip('overrides')
+    else:
+        for lang in langs:
+            timer.run(f"overrides {lang}" if lang != 'E' else 'overrides',
+                      export_overrides, store, overrides_path(args.overrides_out, lang), lang,
+                      overrides_path(args.overrides_binary, lang) if args.overrides_binary else None)
+
+    timer.report()
+    return 0
+
+
+def run_query(args):
+    result = catalog.get_catalog().lookup(args.date, args.lang)
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        for name, key in (("Workbook", "workbook"), ("Watchtower", "watchtower")):
+            row = result[key]
+            print(f"{name + ':':<12} {row['week']} ({row['week_start']}) {row['url']}" if row
+                  else f"{name + ':':<12} not in the catalog")
+        for row in result['sections']:
+            print(f"  {row['section']}: {row['reference']} {row['url']}")
+    return 0 if result['workbook'] or result['watchtower'] else 1
+
+
+def run_verify(args):
+    store = catalog.get_catalog()
+    rows, results, checked = link_check.verify(store, args.lang, force=args.force, concurrency=args.concurrency)
+    print(f"Checked {checked} of {len(results)} URL(s); the rest had fresh results")
+
+    usages = {}
+    for row in rows:
+        usages.setdefault(row['url'], []).append(row)
+    dead = [url for url, result in results.items() if result['status'] is not None and not link_check.is_live(result)]
+    unreachable = [url for url, result in results.items() if result['status'] is None]
+    for url in dead + unreachable:
+        result = results[url]
+        print(f"✗ {result['status'] or result.get('error', 'unreachable')} {url}")
+        for row in usages[url]:
+            print(f"    {row['lang']} {row['kind']} {row['week_start']}")
+
+    for url, result in results.items():
+        sizes = {row['filesize'] for row in usages[url] if row['filesize']}
+        if link_check.is_live(result) and result['content_length'] and sizes and result['content_length'] not in sizes:
+            print(f"  Size mismatch: {url} is {result['content_length']} bytes, catalog has {', '.join(map(str, sorted(sizes)))}")
+
+    live = len(results) - len(dead) - len(unreachable)
+    print(f"✓ {live} live, ✗ {len(dead)} dead, {len(unreachable)} unreachable")
+    return 1 if dead or unreachable else 0
+
+
+def run_mirror(args):
+    store = catalog.get_catalog()
+    first = args.start - timedelta(days=args.start.weekday())
+    last = first + timedelta(weeks=args.weeks)
+    entries = [row for row in store.url_rows(args.lang)
+               if first.isoformat() <= row['week_start'] < last.isoformat()]
+    print(f"Mirroring weeks {first} to {last - timedelta(days=1)} ({args.lang})...")
+    files = mirror.Store(max_bytes=args.max_bytes)
+    summary = mirror.mirror(files, entries, concurrency=args.concurrency)
+    for url, error in summary['failed']:
+        print(f"✗ {url}: {error}")
+    print(f"✓ {summary['files']} file(s): {summary['cached']} already mirrored, {summary['downloaded']} downloaded "
+          f"({summary['bytes']} bytes), {len(summary['failed'])} failed")
+    print(f"✓ Store {files.root}: {summary['store_bytes']} bytes, {summary['evicted']} file(s) evicted")
+    return 1 if summary['failed'] else 0
+
+
+def run_export(args):
+    store = catalog.get_catalog()
+    for pub in ('mwb', 'w', 'sections'):
+        state = "updated" if store.export_csv(pub, lang=args.lang) else "up to date"
+        print(f"✓ {pub} CSV {state}")
+    if args.kotlin or args.binary:
+        export_overrides(store, args.kotlin, args.lang, args.binary)
+    return 0
+
+
+def run_import(args):
+    store = catalog.get_catalog()
+    print(f"✓ Imported {store.import_csvs(args.lang)} rows into {store.path}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JW-Auto data tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    instrumented = argparse.ArgumentParser(add_help=False)
+    metrics.add_arguments(instrumented)
+
+    pipeline = subcommands.add_parser("pipeline", parents=[instrumented], help="Run every data stage in one process")
+    pipeline.add_argument("--concurrency", type=int, default=update_meeting_workbook.DEFAULT_CONCURRENCY,
+                          help="Maximum number of issues fetched in parallel per stage")
+    pipeline.add_argument("--no-stream", dest="stream", action="store_false",
+                          help="Download each week page in full before parsing")
+    pipeline.add_argument("--hedge", action="store_true",
+                          help="Send a duplicate pub-media lookup when one is slower than the observed p95")
+    pipeline.add_argument("--langs", metavar="E,F,M",
+                          help="Languages (langwritten codes) to generate; English always runs as the reference")
+    pipeline.add_argument("--jobs", type=int, default=os.cpu_count(),
+                          help="Worker processes for the language shards (default: one per CPU)")
+    pipeline.add_argument("--refresh", action="store_true",
+                          help="Refetch every issue and week page in the window, not only what fills a gap")
+    pipeline.add_argument("--skip", action="append", choices=STAGES,
+                          help="Skip a stage (the catalog is used as is); may be repeated")
+    pipeline.add_argument("--overrides-out", default=str(ROOT / "overrides.kt"),
+                          help="Kotlin file to write, only if its content changed ('-' for stdout)")
+    pipeline.add_argument("--overrides-binary", metavar="PATH",
+                          help="Also write the binary override asset (overrides_<lang>.bin beside it for --langs)")
+    pipeline.set_defaults(handler=run_pipeline)
+
+    query = subcommands.add_parser("query", help="Show the catalog entries for the week containing a date")
+    query.add_argument("--date", type=date.fromisoformat, default=date.today(),
+                       help="Any day of the week, YYYY-MM-DD (default: today)")
+    query.add_argument("--lang", default="E", help="Language code (langwritten), default E")
+    query.add_argument("--json", action="store_true", help="Print the entries as JSON")
+    query.set_defaults(handler=run_query)
+
+    verify = subcommands.add_parser("verify", parents=[instrumented], help="Check that every MP3 URL in the catalog resolves")
+    verify.add_argument("--lang", help="Only check one language (default: all)")
+    verify.add_argument("--force", action="store_true", help="Re-check URLs whose stored result hasn't expired")
+    verify.add_argument("--concurrency", type=int, default=link_check.DEFAULT_CONCURRENCY,
+                        help="Maximum number of URLs checked in parallel")
+    verify.set_defaults(handler=run_verify)
+
+    mirror_cmd = subcommands.add_parser("mirror", parents=[instrumented], help="Download the MP3s for a window of weeks into the local mirror")
+    mirror_cmd.add_argument("--from", dest="start", type=date.fromisoformat, default=date.today(),
+                            help="Any day of the first week, YYYY-MM-DD (default: today)")
+    mirror_cmd.add_argument("--weeks", type=int, default=2, help="Number of weeks to mirror (default 2)")
+    mirror_cmd.add_argument("--lang", default="E", help="Language code (langwritten), default E")
+    mirror_cmd.add_argument("--max-bytes", type=int, default=mirror.MAX_BYTES,
+                            help="Size cap of the mirror; least recently used files are evicted")
+    mirror_cmd.add_argument("--concurrency", type=int, default=mirror.DEFAULT_CONCURRENCY,
+                            help="Maximum number of chunks fetched in parallel")
+    mirror_cmd.set_defaults(handler=run_mirror)
+
+    export = subcommands.add_parser("export", help="Rewrite the CSVs (and optionally overrides.kt) from the catalog")
+    export.add_argument("--lang", default="E", help="Language code (langwritten), default E")
+    export.add_argument("--kotlin", metavar="PATH", help="Also write the Kotlin override maps ('-' for stdout)")
+    export.add_argument("--binary", metavar="PATH", help="Also write the binary override asset read by OverrideAsset.kt")
+    export.set_defaults(handler=run_export)
+
+    load = subcommands.add_parser("import", help="Load hand-edited CSVs into the catalog")
+    load.add_argument("--lang", default="E", help="Language code (langwritten), default E")
+    load.set_defaults(handler=run_import)
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'metrics_json', None) or getattr(args, 'profile', None):
+        metrics.configure(args)
+        if args.handler is not run_pipeline:  # The pipeline times (and profiles) each of its stages
+            return metrics.run_stage(args.command, args.handler, args)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,215 @@
+"""
+Per-language shards of the data pipeline, run across a process pool
+English is the reference language: its week titles are the only ones the
+date parser understands, and the Bible readings and lfb lessons found on its
+week pages are the same in every language. The parent builds a plan from
+English once (which weeks each issue holds, in order, and each week's
+references), then every other language runs as its own shard in a worker
+process: it fetches that language's workbook and Watchtower issues, lines
+their weeks up with the English ones, and resolves the planned references
+through its own Bible index and lesson catalog. No week page is fetched or
+parsed again, and a language already holding every planned week and
+section gets no shard at all.
+
+Each shard has its own HTTP cache under <cache root>/langs/<lang>/ and sends
+back plain rows; the parent is the only catalog writer and exports each
+language's CSVs (DATA_DIR/<lang>/) and override maps.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import adaptive
+import bible_index
+import catalog
+import config
+import hedge
+import http_cache
+import issue_plan
+import metrics
+import pub_media
+import update_meeting_workbook
+import update_watchtower_study
+from bible_books import BIBLE_BOOKS
+
+SHARD_ROOT = config.CACHE_ROOT / 'langs'
+
+# pub -> (issue fetcher, response parser, module with the issue window)
+PUBS = {
+    'mwb': (update_meeting_workbook.fetch_workbook_data, update_meeting_workbook.parse_workbook_data,
+            update_meeting_workbook),
+    'w': (update_watchtower_study.fetch_watchtower_data, update_watchtower_study.parse_watchtower_data,
+          update_watchtower_study),
+}
+
+
+def fetch_issue_weeks(pub, issue_codes, lang, concurrency):
+    """Fetch and parse a publication's issues in one language; returns {issue: [week rows]}"""
+    fetch, parse, _ = PUBS[pub]
+    results = adaptive.map_ordered(lambda issue: fetch(issue, lang), issue_codes,
+                                   adaptive.host_of(config.PUB_MEDIA_URL), concurrency)
+    return {issue: parse(data, issue) for issue, data in zip(issue_codes, results) if data}
+
+
+def build_plan(store, concurrency, langs=(), refresh=False):
+    """The language-independent part of a run, taken from English
+
+    weeks: pub -> {issue: [week_start, ...]} in the order the issue lists them
+    sections: [(week_start, English label, section, reference)] from the catalog
+
+    Only the English issues holding a week one of langs is missing are
+    fetched (every issue in the window with refresh=True).
+    """
+    weeks = {}
+    planned = set()
+    for pub, (_, _, module) in PUBS.items():
+        # The issues the English stage found, served from its HTTP cache
+        issue_codes = issue_plan.known_window(pub, module.MONTHS_TO_FETCH, store=store)
+        english = {row['week_start']: row['issue'] for row in store.week_rows(pub, 'E')}
+        if pub == 'mwb':
+            planned = {week_start for week_start, issue in english.items() if issue in issue_codes}
+        if not refresh:
+            wanted = {english[week_start] for lang in langs
+                      for week_start in english.keys() - store.week_starts(pub, lang)}
+            issue_codes = [issue for issue in issue_codes if issue in wanted]
+        by_issue = fetch_issue_weeks(pub, issue_codes, 'E', concurrency)
+        weeks[pub] = {issue: [row['week_start'] for row in rows]
+                      for issue, rows in by_issue.items() if rows and all(row['week_start'] for row in rows)}
+    sections = [(row['week_start'], row['week'], row['section'], row['reference'])
+                for row in store.section_rows('E') if row['week_start'] in planned]
+    return {'weeks': weeks, 'sections': sections}
+
+
+def shard_plan(plan, store, lang, refresh=False):
+    """The part of the plan a language is missing (all of it with refresh=True), plus its known week labels"""
+    labels = {row['week_start']: row['week'] for row in store.week_rows('mwb', lang)}
+    if refresh:
+        return dict(plan, labels=labels)
+    weeks = {}
+    for pub, by_issue in plan['weeks'].items():
+        have = store.week_starts(pub, lang)
+        weeks[pub] = {issue: starts for issue, starts in by_issue.items() if not have.issuperset(starts)}
+    done = store.section_weeks(lang)
+    sections = [section for section in plan['sections'] if section[0] not in done]
+    return {'weeks': weeks, 'sections': sections, 'labels': labels}
+
+
+def is_empty(plan):
+    return not plan['sections'] and not any(plan['weeks'].values())
+
+
+def align_weeks(pub, plan_weeks, lang, concurrency):
+    """Week rows for one language, dated by position against the English issue"""
+    rows = []
+    fetched = fetch_issue_weeks(pub, list(plan_weeks), lang, concurrency)
+    for issue, week_starts in plan_weeks.items():
+        items = fetched.get(issue)
+        if not items:
+            continue
+        if len(items) != len(week_starts):
+            print(f"  [{lang}] {pub} {issue}: {len(items)} weeks vs {len(week_starts)} in English, skipped")
+            continue
+        for row, week_start in zip(items, week_starts):
+            rows.append(dict(row, week_start=week_start))
+    return rows
+
+
+def resolve_sections(plan_sections, labels, lang):
+    """Section rows for one language from the English references"""
+    if not plan_sections:
+        return []  # Without loading the Bible index or the lesson catalog
+    index = bible_index.get_index(lang)
+    lessons = pub_media.get_lesson_mp3s(lang)
+    rows = []
+    for week_start, english_label, section, reference in plan_sections:
+        row = {'week': labels.get(week_start, english_label), 'week_start': week_start,
+               'section': section, 'reference': reference}
+        if section == catalog.BIBLE_READING:
+            book, chapter = reference.rsplit(' ', 1)
+            media = index.lookup(BIBLE_BOOKS[book], int(chapter))
+            if media:
+                rows.append(dict(row, url=media.url, filesize=media.filesize, duration=media.duration))
+        else:
+            url = lessons.get(int(reference.rsplit(' ', 1)[1]))
+            if url:
+                rows.append(dict(row, url=url))
+    return rows
+
+
+def run_shard(lang, plan, concurrency, hedged=False, instrumented=False):
+    """Worker entry point: every row for one language, as {'weeks': {pub: rows}, 'sections': rows}"""
+    started = time.perf_counter()
+    http_cache.CACHE_DIR = SHARD_ROOT / lang / 'http'
+    hedge.enable(hedged)
+    metrics.METRICS_JSON = None  # The parent writes the metrics, including this shard's
+    if instrumented:
+        metrics.enable()
+
+    weeks = {pub: align_weeks(pub, plan['weeks'][pub], lang, concurrency) for pub in PUBS}
+    labels = dict(plan['labels'], **{row['week_start']: row['week'] for row in weeks['mwb']})
+    sections = resolve_sections(plan['sections'], labels, lang)
+    return {
+        'lang': lang,
+        'weeks': weeks,
+        'sections': sections,
+        'seconds': time.perf_counter() - started,
+        'metrics': metrics.export_raw() if instrumented else None,
+    }
+
+
+def merge_shard(store, result):
+    """Store a shard's rows under its language and export its CSVs; returns the row count"""
+    lang = result['lang']
+    count = 0
+    for pub, rows in result['weeks'].items():
+        count += store.upsert_weeks(pub, rows, lang)
+        store.export_csv(pub, lang=lang)
+    count += store.replace_sections(result['sections'], lang)
+    store.export_csv('sections', lang=lang)
+    return count
+
+
+def run(store, langs, concurrency, jobs=None, hedged=False, instrumented=False, refresh=False):
+    """Build the English plan and run one shard per language missing part of it; returns the languages merged
+
+    With instrumented=True each shard records metrics too, merged here tagged with its language.
+    """
+    langs = [lang for lang in langs if lang != 'E']
+    if not langs:
+        return []
+    print("Planning from English...")
+    plan = build_plan(store, concurrency, langs, refresh)
+    print(f"  {sum(len(starts) for starts in plan['weeks']['mwb'].values())} workbook weeks, "
+          f"{sum(len(starts) for starts in plan['weeks']['w'].values())} study weeks, "
+          f"{len(plan['sections'])} sections")
+
+    plans = {lang: shard_plan(plan, store, lang, refresh) for lang in langs}
+    merged = [lang for lang in langs if is_empty(plans[lang])]
+    for lang in merged:
+        print(f"✓ {lang}: nothing missing")
+    pending = [lang for lang in langs if lang not in merged]
+    if not pending:
+        return langs
+
+    workers = max(1, min(jobs or os.cpu_count() or 1, len(pending)))
+    print(f"Running {len(pending)} language shard(s) on {workers} process(es)...")
+    # spawn, not fork: a forked worker would share the parent's pooled connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(run_shard, lang, plans[lang], concurrency, hedged, instrumented): lang
+                   for lang in pending}
+        for future in as_completed(futures):
+            lang = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"✗ {lang}: {e}")
+                continue
+            count = merge_shard(store, result)
+            if result['metrics']:
+                metrics.merge(result['metrics'], lang=lang)
+            merged.append(lang)
+            print(f"✓ {lang}: {count} rows in {result['seconds']:.2f}s")
+    return [lang for lang in langs if lang in merged]
@@ -0,0 +1,97 @@
+"""
+Liveness check for every MP3 URL in the catalog
+Each URL is checked with a HEAD request, or a 1-byte Range GET where the
+server doesn't allow HEAD, over the shared pooled transport with adaptive
+per-host concurrency. Results (status, content length, final URL after
+redirects) are stored in the catalog's links table, so a re-run only checks
+URLs that are new or whose last result has expired.
+
+Environment overrides:
+  JW_AUTO_LINK_TTL       seconds a live result is trusted (default 7 days)
+  JW_AUTO_DEAD_LINK_TTL  seconds a dead result is trusted (default 1 hour)
+"""
+
+import os
+import time
+from urllib.error import HTTPError, URLError
+
+import adaptive
+import http_transport
+
+LIVE_TTL = int(os.environ.get('JW_AUTO_LINK_TTL', 7 * 24 * 60 * 60))
+DEAD_TTL = int(os.environ.get('JW_AUTO_DEAD_LINK_TTL', 60 * 60))
+DEFAULT_CONCURRENCY = 16
+TIMEOUT = 15
+
+# Statuses meaning "this server won't answer HEAD", not "this URL is dead"
+HEAD_UNSUPPORTED = {403, 405, 501}
+
+
+def is_live(result):
+    return result['status'] is not None and 200 <= result['status'] < 300
+
+
+def _content_length(response, method):
+    if method == 'GET':
+        # "bytes 0-0/12345"
+        total = (response.headers.get('Content-Range') or '').rpartition('/')[2]
+        if total.isdigit():
+            return int(total)
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def _probe(url, method, timeout):
+    headers = {'Range': 'bytes=0-0', 'Accept-Encoding': 'identity'} if method == 'GET' else None
+    response = http_transport.request(method, url, headers=headers, timeout=timeout)
+    try:
+        if method == 'HEAD' or response.status == 206:
+            response.read()  # Empty or one byte: reading it returns the connection to the pool
+        return {'url': url, 'status': response.status, 'content_length': _content_length(response, method),
+                'final_url': response.url, 'method': method}
+    finally:
+        response.close()  # A 200 to a Range request would be the whole file; drop the connection instead
+
+
+def check_url(url, timeout=TIMEOUT):
+    """Check one URL; returns a result dict (status None if the host couldn't be reached)"""
+    try:
+        try:
+            return _probe(url, 'HEAD', timeout)
+        except HTTPError as e:
+            if e.code not in HEAD_UNSUPPORTED:
+                raise
+            return _probe(url, 'GET', timeout)
+    except HTTPError as e:
+        return {'url': url, 'status': e.code, 'content_length': None, 'final_url': e.url, 'method': 'HEAD'}
+    except (URLError, OSError) as e:
+        return {'url': url, 'status': None, 'content_length': None, 'final_url': None, 'method': None,
+                'error': str(getattr(e, 'reason', e))}
+
+
+def is_fresh(result, now=None, live_ttl=LIVE_TTL, dead_ttl=DEAD_TTL):
+    """True if a stored result is recent enough to skip checking its URL again"""
+    if result is None or result['status'] is None:
+        return False
+    ttl = live_ttl if is_live(result) else dead_ttl
+    return (now or time.time()) - result['checked_at'] < ttl
+
+
+def verify(store, lang=None, force=False, concurrency=DEFAULT_CONCURRENCY, live_ttl=LIVE_TTL):
+    """Check every catalog URL that has no fresh result; returns (rows, results by url, checked count)
+
+    rows are store.url_rows(lang), so callers can report where each dead URL is used.
+    """
+    rows = store.url_rows(lang)
+    urls = sorted({row['url'] for row in rows})
+    known = store.link_results()
+    now = time.time()
+    stale = [url for url in urls if force or not is_fresh(known.get(url), now, live_ttl)]
+
+    checked = adaptive.map_ordered(check_url, stale, adaptive.host_of, concurrency)
+    # Unreachable results aren't stored, so the next run tries those URLs again
+    store.record_links([result for result in checked if result['status'] is not None])
+
+    results = {url: known[url] for url in urls if url in known}
+    results.update((result['url'], result) for result in checked)
+    return rows, results, len(stale)
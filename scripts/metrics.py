@@ -0,0 +1,213 @@
+"""
+Structured timings for the data scripts
+When enabled (--metrics-json / --profile, or JW_AUTO_METRICS_JSON), the
+transport records every HTTP exchange: DNS lookup, connect (TCP plus TLS),
+time to first byte, body download, wire and decoded bytes, and which attempt
+it was. The HTTP cache counts hits, stale hits, 304s and misses; parsers and
+CSV writers add named spans; each pipeline stage is timed and, with
+--profile, run under cProfile into <dir>/<stage>.prof. Everything is dumped
+as one JSON document with per-phase summaries.
+
+When nothing is enabled every hook is a single flag check, so the cost of
+leaving the instrumentation in place is negligible.
+
+Environment overrides:
+  JW_AUTO_METRICS_JSON  write the metrics to this file on exit
+"""
+
+import atexit
+import cProfile
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import adaptive
+import resilience
+
+METRICS_JSON = os.environ.get('JW_AUTO_METRICS_JSON')
+ENABLED = bool(METRICS_JSON)
+PROFILE_DIR = None
+
+PHASES = ('dns', 'connect', 'ttfb', 'download')
+
+_lock = threading.Lock()
+_requests = []
+_spans = {}     # name -> [count, seconds]
+_stages = []
+COUNTERS = Counter()
+
+
+def enable(metrics_json=None, profile_dir=None):
+    """Turn recording on; metrics_json is written on exit, profile_dir gets one .prof per stage"""
+    global ENABLED, METRICS_JSON, PROFILE_DIR
+    ENABLED = True
+    if metrics_json:
+        METRICS_JSON = metrics_json
+    if profile_dir:
+        PROFILE_DIR = Path(profile_dir)
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def add_arguments(parser):
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="Write per-request timings, cache and retry counts and stage durations to PATH")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="Run each stage under cProfile and write DIR/<stage>.prof")
+
+
+def configure(args):
+    """Enable recording if the --metrics-json / --profile arguments ask for it"""
+    if args.metrics_json or args.profile:
+        enable(args.metrics_json, args.profile)
+
+
+def record_request(record):
+    with _lock:
+        _requests.append(record)
+
+
+def count(name, amount=1):
+    if ENABLED:
+        with _lock:
+            COUNTERS[name] += amount
+
+
+def add_span(name, seconds):
+    with _lock:
+        span = _spans.setdefault(name, [0, 0.0])
+        span[0] += 1
+        span[1] += seconds
+
+
+def timed(name):
+    """Decorator adding a function's run time to the named span"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add_span(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def _profile_name(stage):
+    return re.sub(r'[^\w.-]+', '_', stage)
+
+
+def run_stage(name, func, *args, **kwargs):
+    """Run one stage, recording its duration (and its profile with --profile)"""
+    start = time.perf_counter()
+    if PROFILE_DIR is None:
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if ENABLED:
+                _stages.append({'stage': name, 'seconds': round(time.perf_counter() - start, 4)})
+    # cProfile follows the calling thread only; pooled fetches show up as time waiting on them
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        _stages.append({'stage': name, 'seconds': round(time.perf_counter() - start, 4)})
+        profiler.dump_stats(PROFILE_DIR / f"{_profile_name(name)}.prof")
+
+
+def skip_stage(name):
+    if ENABLED:
+        _stages.append({'stage': name, 'seconds': None})
+
+
+def export_raw():
+    """Recorded data as plain values, for a worker process to send to its parent"""
+    with _lock:
+        return {'requests': list(_requests), 'spans': {name: list(span) for name, span in _spans.items()},
+                'counters': dict(COUNTERS), 'stages': list(_stages)}
+
+
+def merge(raw, **tags):
+    """Add a worker's export_raw() data, tagging its requests and stages (e.g. lang='F')"""
+    with _lock:
+        _requests.extend(dict(record, **tags) for record in raw['requests'])
+        for name, (calls, seconds) in raw['spans'].items():
+            span = _spans.setdefault(name, [0, 0.0])
+            span[0] += calls
+            span[1] += seconds
+        COUNTERS.update(raw['counters'])
+        _stages.extend(dict(stage, **tags) for stage in raw['stages'])
+
+
+def _summary(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return {'count': len(values), 'total_ms': round(sum(values) * 1000, 1),
+            'p50_ms': round(adaptive.percentile(values, 0.5) * 1000, 1),
+            'p95_ms': round(adaptive.percentile(values, 0.95) * 1000, 1),
+            'max_ms': round(max(values) * 1000, 1)}
+
+
+def snapshot():
+    """Everything recorded so far, with per-host phase summaries"""
+    with _lock:
+        requests = list(_requests)
+        spans = {name: {'calls': calls, 'total_ms': round(seconds * 1000, 1)}
+                 for name, (calls, seconds) in sorted(_spans.items())}
+        counters = dict(sorted(COUNTERS.items()))
+        stages = list(_stages)
+
+    hosts = {}
+    for record in requests:
+        hosts.setdefault(record['host'], []).append(record)
+    by_host = {}
+    for host, records in sorted(hosts.items()):
+        by_host[host] = {
+            'requests': len(records),
+            'new_connections': sum(1 for record in records if not record['reused']),
+            'retries': sum(1 for record in records if record['attempt'] > 1),
+            'errors': sum(1 for record in records if record.get('error')),
+            'wire_bytes': sum(record['wire_bytes'] for record in records),
+            'bytes': sum(record['bytes'] for record in records),
+            **{phase: _summary([record.get(phase) for record in records]) for phase in PHASES},
+        }
+
+    hedge = sys.modules.get('hedge')  # Only reported if the run used it
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'argv': sys.argv,
+        'stages': stages,
+        'hosts': by_host,
+        'spans': spans,
+        'counters': counters,
+        'resilience': dict(resilience.STATS),
+        'hedge': dict(hedge.STATS) if hedge else None,
+        'concurrency': adaptive.metrics(),
+        'requests': requests,
+    }
+
+
+def write(path=None):
+    path = Path(path or METRICS_JSON)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(snapshot(), indent=1), encoding='utf-8')
+    os.replace(tmp, path)
+    return path
+
+
+def _write_on_exit():
+    if ENABLED and METRICS_JSON:
+        print(f"✓ Metrics written to {write()}")
+
+
+atexit.register(_write_on_exit)
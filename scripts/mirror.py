@@ -0,0 +1,257 @@
+"""
+Local mirror of the catalog's MP3s, for DHU testing and offline demos
+Files are fetched as parallel HTTP Range chunks into resumable .part files
+(completed chunks are recorded next to them, so an interrupted run picks up
+where it stopped), checked against the pub-media filesize and checksum, and
+stored by the MD5 of their content: a lesson or chapter used by several
+weeks is stored once. The store has a size cap; least recently used files
+are evicted first. URLs already in the store are not requested again.
+
+Environment overrides:
+  JW_AUTO_MIRROR_DIR        mirror directory (default: <cache root>/mirror)
+  JW_AUTO_MIRROR_MAX_BYTES  size cap in bytes (default 2 GB)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import adaptive
+import config
+import http_transport
+
+MIRROR_DIR = Path(os.environ.get('JW_AUTO_MIRROR_DIR', config.CACHE_ROOT / 'mirror'))
+MAX_BYTES = int(os.environ.get('JW_AUTO_MIRROR_MAX_BYTES', 2 * 1024 ** 3))
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_CONCURRENCY = 8
+TIMEOUT = 30
+
+
+def _write_json(path, data):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, indent=1, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Store:
+    """Content-addressed MP3 store: objects/<md5[:2]>/<md5>.mp3 plus a url -> md5 index"""
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or MIRROR_DIR)
+        self.max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+        self.partial = self.root / 'partial'
+        self.index_path = self.root / 'index.json'
+        try:
+            index = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            index = {}
+        self.urls = index.get('urls', {})
+        self.objects = index.get('objects', {})  # md5 -> {'size', 'last_used'}
+        self._lock = threading.Lock()
+
+    def object_path(self, digest):
+        return self.root / 'objects' / digest[:2] / f"{digest}.mp3"
+
+    def find(self, url, checksum=None):
+        """The digest of a URL's file if the store has it, else None"""
+        digest = checksum or self.urls.get(url)
+        if digest and digest in self.objects and self.object_path(digest).exists():
+            return digest
+        return None
+
+    def touch(self, url, digest):
+        with self._lock:
+            self.urls[url] = digest
+            self.objects.setdefault(digest, {})['last_used'] = time.time()
+
+    def add(self, url, part, digest):
+        """Move a verified .part file into the store under its digest"""
+        target = self.object_path(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        size = part.stat().st_size
+        os.replace(part, target)
+        with self._lock:
+            self.objects[digest] = {'size': size, 'last_used': time.time()}
+            self.urls[url] = digest
+        return target
+
+    def total_bytes(self):
+        return sum(entry.get('size', 0) for entry in self.objects.values())
+
+    def evict(self, pinned=()):
+        """Remove least recently used files until the store fits its cap; pinned digests stay"""
+        evicted = []
+        total = self.total_bytes()
+        for digest, entry in sorted(self.objects.items(), key=lambda item: item[1].get('last_used', 0)):
+            if total <= self.max_bytes:
+                break
+            if digest in pinned:
+                continue
+            self.object_path(digest).unlink(missing_ok=True)
+            total -= entry.get('size', 0)
+            evicted.append(digest)
+        for digest in evicted:
+            del self.objects[digest]
+        self.urls = {url: digest for url, digest in self.urls.items() if digest in self.objects}
+        return evicted
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            _write_json(self.index_path, {'urls': self.urls, 'objects': self.objects})
+
+
+class Download:
+    """One file fetched in Range chunks into a .part file; finished chunks survive restarts"""
+
+    def __init__(self, store, url, checksum=None, filesize=None):
+        self.url = url
+        self.checksum = checksum
+        self.expected_size = filesize
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+        self.part = store.partial / f"{name}.part"
+        self.state_path = store.partial / f"{name}.json"
+        self.bytes = 0
+        self.error = None
+        self._lock = threading.Lock()
+        try:
+            state = json.loads(self.state_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            state = {}
+        resumable = state.get('url') == url and self.part.exists()
+        self.size = state.get('size') if resumable else filesize
+        self.done = set(state.get('done', [])) if resumable else set()
+        if not resumable:
+            self.part.unlink(missing_ok=True)
+
+    @property
+    def complete(self):
+        return self.size is not None and not self.pending()
+
+    def pending(self):
+        """Offsets of the chunks still to fetch (just the first while the size is unknown)"""
+        if self.size is None:
+            return [0]
+        return [offset for offset in range(0, max(self.size, 1), CHUNK_SIZE) if offset not in self.done]
+
+    def _write(self, offset, data):
+        self.part.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if not self.part.exists():
+                self.part.touch()
+        with open(self.part, 'r+b') as f:
+            f.seek(offset)
+            f.write(data)
+
+    def _save_state(self):
+        _write_json(self.state_path, {'url': self.url, 'size': self.size, 'done': sorted(self.done)})
+
+    def fetch_chunk(self, offset):
+        """Fetch one chunk; a server that ignores Range sends the whole file, which completes it"""
+        if self.complete or offset in self.done:
+            return 0
+        end = offset + CHUNK_SIZE - 1
+        if self.size is not None:
+            end = min(end, self.size - 1)
+        response = http_transport.get(self.url, headers={'Range': f"bytes={offset}-{end}",
+                                                         'Accept-Encoding': 'identity'},
+                                      timeout=TIMEOUT, buffer=True)
+        data = response.read()
+        if response.status == 206:
+            total = (response.headers.get('Content-Range') or '').rpartition('/')[2]
+            self._write(offset, data)
+            with self._lock:
+                if self.size is None and total.isdigit():
+                    self.size = int(total)
+                self.done.add(offset)
+                self.bytes += len(data)
+                self._save_state()
+        else:
+            self._write(0, data)
+            with self._lock:
+                self.size = len(data)
+                self.done = set(range(0, max(self.size, 1), CHUNK_SIZE))
+                self.bytes += len(data)
+                self._save_state()
+        return len(data)
+
+    def finish(self, store):
+        """Verify the assembled file and move it into the store; returns (digest, error)"""
+        error = None
+        actual = self.part.stat().st_size if self.part.exists() else 0
+        if actual != self.size or (self.expected_size and actual != self.expected_size):
+            error = f"size {actual}, expected {self.expected_size or self.size}"
+        else:
+            digest = file_md5(self.part)
+            if self.checksum and digest != self.checksum:
+                error = f"checksum {digest}, expected {self.checksum}"
+        self.state_path.unlink(missing_ok=True)
+        if error:
+            self.part.unlink(missing_ok=True)
+            return None, error
+        store.add(self.url, self.part, digest)
+        return digest, None
+
+
+def mirror(store, entries, concurrency=DEFAULT_CONCURRENCY):
+    """Mirror entries (dicts with url, checksum, filesize); returns a summary dict
+
+    Entries already in the store cost no request. The rest are fetched in two
+    passes of Range chunks across all files: first chunks (which also reveal
+    unknown sizes), then everything left.
+    """
+    summary = {'files': 0, 'cached': 0, 'downloaded': 0, 'failed': [], 'bytes': 0, 'evicted': 0}
+    pinned = set()
+    downloads = []
+    for entry in {entry['url']: entry for entry in entries}.values():
+        summary['files'] += 1
+        digest = store.find(entry['url'], entry.get('checksum'))
+        if digest:
+            store.touch(entry['url'], digest)
+            pinned.add(digest)
+            summary['cached'] += 1
+        else:
+            downloads.append(Download(store, entry['url'], entry.get('checksum'), entry.get('filesize')))
+
+    def run_chunk(task):
+        download, offset = task
+        try:
+            return download.fetch_chunk(offset)
+        except OSError as e:  # URLError/HTTPError included; the chunk is retried on the next run
+            return e
+
+    for first_pass in (True, False):
+        tasks = [(download, offset) for download in downloads
+                 for offset in (download.pending()[:1] if first_pass else download.pending())]
+        for (download, _), result in zip(tasks, adaptive.map_ordered(
+                run_chunk, tasks, lambda task: adaptive.host_of(task[0].url), concurrency)):
+            if isinstance(result, Exception):
+                download.error = str(getattr(result, 'reason', result))
+
+    for download in downloads:
+        summary['bytes'] += download.bytes
+        if not download.complete:
+            summary['failed'].append((download.url, download.error or 'incomplete'))
+            continue
+        digest, error = download.finish(store)
+        if error:
+            summary['failed'].append((download.url, error))
+        else:
+            pinned.add(digest)
+            summary['downloaded'] += 1
+
+    summary['evicted'] = len(store.evict(pinned))
+    store.save()
+    summary['store_bytes'] = store.total_bytes()
+    return summary
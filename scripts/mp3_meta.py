@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+MP3 duration and bitrate from the first few KB of each file
+Reads only the start of an MP3 with a Range request, skips the ID3v2 tag,
+and parses the first MPEG audio frame and its Xing/Info (with LAME encoder
+delay and padding) or VBRI header. VBR files get their duration from the
+frame count. CBR files without one get it from the file size (taken from
+Content-Range) and the frame bitrate. Results are cached in the catalog by
+URL and checksum, so each file is probed once.
+
+Usage:
+  python3 scripts/mp3_meta.py                 # fill in missing durations in the catalog
+  python3 scripts/mp3_meta.py --url URL ...   # print what a file's header says
+"""
+
+import argparse
+import struct
+from collections import namedtuple
+
+import adaptive
+import catalog
+import http_transport
+import metrics
+
+HEAD_BYTES = 16 * 1024     # enough for a typical ID3 tag plus the first frame
+FRAME_BYTES = 4 * 1024     # read again after a larger ID3 tag
+MIN_FRAME_BYTES = 512      # a frame header plus a Xing/LAME or VBRI tag
+DEFAULT_CONCURRENCY = 16
+TIMEOUT = 15
+
+Mp3Info = namedtuple('Mp3Info', ['duration', 'bitrate', 'sample_rate', 'vbr', 'filesize'])
+
+# kbps by [MPEG-1 or not][bitrate index], Layer III
+_BITRATES = {
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Hz by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+class Mp3Error(ValueError):
+    """Raised when the bytes read don't contain a usable MPEG Layer III header"""
+
+
+def id3_size(data):
+    """Total size of a leading ID3v2 tag (0 if there is none)"""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:  # Synchsafe: 7 bits per byte
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def parse_frame_header(data, offset):
+    """(version bits, mono, bitrate kbps, sample rate, samples per frame, frame length) at offset"""
+    if offset + 4 > len(data):
+        raise Mp3Error("no MPEG frame header")
+    header, = struct.unpack_from('>I', data, offset)
+    if header >> 21 != 0x7FF:
+        raise Mp3Error("no MPEG frame sync")
+    version = (header >> 19) & 3
+    layer = (header >> 17) & 3
+    bitrate_index = (header >> 12) & 15
+    rate_index = (header >> 10) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        raise Mp3Error("not an MPEG Layer III frame")
+    mpeg1 = version == 3
+    bitrate = _BITRATES[mpeg1][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header >> 9) & 1
+    mono = (header >> 6) & 3 == 3
+    samples = 1152 if mpeg1 else 576
+    length = samples // 8 * bitrate * 1000 // sample_rate + padding
+    return version, mono, bitrate, sample_rate, samples, length
+
+
+def find_frame(data, start):
+    """Offset of the first valid frame header at or after start
+
+    Where the following frame is within data, it must have a valid header too,
+    so a stray sync pattern in leftover tag bytes isn't taken for audio.
+    """
+    offset = data.find(b'\xff', start)
+    while 0 <= offset < len(data) - 3:
+        try:
+            length = parse_frame_header(data, offset)[5]
+            if offset + length + 4 <= len(data):
+                parse_frame_header(data, offset + length)
+            return offset
+        except Mp3Error:
+            offset = data.find(b'\xff', offset + 1)
+    raise Mp3Error("no MPEG frame found")
+
+
+@metrics.timed('parse.mp3_header')
+def parse_info(data, offset, filesize=None, base=0):
+    """Mp3Info from the frame at offset in data
+
+    filesize is the whole file's (for CBR files) and base the file offset data was read from.
+    """
+    version, mono, bitrate, sample_rate, samples, length = parse_frame_header(data, offset)
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    frames = audio_bytes = None
+    vbr = False
+    delay = 0
+
+    xing = offset + 4 + side_info
+    tag = data[xing:xing + 4]
+    if tag in (b'Xing', b'Info'):
+        vbr = tag == b'Xing'
+        flags, = struct.unpack_from('>I', data, xing + 4)
+        position = xing + 8
+        if flags & 1:
+            frames, = struct.unpack_from('>I', data, position)
+            position += 4
+        if flags & 2:
+            audio_bytes, = struct.unpack_from('>I', data, position)
+            position += 4
+        position += 100 if flags & 4 else 0  # TOC
+        position += 4 if flags & 8 else 0    # Quality
+        if data[position:position + 4] == b'LAME' and position + 24 <= len(data):
+            # 12 bits of encoder delay then 12 bits of padding, 21 bytes into the LAME tag
+            a, b, c = data[position + 21:position + 24]
+            delay = ((a << 4) | (b >> 4)) + (((b & 0x0F) << 8) | c)
+    elif data[offset + 36:offset + 40] == b'VBRI':
+        vbr = True
+        audio_bytes, frames = struct.unpack_from('>II', data, offset + 36 + 10)
+
+    if frames:
+        duration = max(0, frames * samples - delay) / sample_rate
+        if audio_bytes and duration:
+            bitrate = round(audio_bytes * 8 / duration / 1000)
+    elif filesize:
+        duration = (filesize - base - offset) * 8 / (bitrate * 1000)
+    else:
+        raise Mp3Error("no frame count and no file size")
+    return Mp3Info(round(duration, 3), bitrate, sample_rate, vbr, filesize)
+
+
+def _range(url, start, end):
+    # Read at most end + 1 bytes: if the Range is ignored, the rest of the file is dropped with the connection
+    response = http_transport.get(url, headers={'Range': f"bytes={start}-{end}", 'Accept-Encoding': 'identity'},
+                                  timeout=TIMEOUT, buffer=end + 1)
+    data = response.read()
+    if response.status == 206:
+        total = (response.headers.get('Content-Range') or '').rpartition('/')[2]
+        return data, int(total) if total.isdigit() else None
+    length = response.headers.get('Content-Length')
+    return data[start:end + 1], int(length) if length and length.isdigit() else None
+
+
+def probe(url):
+    """Read the start of an MP3 and return its Mp3Info"""
+    data, filesize = _range(url, 0, HEAD_BYTES - 1)
+    start = id3_size(data)
+    if start + MIN_FRAME_BYTES <= len(data) or len(data) == filesize:
+        return parse_info(data, find_frame(data, start), filesize)
+    # A large ID3 tag (cover art): read just past it
+    data, filesize = _range(url, start, start + FRAME_BYTES - 1)
+    return parse_info(data, find_frame(data, 0), filesize, base=start)
+
+
+def probe_entry(entry):
+    """Probe one (url, checksum) pair; returns a result dict for Catalog.record_media_info"""
+    url, checksum = entry
+    result = {'url': url, 'checksum': checksum, 'duration': None, 'bitrate': None,
+              'sample_rate': None, 'vbr': None, 'filesize': None}
+    try:
+        info = probe(url)
+    except (Mp3Error, struct.error) as e:
+        print(f"  ✗ {url}: {e}")
+        return result  # Stored, so an unparseable file isn't fetched again
+    except OSError as e:  # URLError/HTTPError included; not stored, so the next run retries
+        print(f"  ✗ {url}: {getattr(e, 'reason', e)}")
+        return None
+    return dict(result, duration=info.duration, bitrate=info.bitrate, sample_rate=info.sample_rate,
+                vbr=int(info.vbr), filesize=info.filesize)
+
+
+def fill_durations(store, lang=None, concurrency=DEFAULT_CONCURRENCY):
+    """Probe every catalog MP3 without a duration and copy the results into its rows
+
+    Files already probed (same URL and checksum) are not requested again.
+    Returns (files probed, rows updated).
+    """
+    pending = store.missing_durations(lang)
+    if pending:
+        print(f"Reading the headers of {len(pending)} MP3(s)...")
+    results = adaptive.map_ordered(probe_entry, pending, lambda entry: adaptive.host_of(entry[0]), concurrency)
+    store.record_media_info([result for result in results if result is not None])
+    return len(pending), store.fill_durations()
+
+
+def run(lang=None, concurrency=DEFAULT_CONCURRENCY):
+    """Pipeline stage: fill in durations and re-export the CSVs that changed"""
+    store = catalog.get_catalog()
+    probed, updated = fill_durations(store, lang, concurrency)
+    print(f"✓ Probed {probed} MP3(s); {updated} catalog row(s) got a duration")
+    for code in [lang] if lang else store.langs():
+        for pub in (*catalog.WEEK_CSVS, 'sections'):
+            if store.export_csv(pub, lang=code):
+                print(f"✓ Updated {catalog.csv_path(pub, code)}")
+    return updated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read MP3 durations and bitrates from their headers")
+    parser.add_argument("--url", action="append", help="Print what one file's header says; may be repeated")
+    parser.add_argument("--lang", help="Only fill in one language (default: all)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum number of files read in parallel")
+    metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    metrics.configure(args)
+
+    if not args.url:
+        metrics.run_stage('durations', run, args.lang, args.concurrency)
+        return 0
+    status = 0
+    for url in args.url:
+        try:
+            info = probe(url)
+        except (Mp3Error, struct.error, OSError) as e:
+            print(f"✗ {url}: {getattr(e, 'reason', e)}")
+            status = 1
+            continue
+        kind = 'VBR' if info.vbr else 'CBR'
+        print(f"✓ {url}: {info.duration:.1f}s, {info.bitrate} kbps {kind}, {info.sample_rate} Hz")
+    return status
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
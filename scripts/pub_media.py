@@ -0,0 +1,55 @@
+"""
+Shared GETPUBMEDIALINKS lookups
+Holds the process-wide lfb lesson caches (one per language), so every stage
+of a pipeline run (and every script) shares one fetch of the lesson catalog.
+"""
+
+from urllib.parse import urlencode
+
+import config
+import http_cache
+
+BASE_URL = config.PUB_MEDIA_URL
+
+# Lesson number -> MP3 URL, filled once per process (English)
+LESSON_CACHE = {}
+
+# Language code -> lesson cache
+_lesson_caches = {'E': LESSON_CACHE}
+
+
+def mp3_items(data):
+    """Yield every MP3 item in a GETPUBMEDIALINKS response"""
+    if not data or 'files' not in data:
+        return
+    for lang_data in data['files'].values():
+        yield from lang_data.get('MP3', [])
+
+
+def get_lesson_mp3s(lang='E'):
+    """Fetch all CBS lesson MP3s in a language (cached for the life of the process)"""
+    lessons = _lesson_caches.setdefault(lang, {})
+    if lessons:
+        return lessons
+
+    params = {
+        'pub': 'lfb',
+        'fileformat': 'MP3',
+        'output': 'json',
+        'langwritten': lang
+    }
+
+    url = f"{BASE_URL}?{urlencode(params)}"
+    try:
+        data = http_cache.fetch_json(url, timeout=15)
+    except Exception as e:
+        print(f"  Error fetching lesson catalog: {e}")
+        return lessons
+
+    for idx, item in enumerate(mp3_items(data)):
+        mp3_url = item.get('file', {}).get('url', '')
+        if mp3_url:
+            # Index is the lesson number
+            lessons[idx] = mp3_url
+
+    return lessons
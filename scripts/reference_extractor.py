@@ -0,0 +1,238 @@
+"""
+Single-pass extractor for the Bible reading and CBS lesson references on a week page
+The page is scanned once with one precompiled pattern. Book names are matched
+through a prefix trie of BIBLE_BOOKS (compiled into the pattern, so the regex
+engine walks it) instead of backtracking over every capitalized phrase and
+filtering afterwards, and scanning stops as soon as both the Bible reading and
+the lfb lessons have been found.
+"""
+
+import codecs
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+import http_transport
+import metrics
+from bible_books import BIBLE_BOOKS
+
+_END = object()
+
+
+class BibleSpan(namedtuple('BibleSpan', ['book', 'start_chapter', 'start_verse', 'end_chapter', 'end_verse'])):
+    """A Bible reading such as "Song of Solomon 6:1–7:13" (verses may be None)"""
+
+    __slots__ = ()
+
+    @property
+    def chapters(self):
+        return list(range(self.start_chapter, max(self.start_chapter, self.end_chapter) + 1))
+
+    @property
+    def reference(self):
+        start = f"{self.start_chapter}:{self.start_verse}" if self.start_verse else f"{self.start_chapter}"
+        if self.end_chapter != self.start_chapter:
+            end = f"{self.end_chapter}:{self.end_verse}" if self.end_verse else f"{self.end_chapter}"
+            return f"{self.book} {start}-{end}"
+        if self.end_verse and self.end_verse != self.start_verse:
+            return f"{self.book} {start}-{self.end_verse}"
+        return f"{self.book} {start}"
+
+
+def _build_trie(names):
+    """Lower-cased character trie of book names; _END marks a complete name"""
+    root = {}
+    for name in names:
+        node = root
+        for char in name.lower():
+            node = node.setdefault(char, {})
+        node[_END] = name
+    return root
+
+
+def _trie_pattern(node):
+    """Compile a trie into a regex so the engine walks it one character at a time"""
+    branches = [re.escape(char) + _trie_pattern(child)
+                for char, child in sorted((k, v) for k, v in node.items() if k is not _END)]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    # Greedy optional group: the longest book name wins ("1 John" over "1"; "John" over "Jo")
+    return f'(?:{pattern})?' if _END in node else pattern
+
+
+BOOK_TRIE = _build_trie(BIBLE_BOOKS)
+CANONICAL_BOOKS = {name.lower(): name for name in BIBLE_BOOKS}
+
+# Candidate positions: an "lfb" token, or a book name followed by a chapter number.
+# Book names must start with a capital or a digit so everyday words like "job"
+# or "acts" aren't taken as books; the rest matches case-insensitively ("ISAIAH").
+SCAN_PATTERN = re.compile(
+    r'(?<![\w])(?:'
+    r'(?i:lfb)(?!\w)'
+    r'|(?=[123A-Z])(?P<book>(?i:' + _trie_pattern(BOOK_TRIE) + r'))(?![A-Za-z])(?=\s+\d)'
+    r')')
+
+# "6", "6:1", "6:1-17", "6-8", "6:1–7:13"
+CHAPTER_PATTERN = re.compile(r'\s+(\d{1,3})(?::(\d{1,3}))?(?:\s*[-–—]\s*(\d{1,3})(?::(\d{1,3}))?)?')
+
+# "lfb lesson 36", "lfb lessons 36-37", "lfb lesson 36, intro to section 7, and lesson 37"
+LESSON_PATTERN = re.compile(
+    r'lfb[^<]{0,80}?lessons?\s+(\d+)(?:\s*[,\-–]\s*(?:and\s+)?(?:lessons?\s+)?(\d+))?',
+    re.IGNORECASE)
+
+
+def match_span(text, book, pos):
+    """Parse the chapter/verse reference after a book name at pos, or return None"""
+    match = CHAPTER_PATTERN.match(text, pos)
+    if not match:
+        return None
+    start_ch, start_v, second, second_v = match.groups()
+    start_ch = int(start_ch)
+    start_v = int(start_v) if start_v else None
+    if second_v:
+        # "6:1–7:13" spans chapters
+        end_ch, end_v = int(second), int(second_v)
+    elif second and start_v:
+        # "1:1-31" is a verse range inside one chapter
+        end_ch, end_v = start_ch, int(second)
+    elif second:
+        # "6-8" is a chapter range
+        end_ch, end_v = int(second), None
+    else:
+        end_ch, end_v = start_ch, start_v
+    return BibleSpan(book, start_ch, start_v, end_ch, end_v)
+
+
+def match_lessons(text, pos):
+    """Parse lfb lesson numbers at pos (an "lfb" token), or return []"""
+    match = LESSON_PATTERN.match(text, pos)
+    if not match:
+        return []
+    lesson1 = int(match.group(1))
+    lessons = [lesson1]
+    if match.group(2):
+        lesson2 = int(match.group(2))
+        # If they're sequential, add all in between
+        if lesson2 > lesson1:
+            lessons.extend(range(lesson1 + 1, lesson2 + 1))
+        elif lesson2 not in lessons:
+            lessons.append(lesson2)
+    return lessons
+
+
+def _scan(text, start, end, bible, lessons):
+    """Scan for references starting in text[start:end]; returns (bible, lessons, where to resume)
+
+    Matches may run past end (the pattern and the span parsers see the whole
+    text), so a book name or "lfb" token cut by end is still found whole.
+    """
+    lessons = lessons or []
+    resume = end
+    for match in SCAN_PATTERN.finditer(text, start):
+        if match.start() >= end:
+            break
+        resume = max(end, match.end())
+        book = match.group('book')
+        if book is not None:
+            if bible is None:
+                bible = match_span(text, CANONICAL_BOOKS[book.lower()], match.end())
+        elif not lessons:
+            lessons = match_lessons(text, match.start())
+        if bible is not None and lessons:
+            break
+    return bible, lessons, resume
+
+
+def extract_references(text, start=0, end=None, bible=None, lessons=None):
+    """Scan text once and return (BibleSpan or None, [lesson numbers])
+
+    Scanning stops as soon as both a Bible reading and lfb lessons are found.
+    Only references starting before end are taken. Pass bible/lessons found
+    earlier (with start/end) to resume an incremental scan.
+    """
+    bible, lessons, _ = _scan(text, start, len(text) if end is None else end, bible, lessons)
+    return bible, lessons
+
+
+# Characters kept back from each incremental scan so a reference split across
+# chunks ("Isaiah 6:1–" ... "7:13") isn't parsed until it is complete: a scan
+# only takes references starting this far before the end of the text so far
+STREAM_GUARD = 120
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+class ReferenceStreamParser(HTMLParser):
+    """Incremental HTML parser that scans page text for references as it arrives"""
+
+    SKIP_TAGS = {'script', 'style', 'noscript', 'template'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = ''
+        self.bible = None
+        self.lessons = []
+        self._pending = []
+        self._scanned = 0
+        self._skip_depth = 0
+
+    @property
+    def done(self):
+        return self.bible is not None and bool(self.lessons)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        self._pending.append(' ')  # Keep words from adjacent elements apart
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        self._pending.append(' ')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._pending.append(data)
+
+    @metrics.timed('parse.week_page')
+    def feed_text(self, chunk, final=False):
+        """Feed decoded HTML and scan the new text; returns True once both references are found"""
+        self.feed(chunk)
+        if final:
+            self.close()
+        if self._pending:
+            self.text += ''.join(self._pending)
+            self._pending.clear()
+        limit = len(self.text) if final else max(0, len(self.text) - STREAM_GUARD)
+        if limit > self._scanned:
+            self.bible, self.lessons, self._scanned = _scan(
+                self.text, self._scanned, limit, self.bible, self.lessons)
+        return self.done
+
+
+def parse_html_references(html):
+    """Extract references from a complete HTML page (same text view as streaming)"""
+    parser = ReferenceStreamParser()
+    parser.feed_text(html, final=True)
+    return parser.bible, parser.lessons
+
+
+def fetch_references(url, timeout=15, chunk_size=STREAM_CHUNK_SIZE):
+    """Stream a week page and return (BibleSpan or None, [lessons])
+
+    The connection is closed as soon as both references have been seen, so the
+    rest of the page is never downloaded.
+    """
+    response = http_transport.get(url, timeout=timeout)
+    charset = response.headers.get_content_charset() or 'utf-8'
+    decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+    parser = ReferenceStreamParser()
+    try:
+        for chunk in response.iter_chunks(chunk_size):
+            if parser.feed_text(decoder.decode(chunk)):
+                break
+        else:
+            parser.feed_text(decoder.decode(b'', final=True), final=True)
+    finally:
+        response.close()
+    return parser.bible, parser.lessons
@@ -0,0 +1,182 @@
+"""
+Retry, backoff and circuit breaking for the shared HTTP transport
+Transient failures (connection errors, timeouts, 408/429/5xx) are retried with
+full-jitter exponential backoff, honouring Retry-After. Retries are drawn from
+one budget per process, so an outage can't multiply a run's request count,
+and a per-host circuit breaker fails requests fast once a host keeps failing
+instead of letting each one wait for its timeout.
+
+Environment overrides:
+  JW_AUTO_RETRIES       attempts per request, including the first (default 4)
+  JW_AUTO_RETRY_BUDGET  retries allowed per process across all requests (default 100)
+"""
+
+import os
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from urllib.error import URLError
+
+MAX_ATTEMPTS = int(os.environ.get('JW_AUTO_RETRIES', 4))
+RETRY_BUDGET = int(os.environ.get('JW_AUTO_RETRY_BUDGET', 100))
+BASE_DELAY = 0.5       # seconds; the first retry waits up to this long
+MAX_DELAY = 20.0       # cap on a single backoff
+MAX_RETRY_AFTER = 60.0 # a longer Retry-After is treated as "give up for this run"
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+BREAKER_THRESHOLD = 5  # consecutive failures that open a host's circuit
+BREAKER_COOLDOWN = 30.0  # seconds before a single probe request is let through
+
+STATS = Counter()
+_stats_lock = threading.Lock()
+
+
+def count(name, amount=1):
+    with _stats_lock:
+        STATS[name] += amount
+
+
+class CircuitOpenError(URLError):
+    """Raised instead of sending a request to a host whose circuit is open"""
+
+    def __init__(self, host, retry_in):
+        super().__init__(f"circuit open for {host} (retry in {retry_in:.0f}s)")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class RetryBudget:
+    """A per-process allowance of retries shared by every request"""
+
+    def __init__(self, limit=RETRY_BUDGET):
+        self.limit = limit
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def try_spend(self):
+        with self._lock:
+            if self.spent >= self.limit:
+                return False
+            self.spent += 1
+            return True
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> half-open after `cooldown`"""
+
+    def __init__(self, host, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.cooldown else 'open'
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may be sent now"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            waited = time.monotonic() - self.opened_at
+            if waited >= self.cooldown and not self._probing:
+                self._probing = True  # Let exactly one probe through
+                return
+        count('circuit_rejections')
+        raise CircuitOpenError(self.host, max(0.0, self.cooldown - waited))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                if self.opened_at is None or self._probing:
+                    count('circuit_opened')
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+_budget = RetryBudget()
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def budget():
+    return _budget
+
+
+def breaker_for(host):
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def reset():
+    """Forget breaker state and refill the retry budget (e.g. between benchmark rounds)"""
+    global _budget
+    with _breakers_lock:
+        _breakers.clear()
+    _budget = RetryBudget()
+    with _stats_lock:
+        STATS.clear()
+
+
+def backoff_delay(attempt, base=BASE_DELAY, cap=MAX_DELAY):
+    """Full-jitter exponential backoff for the given retry number (1 = first retry)"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def retry_after_seconds(headers):
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP date), or None"""
+    value = headers.get('Retry-After') if headers is not None else None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def is_retryable_status(status):
+    return status in RETRYABLE_STATUS
+
+
+def next_delay(method, attempt, headers=None):
+    """Seconds to wait before retrying, or None if the request should not be retried
+
+    attempt is the number of attempts already made.
+    """
+    if method.upper() not in IDEMPOTENT_METHODS or attempt >= MAX_ATTEMPTS:
+        return None
+    delay = backoff_delay(attempt)
+    retry_after = retry_after_seconds(headers)
+    if retry_after is not None:
+        if retry_after > MAX_RETRY_AFTER:
+            return None
+        delay = max(delay, retry_after)
+    if not _budget.try_spend():
+        count('retry_budget_exhausted')
+        return None
+    count('retries')
+    return delay
@@ -0,0 +1,36 @@
+"""
+Shared setup for the script tests
+The scripts are flat modules, so their directory goes on sys.path. Caches and
+the catalog go to a scratch directory, never the repo's .cache.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault('JW_AUTO_CACHE_ROOT', tempfile.mkdtemp(prefix='jwauto-tests-'))
+os.environ.pop('JW_AUTO_NO_CACHE', None)
+
+
+@pytest.fixture
+def serve():
+    """serve(handler_class) starts a local HTTP server and returns its base URL"""
+    servers = []
+
+    def start(handler):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import adaptive
+
+
+def test_new_controller_starts_small():
+    controller = adaptive.AIMDController('example.test', maximum=8)
+    assert int(controller.limit) == adaptive.INITIAL_LIMIT
+    assert controller.slow_start
+
+
+def test_slow_start_doubles_each_round_trip_up_to_the_cap():
+    controller = adaptive.AIMDController('example.test', maximum=8)
+    limits = []
+    for _ in range(3):
+        # One round trip: every request allowed in flight completes
+        for _ in range(int(controller.limit)):
+            controller.observe(0.01, status=200)
+        limits.append(int(controller.limit))
+    assert limits == [4, 8, 8]
+
+
+def test_short_run_reaches_full_concurrency(monkeypatch):
+    monkeypatch.setattr(adaptive, '_controllers', {})
+    monkeypatch.setattr(adaptive, '_max_limit_for', lambda host: 8)
+    running = peak = 0
+    lock = threading.Lock()
+
+    def task(item):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        adaptive.observe('example.test', 0.05, status=200)  # As http_transport.request does
+        return item
+
+    assert adaptive.map_ordered(task, range(24), 'example.test', max_workers=8) == list(range(24))
+    assert peak == 8
+
+
+def test_first_error_ends_slow_start_and_halves_the_limit():
+    controller = adaptive.AIMDController('example.test', maximum=16)
+    for _ in range(6):
+        controller.observe(0.01, status=200)
+    assert int(controller.limit) == 8
+    controller.observe(0.01, status=503)
+    assert int(controller.limit) == 4
+    assert not controller.slow_start
+    for _ in range(4):
+        controller.observe(0.01, status=200)
+    assert int(controller.limit) == 4  # Additive: about one slot per window of `limit` successes
+    for _ in range(4):
+        controller.observe(0.01, status=200)
+    assert int(controller.limit) == 5
@@ -0,0 +1,121 @@
+from datetime import date, timedelta
+
+import pytest
+
+import catalog
+
+
+def _weeks(count, url='https://cdn.test/mwb_E_{:02}.mp3', start=date(2025, 11, 3)):
+    rows = []
+    for number in range(count):
+        monday = start + timedelta(weeks=number)
+        rows.append({'week_start': monday.isoformat(), 'week': f"{monday:%B} {monday.day}-{monday.day + 6}",
+                     'url': url.format(number), 'issue': f"{monday:%Y%m}"})
+    return rows
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = catalog.Catalog(tmp_path / 'catalog.sqlite3')
+    starts = []
+    render = store.render_week_csv
+
+    def recording_render(pub, lang='E', start=None):
+        starts.append(start)
+        return render(pub, lang, start)
+
+    monkeypatch.setattr(store, 'render_week_csv', recording_render)
+    store.renders = starts
+    yield store
+    store.close()
+
+
+def _full_text(store, pub='mwb'):
+    header, blocks = catalog.Catalog.render_week_csv(store, pub)
+    return header + ''.join(text for _, text in blocks)
+
+
+def test_unchanged_catalog_renders_nothing(store, tmp_path):
+    path = tmp_path / 'mwb.csv'
+    store.upsert_weeks('mwb', _weeks(30))
+    assert store.export_csv('mwb', path)
+    store.renders.clear()
+    assert not store.export_csv('mwb', path)
+    assert store.renders == []
+
+
+def test_rewriting_identical_rows_renders_nothing(store, tmp_path):
+    path = tmp_path / 'mwb.csv'
+    store.upsert_weeks('mwb', _weeks(30))
+    store.export_csv('mwb', path)
+    store.renders.clear()
+    store.upsert_weeks('mwb', _weeks(30))
+    assert not store.export_csv('mwb', path)
+    assert store.renders == []
+
+
+def test_only_weeks_from_the_first_change_are_rendered(store, tmp_path):
+    path = tmp_path / 'mwb.csv'
+    rows = _weeks(30)
+    store.upsert_weeks('mwb', rows)
+    store.export_csv('mwb', path)
+    store.renders.clear()
+    changed = dict(rows[27], url='https://cdn.test/mwb_E_27_fixed.mp3')
+    store.upsert_weeks('mwb', [changed])
+    assert store.export_csv('mwb', path)
+    assert store.renders == [rows[27]['week_start']]
+    assert path.read_text(encoding='utf-8') == _full_text(store)
+
+
+def test_appended_weeks_render_only_the_new_ones(store, tmp_path):
+    path = tmp_path / 'mwb.csv'
+    rows = _weeks(32)
+    store.upsert_weeks('mwb', rows[:30])
+    store.export_csv('mwb', path)
+    store.renders.clear()
+    store.upsert_weeks('mwb', rows[30:])
+    assert store.export_csv('mwb', path)
+    assert store.renders == [rows[30]['week_start']]
+    assert path.read_text(encoding='utf-8') == _full_text(store)
+
+
+def test_hand_edited_csv_is_rewritten_in_full(store, tmp_path):
+    path = tmp_path / 'mwb.csv'
+    store.upsert_weeks('mwb', _weeks(5))
+    store.export_csv('mwb', path)
+    path.write_text(path.read_text(encoding='utf-8') + 'stray,row,\n', encoding='utf-8')
+    store.renders.clear()
+    assert store.export_csv('mwb', path)
+    assert store.renders == [None]
+    assert path.read_text(encoding='utf-8') == _full_text(store)
+
+
+def test_sections_changes_are_tracked_per_week(tmp_path):
+    store = catalog.Catalog(tmp_path / 'catalog.sqlite3')
+    path = tmp_path / 'sections.csv'
+    week = {'week_start': '2025-11-03', 'week': 'November 3-9', 'reference': 'Isaiah 58'}
+    store.replace_sections([dict(week, section=catalog.BIBLE_READING, url='https://cdn.test/bi12_58.mp3')])
+    assert store.export_csv('sections', path)
+    version, changed = store.changes_since('sections', 'E', catalog.csv_index.load_index(path)['version'])
+    assert changed == set()
+    store.replace_sections([dict(week, section=catalog.BIBLE_READING, url='https://cdn.test/bi12_59.mp3')])
+    _, changed = store.changes_since('sections', 'E', version)
+    assert changed == {'2025-11-03'}
+    assert store.export_csv('sections', path)
+    assert 'bi12_59' in path.read_text(encoding='utf-8')
+    store.close()
+
+
+def test_rows_added_outside_the_catalog_are_imported_not_reverted(store, tmp_path):
+    path = tmp_path / 'mwb.csv'
+    rows = _weeks(6)
+    store.upsert_weeks('mwb', rows[:5])
+    store.export_csv('mwb', path)
+    added = f"{rows[5]['week']},https://cdn.test/mwb_E_202512_01.mp3,\n"
+    path.write_text(path.read_text(encoding='utf-8') + added, encoding='utf-8')  # git pull, say
+    store.export_csv('mwb', path)
+    assert path.read_text(encoding='utf-8').endswith(added)
+    assert rows[5]['week_start'] in store.week_starts('mwb')
+    store.renders.clear()
+    assert not store.export_csv('mwb', path)
+    assert store.renders == []
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import generate_jw_overrides as overrides
+
+SECTIONS = {
+    "2025-11-03": {"Bible Reading": ["https://cdn.test/bi12_E_23_58.mp3", "https://cdn.test/bi12_E_23_59.mp3"],
+                   "Congregation Bible Study": ["https://cdn.test/lfb_E_036.mp3"]},
+    "2025-11-10": {"Bible Reading": ["https://cdn.test/bi12_E_23_60.mp3"],
+                   "Congregation Bible Study": ["https://cdn.test/lfb_E_037.mp3"]},
+}
+
+
+def _entry(text, week_start):
+    start = text.index(f'"{week_start}" to MeetingSections(')
+    return text[start:text.index("\n    ),", start)]
+
+
+def test_every_week_names_both_duration_lists():
+    text = overrides.render_sections(SECTIONS, {"https://cdn.test/bi12_E_23_58.mp3": 301.4})
+    known = _entry(text, "2025-11-03")
+    assert "bibleReadingDurationsMs = listOf(301400L, 0L)," in known
+    assert "congregationStudyDurationsMs = listOf(0L)" in known
+    unknown = _entry(text, "2025-11-10")
+    assert "bibleReadingDurationsMs = listOf(0L)," in unknown
+    assert "congregationStudyDurationsMs = listOf(0L)" in unknown
+
+
+def test_weeks_without_any_duration_have_the_same_shape():
+    text = overrides.render_sections(SECTIONS)
+    assert text.count("bibleReadingDurationsMs = ") == len(SECTIONS)
+    assert text.count("congregationStudyDurationsMs = ") == len(SECTIONS)
+
+
+# Written to app/src/test/resources/override_asset.bin, which OverrideAssetTest.kt reads back
+FIXTURE = Path(__file__).resolve().parents[2] / "app/src/test/resources/override_asset.bin"
+FIXTURE_WORKBOOK = [("2025-11-03", "https://cdn.test/mwb_E_202511_01.mp3"),
+                    ("2025-11-10", "https://cdn.test/mwb_E_202511_02.mp3")]
+FIXTURE_WATCHTOWER = [("2025-11-10", "https://cdn.test/w_E_202509_01.mp3"),
+                      ("2025-11-17", "https://cdn.test/mwb_E_202511_02.mp3"),
+                      ("2025-11-24", "https://cdn.test/w_RO_202509_03_înțelepciune.mp3")]
+FIXTURE_DURATIONS = {"https://cdn.test/bi12_E_23_58.mp3": 301.4}
+
+
+def test_binary_fixture_matches_render_binary():
+    rendered = overrides.render_binary(FIXTURE_WORKBOOK, FIXTURE_WATCHTOWER, SECTIONS, FIXTURE_DURATIONS)
+    assert FIXTURE.read_bytes() == rendered
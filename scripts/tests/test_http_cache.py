@@ -0,0 +1,94 @@
+import tempfile
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+
+import pytest
+
+import http_cache
+import resilience
+
+
+class GoneAfterFirst(BaseHTTPRequestHandler):
+    """200 for the first GET, then `status` (404 unless a test changes it)"""
+    status = 404
+    served = 0
+
+    def do_GET(self):
+        type(self).served += 1
+        code = 200 if self.served == 1 else self.status
+        body = b'{"ok": true}' if code == 200 else b'gone'
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def cache_dir(monkeypatch):
+    monkeypatch.setattr(http_cache, 'CACHE_DIR', Path(tempfile.mkdtemp(prefix='http-cache-')))
+    monkeypatch.setattr(http_cache, 'DISABLED', False)
+
+
+def _origin(serve, status):
+    handler = type('Origin', (GoneAfterFirst,), {'status': status, 'served': 0})
+    return f"{serve(handler)}/apis/pub-media/GETPUBMEDIALINKS?pub=mwb", handler
+
+
+def test_404_after_cached_200_is_raised(serve, cache_dir):
+    url, handler = _origin(serve, 404)
+    assert http_cache.cached_get(url) == b'{"ok": true}'
+    with pytest.raises(HTTPError) as error:
+        http_cache.cached_get(url, ttl=0, stale_ttl=0)
+    assert error.value.code == 404
+    assert handler.served == 2
+
+
+def test_5xx_after_cached_200_serves_the_cached_copy(serve, cache_dir, monkeypatch):
+    monkeypatch.setattr(resilience, 'MAX_ATTEMPTS', 1)
+    url, _ = _origin(serve, 503)
+    assert http_cache.cached_get(url) == b'{"ok": true}'
+    assert http_cache.cached_get(url, ttl=0, stale_ttl=0) == b'{"ok": true}'
+
+
+class Truncated(BaseHTTPRequestHandler):
+    """Promises 100 bytes of JSON and closes after 5"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '100')
+        self.end_headers()
+        self.wfile.write(b'{"a":')
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def test_truncated_body_is_not_cached(serve, cache_dir, monkeypatch):
+    monkeypatch.setattr(resilience, 'MAX_ATTEMPTS', 1)
+    url = f"{serve(Truncated)}/apis/pub-media/GETPUBMEDIALINKS?pub=w"
+    with pytest.raises(URLError):
+        http_cache.fetch_json(url)
+    assert http_cache.load_entry(url) == (None, None)
+    resilience.reset()
+
+
+def test_body_shorter_than_content_length_is_not_stored(cache_dir, monkeypatch):
+    monkeypatch.setattr(http_cache.hedge, 'fetch', lambda url, **kwargs: (b'{"a":', {'Content-Length': '100'}))
+    url = 'https://b.jw-cdn.org/apis/pub-media/GETPUBMEDIALINKS?pub=w'
+    with pytest.raises(URLError):
+        http_cache.cached_get(url)
+    assert http_cache.load_entry(url) == (None, None)
+
+
+def test_undecodable_json_is_dropped_from_the_cache(cache_dir):
+    url = 'https://b.jw-cdn.org/apis/pub-media/GETPUBMEDIALINKS?pub=w'
+    http_cache.store_entry(url, b'{"a":', {})
+    with pytest.raises(ValueError):
+        http_cache.fetch_json(url)
+    assert http_cache.load_entry(url) == (None, None)
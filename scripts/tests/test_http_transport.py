@@ -0,0 +1,219 @@
+import gzip
+import http.client
+import socket
+import struct
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.error import HTTPError, URLError
+
+import pytest
+
+import http_transport
+import resilience
+
+
+class ResetErrorBody(BaseHTTPRequestHandler):
+    """Answers 503 and resets the connection halfway through the error body, `resets` times, then 200"""
+    protocol_version = 'HTTP/1.1'
+    resets = 1
+    served = 0
+
+    def do_GET(self):
+        type(self).served += 1
+        if self.served <= self.resets:
+            self.send_response(503)
+            self.send_header('Content-Length', '1000')
+            self.end_headers()
+            self.wfile.write(b'partial error page')
+            self.wfile.flush()
+            # SO_LINGER 0: close with a RST instead of a FIN
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.connection.close()
+            self.close_connection = True
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def reset_server(serve, monkeypatch):
+    monkeypatch.setattr(resilience, 'next_delay', lambda method, attempt, headers=None: 0.0 if attempt < 3 else None)
+
+    def start(resets):
+        handler = type('Handler', (ResetErrorBody,), {'resets': resets, 'served': 0})
+        return serve(handler), handler
+
+    yield start
+    http_transport.close_all()
+    resilience.reset()
+
+
+def test_reset_error_body_is_retried(reset_server):
+    origin, handler = reset_server(resets=1)
+    assert http_transport.get_bytes(f"{origin}/page") == b'ok'
+    assert handler.served == 2
+
+
+def test_reset_error_body_raises_url_error(reset_server):
+    origin, _ = reset_server(resets=10)
+    with pytest.raises(URLError) as error:
+        http_transport.get_bytes(f"{origin}/page")
+    assert not isinstance(error.value, HTTPError)
+
+
+def test_reset_error_body_during_probe_reopens_the_circuit(reset_server):
+    origin, handler = reset_server(resets=10)
+    breaker = resilience.breaker_for('127.0.0.1')
+    breaker.failures = breaker.threshold
+    breaker.opened_at = time.monotonic() - breaker.cooldown  # Half-open: the next request is the probe
+    with pytest.raises(URLError):
+        http_transport.request('GET', f"{origin}/page", retry=False)
+    assert handler.served == 1
+    assert not breaker._probing
+    assert breaker.state == 'open'
+
+
+class Ok(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+def test_new_connection_resolves_the_host_once(serve, monkeypatch):
+    port = int(serve(Ok).rsplit(':', 1)[1])
+    lookups = []
+    real_getaddrinfo = socket.getaddrinfo
+
+    def counting_getaddrinfo(host, *args, **kwargs):
+        lookups.append(host)
+        return real_getaddrinfo(host, *args, **kwargs)
+
+    monkeypatch.setattr(socket, 'getaddrinfo', counting_getaddrinfo)
+    monkeypatch.setattr(http_transport.metrics, 'ENABLED', True)
+    monkeypatch.setattr(http_transport.metrics, '_requests', [])
+    try:
+        assert http_transport.get_bytes(f"http://localhost:{port}/page") == b'ok'
+    finally:
+        http_transport.close_all()
+    assert lookups == ['localhost']
+    timing, = http_transport.metrics._requests
+    assert timing['dns'] is not None and timing['connect'] is not None
+
+
+class Truncated(BaseHTTPRequestHandler):
+    """Promises a 100-byte body (or a gzip one without a length) and closes after a few bytes"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        if self.path == '/gzip':
+            body = gzip.compress(b'x' * 10000)
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+        else:
+            self.send_header('Content-Length', '100')
+            self.end_headers()
+            self.wfile.write(b'{"a":')
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def transport():
+    yield
+    http_transport.close_all()
+    resilience.reset()
+
+
+@pytest.mark.parametrize('path', ['/short', '/gzip'])
+def test_truncated_body_raises_incomplete_read(serve, transport, path):
+    origin = serve(Truncated)
+    response = http_transport.request('GET', f"{origin}{path}", retry=False)
+    with pytest.raises(http.client.IncompleteRead):
+        response.read()
+    port = int(origin.rsplit(':', 1)[1])
+    assert http_transport.get_pool('http', '127.0.0.1', port)._idle == []
+
+
+def test_exhausted_pool_fails_instead_of_hanging(serve, transport, monkeypatch):
+    origin = serve(Ok)
+    monkeypatch.setitem(http_transport.HOST_LIMITS, '127.0.0.1', 1)
+    abandoned = http_transport.request('GET', f"{origin}/page", retry=False)  # Never read or closed
+    started = time.monotonic()
+    with pytest.raises(URLError, match='connection pool exhausted'):
+        http_transport.request('GET', f"{origin}/page", timeout=0.2, retry=False)
+    assert time.monotonic() - started < 5
+    abandoned.close()
+    assert http_transport.get_bytes(f"{origin}/page") == b'ok'
+
+
+class TruncatedThenOk(BaseHTTPRequestHandler):
+    """Cuts a 200 body short `truncations` times, then sends it whole"""
+    protocol_version = 'HTTP/1.1'
+    truncations = 1
+    served = 0
+
+    def do_GET(self):
+        type(self).served += 1
+        self.send_response(200)
+        self.send_header('Content-Length', '10')
+        self.end_headers()
+        if self.served <= self.truncations:
+            self.wfile.write(b'{"a":')
+            self.close_connection = True
+        else:
+            self.wfile.write(b'{"a": 123}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def truncating_server(serve, monkeypatch):
+    monkeypatch.setattr(resilience, 'next_delay', lambda method, attempt, headers=None: 0.0 if attempt < 3 else None)
+
+    def start(truncations):
+        handler = type('Handler', (TruncatedThenOk,), {'truncations': truncations, 'served': 0})
+        return serve(handler), handler
+
+    yield start
+    http_transport.close_all()
+    resilience.reset()
+
+
+def test_truncated_body_is_retried(truncating_server):
+    origin, handler = truncating_server(truncations=1)
+    assert http_transport.get_json(f"{origin}/data") == {'a': 123}
+    assert handler.served == 2
+
+
+def test_truncated_body_raises_url_error_and_counts_as_failure(truncating_server):
+    origin, handler = truncating_server(truncations=10)
+    with pytest.raises(URLError) as error:
+        http_transport.get_bytes(f"{origin}/data")
+    assert isinstance(error.value.reason, http.client.IncompleteRead)
+    assert handler.served == 3
+    assert resilience.breaker_for('127.0.0.1').failures == 3
+
+
+def test_buffer_limit_drops_the_rest_of_the_body(serve, transport):
+    origin = serve(Ok)
+    response = http_transport.get(f"{origin}/page", buffer=1)
+    assert response.read() == b'o'
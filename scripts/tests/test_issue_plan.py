@@ -0,0 +1,114 @@
+from datetime import date, timedelta
+
+import pytest
+
+import catalog
+import issue_plan
+
+TODAY = date(2025, 11, 12)  # A Wednesday; the current week starts Monday November 10
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = catalog.Catalog(tmp_path / 'catalog.sqlite3')
+    yield store
+    store.close()
+
+
+def _add_weeks(store, pub, issue, first, count):
+    store.upsert_weeks(pub, [{'week_start': (first + timedelta(weeks=n)).isoformat(), 'week': f"week {n}",
+                              'url': f"https://cdn.test/{pub}_E_{issue}_{n:02}.mp3", 'issue': issue}
+                             for n in range(count)])
+
+
+def test_workbook_window_is_bimonthly_in_its_own_months():
+    assert issue_plan.issue_window('mwb', 2, TODAY) == ['202511', '202601']
+    assert issue_plan.issue_window('mwb', 3, date(2025, 12, 31)) == ['202511', '202601', '202603']
+
+
+def test_watchtower_window_lags_two_months_with_one_spill_issue():
+    assert issue_plan.issue_window('w', 2, TODAY) == ['202508', '202509', '202510', '202511']
+    # Across a year boundary
+    assert issue_plan.issue_window('w', 1, date(2026, 1, 7)) == ['202510', '202511', '202512']
+
+
+def test_horizon_clamps_to_the_end_of_a_short_month():
+    mondays = issue_plan.horizon(6, date(2025, 8, 31))
+    assert mondays[0] == date(2025, 8, 25)
+    assert mondays[-1] <= date(2026, 2, 28)
+    assert mondays[-1] + timedelta(weeks=1) > date(2026, 2, 28)
+
+
+def test_workbook_gap_issues_skip_issues_already_in_the_catalog(store):
+    _add_weeks(store, 'mwb', '202511', date(2025, 11, 3), 9)  # Through December 29
+    assert issue_plan.gap_issues('mwb', 2, store=store, today=TODAY) == ['202601']
+
+
+def test_watchtower_gap_issues_include_the_spill_issue(store):
+    _add_weeks(store, 'w', '202509', date(2025, 11, 10), 3)  # Weeks of November 10, 17 and 24
+    # December 1 and 8 are gaps: the October issue, or the September one running over
+    assert issue_plan.gap_issues('w', 1, store=store, today=TODAY) == ['202510']
+    _add_weeks(store, 'w', '202510', date(2025, 12, 1), 2)
+    assert issue_plan.gap_issues('w', 1, store=store, today=TODAY) == []
+
+
+class FakeFetch:
+    """fetch(issue, lang) that answers 404 (noted as unpublished) from first_unpublished on"""
+
+    def __init__(self, first_unpublished, failing=()):
+        self.first_unpublished = first_unpublished
+        self.failing = set(failing)
+        self.asked = []
+
+    def __call__(self, issue, lang):
+        self.asked.append(issue)
+        if issue in self.failing:
+            return None  # A non-404 failure after its retries
+        if issue >= self.first_unpublished:
+            issue_plan.note_unpublished('mwb', issue, lang)
+            return None
+        return {'issue': issue}
+
+
+WINDOW = ['202511', '202601', '202603', '202605', '202607', '202609', '202611']
+
+
+def test_probing_stops_at_the_first_unpublished_batch(store):
+    _add_weeks(store, 'mwb', '202511', date(2025, 11, 3), 9)
+    fetch = FakeFetch('202605')
+    fetched, not_asked = issue_plan.fetch_issues('mwb', fetch, WINDOW, store=store)
+    assert sorted(fetch.asked) == WINDOW[:5]  # PROBE_AHEAD issues at a time past 202511
+    assert not_asked == WINDOW[5:]
+    assert [issue for issue, data in fetched if data] == WINDOW[:3]
+    assert store.unpublished_issues('mwb') == {'202605', '202607'}
+
+
+def test_known_unpublished_issue_is_not_asked_again_within_the_ttl(store, monkeypatch):
+    _add_weeks(store, 'mwb', '202511', date(2025, 11, 3), 9)
+    issue_plan.fetch_issues('mwb', FakeFetch('202605'), WINDOW, store=store)
+    fetch = FakeFetch('202605')
+    _, not_asked = issue_plan.fetch_issues('mwb', fetch, WINDOW, store=store)
+    assert sorted(fetch.asked) == WINDOW[:3]
+    assert not_asked == WINDOW[3:]
+
+    monkeypatch.setattr(issue_plan, 'UNPUBLISHED_TTL', 0)  # 0 = always probe
+    fetch = FakeFetch('202605')
+    issue_plan.fetch_issues('mwb', fetch, WINDOW, store=store)
+    assert '202605' in fetch.asked
+
+
+def test_a_failed_issue_does_not_stop_probing(store):
+    _add_weeks(store, 'mwb', '202511', date(2025, 11, 3), 9)
+    fetch = FakeFetch('202609', failing={'202601'})
+    fetched, not_asked = issue_plan.fetch_issues('mwb', fetch, WINDOW, store=store)
+    assert sorted(fetch.asked) == WINDOW
+    assert not_asked == []
+    assert dict(fetched)['202601'] is None
+    assert store.unpublished_issues('mwb') == {'202609', '202611'}
+
+
+def test_empty_catalog_asks_for_the_whole_window(store):
+    fetch = FakeFetch('202605')
+    _, not_asked = issue_plan.fetch_issues('mwb', fetch, WINDOW, store=store)
+    assert sorted(fetch.asked) == WINDOW
+    assert not_asked == []
@@ -0,0 +1,60 @@
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import http_transport
+import link_check
+
+
+class KeepAliveMP3(BaseHTTPRequestHandler):
+    """Keep-alive MP3 host; HEAD is refused on /nohead/ so the Range GET fallback is used"""
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_HEAD(self):
+        if self.path.startswith('/nohead/'):
+            self.send_response(405)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', '12345')
+        self.end_headers()
+
+    def do_GET(self):
+        self.send_response(206)
+        self.send_header('Content-Range', 'bytes 0-0/12345')
+        self.send_header('Content-Length', '1')
+        self.end_headers()
+        self.wfile.write(b'\xff')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def mp3_host(serve):
+    handler = type('Host', (KeepAliveMP3,), {'connections': 0})
+    yield serve(handler), handler
+    http_transport.close_all()
+
+
+def test_head_probes_reuse_the_connection(mp3_host):
+    origin, handler = mp3_host
+    first = link_check.check_url(f"{origin}/a/mwb_E_202511_01.mp3")
+    second = link_check.check_url(f"{origin}/a/mwb_E_202511_02.mp3")
+    assert (first['status'], first['content_length'], first['method']) == (200, 12345, 'HEAD')
+    assert second['status'] == 200
+    assert handler.connections == 1
+
+
+def test_range_get_probes_reuse_the_connection(mp3_host):
+    origin, handler = mp3_host
+    for number in (1, 2):
+        result = link_check.check_url(f"{origin}/nohead/lfb_E_{number:03}.mp3")
+        assert (result['status'], result['content_length'], result['method']) == (206, 12345, 'GET')
+    assert handler.connections == 1
@@ -0,0 +1,117 @@
+import re
+import struct
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import http_transport
+import mp3_meta
+
+# MPEG-1 Layer III, 128 kbps, 44100 Hz, joint stereo: 417-byte frames, 32 bytes of side info
+FRAME_HEADER = b'\xff\xfb\x90\x64'
+FRAME_LENGTH = 417
+
+
+def _frame(payload=b''):
+    return FRAME_HEADER + payload + bytes(FRAME_LENGTH - 4 - len(payload))
+
+
+def _id3(size, footer=False):
+    synchsafe = bytes((size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b'ID3\x04\x00' + (b'\x10' if footer else b'\x00') + synchsafe + bytes(size)
+
+
+def _xing(frames, audio_bytes, delay, padding):
+    lame = b'LAME3.100' + bytes(12) + bytes([delay >> 4, (delay & 0x0F) << 4 | padding >> 8, padding & 0xFF])
+    # Side info, then the tag with frame count, byte count and quality (no TOC)
+    return bytes(32) + b'Xing' + struct.pack('>IIII', 1 | 2 | 8, frames, audio_bytes, 50) + lame
+
+
+def _vbri(frames, audio_bytes):
+    return bytes(32) + b'VBRI' + struct.pack('>HHHII', 1, 0, 75, audio_bytes, frames)
+
+
+def test_id3_size():
+    assert mp3_meta.id3_size(_frame()) == 0
+    assert mp3_meta.id3_size(_id3(300)) == 310
+    assert mp3_meta.id3_size(_id3(300, footer=True)) == 320
+    assert mp3_meta.id3_size(_id3(200000)[:10]) == 200010  # Only the 10-byte header is needed
+
+
+def test_find_frame_skips_a_sync_pattern_in_tag_bytes():
+    data = _id3(20) + b'\xff\xfb\x90' + _frame() + _frame()
+    offset = mp3_meta.find_frame(data, 10)
+    assert offset == 33
+    with pytest.raises(mp3_meta.Mp3Error):
+        mp3_meta.find_frame(bytes(100), 0)
+
+
+def test_cbr_duration_from_file_size():
+    data = _frame() * 4
+    info = mp3_meta.parse_info(data, mp3_meta.find_frame(data, 0), filesize=FRAME_LENGTH * 1000)
+    assert info == mp3_meta.Mp3Info(26.062, 128, 44100, False, FRAME_LENGTH * 1000)  # 417000 bytes at 16000 B/s
+
+
+def test_cbr_without_file_size_is_an_error():
+    data = _frame() * 2
+    with pytest.raises(mp3_meta.Mp3Error):
+        mp3_meta.parse_info(data, 0)
+
+
+def test_xing_frame_count_minus_lame_delay_and_padding():
+    data = _frame(_xing(frames=1000, audio_bytes=400000, delay=576, padding=1000)) + _frame()
+    info = mp3_meta.parse_info(data, mp3_meta.find_frame(data, 0))
+    duration = (1000 * 1152 - 576 - 1000) / 44100
+    assert info.duration == round(duration, 3)
+    assert info.bitrate == round(400000 * 8 / duration / 1000)
+    assert info.vbr and info.sample_rate == 44100
+
+
+def test_info_tag_is_cbr():
+    data = _frame(_xing(frames=100, audio_bytes=41700, delay=0, padding=0).replace(b'Xing', b'Info')) + _frame()
+    info = mp3_meta.parse_info(data, 0)
+    assert not info.vbr
+    assert info.duration == round(100 * 1152 / 44100, 3)
+
+
+def test_vbri_frame_count():
+    data = _frame(_vbri(frames=2000, audio_bytes=900000)) + _frame()
+    info = mp3_meta.parse_info(data, 0)
+    duration = 2000 * 1152 / 44100
+    assert info.duration == round(duration, 3)
+    assert info.bitrate == round(900000 * 8 / duration / 1000)
+    assert info.vbr
+
+
+class RangeFile(BaseHTTPRequestHandler):
+    """Serves `body` with Range support and records each requested range"""
+    protocol_version = 'HTTP/1.1'
+    body = b''
+    ranges = []
+
+    def do_GET(self):
+        start, end = map(int, re.fullmatch(r'bytes=(\d+)-(\d+)', self.headers['Range']).groups())
+        end = min(end, len(self.body) - 1)
+        self.ranges.append((start, end))
+        self.send_response(206)
+        self.send_header('Content-Range', f"bytes {start}-{end}/{len(self.body)}")
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(self.body[start:end + 1])
+
+    def log_message(self, *args):
+        pass
+
+
+def test_probe_reads_past_an_id3_tag_larger_than_head_bytes(serve):
+    tag = _id3(mp3_meta.HEAD_BYTES + 3000)
+    body = tag + _frame() * 200
+    handler = type('Handler', (RangeFile,), {'body': body, 'ranges': []})
+    try:
+        info = mp3_meta.probe(f"{serve(handler)}/talk.mp3")
+    finally:
+        http_transport.close_all()
+    assert handler.ranges == [(0, mp3_meta.HEAD_BYTES - 1),
+                              (len(tag), len(tag) + mp3_meta.FRAME_BYTES - 1)]
+    assert info.filesize == len(body)
+    assert info.duration == round(200 * FRAME_LENGTH * 8 / 128000, 3)
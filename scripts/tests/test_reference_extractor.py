@@ -0,0 +1,45 @@
+from reference_extractor import BibleSpan, ReferenceStreamParser, parse_html_references
+
+NAV = ''.join(f'<li><a href="/en/{word.lower()}/">{word} Library Publications</a></li>'
+              for word in ('Home', 'Meetings', 'Treasures', 'Field', 'Ministry', 'Living'))
+
+# Shaped like a jw.org workbook week page: navigation, scripts, the two references, a footer
+PAGE = (
+    '<!DOCTYPE html><html><head><title>November 3-9</title>'
+    '<script>var books = "Isaiah 1";</script></head><body>'
+    f'<nav><ul>{NAV}</ul></nav>'
+    '<h1>November 3-9</h1><h2><a href="/en/library/bible/">ISAIAH 58-59</a></h2>'
+    '<p>Song 152 and Prayer | Opening Comments (1 min.)</p>'
+    '<h3>Treasures From God’s Word</h3><p>Bible Reading (4 min.) Isa 58:1-14 (th study 10)</p>'
+    '<h3>Congregation Bible Study</h3>'
+    '<p>(30 min.) lfb lessons 36-37</p>'
+    f'<footer><ul>{NAV}</ul><p>Copyright © 2025 Watch Tower Bible and Tract Society</p></footer>'
+    '</body></html>'
+)
+
+
+def stream(chunks):
+    parser = ReferenceStreamParser()
+    for chunk in chunks[:-1]:
+        if parser.feed_text(chunk):
+            return parser.bible, parser.lessons
+    parser.feed_text(chunks[-1], final=True)
+    return parser.bible, parser.lessons
+
+
+def test_whole_page():
+    assert parse_html_references(PAGE) == (BibleSpan('Isaiah', 58, None, 59, None), [36, 37])
+
+
+def test_every_two_chunk_split_matches_the_whole_page():
+    expected = parse_html_references(PAGE)
+    for cut in range(1, len(PAGE)):
+        assert stream([PAGE[:cut], PAGE[cut:]]) == expected, f"split at {cut}"
+
+
+def test_three_chunk_splits_match_the_whole_page():
+    expected = parse_html_references(PAGE)
+    for first in range(1, len(PAGE), 7):
+        for second in range(first + 1, len(PAGE), 11):
+            chunks = [PAGE[:first], PAGE[first:second], PAGE[second:]]
+            assert stream(chunks) == expected, f"split at {first}, {second}"
@@ -1,46 +1,30 @@
 #!/usr/bin/env python3
 """
 Update Meeting Workbook CSV with new weeks
-Fetches MP3 URLs from jw.org and appends only new weeks to the CSV
+Fetches MP3 URLs from jw.org, upserts them into the catalog and
+re-exports the CSV from it
 """
 
-import csv
-import json
-from datetime import datetime, timedelta
-from pathlib import Path
-from urllib.request import urlopen
+import argparse
 from urllib.parse import urlencode
 from urllib.error import HTTPError
 
+import catalog
+import config
+import hedge
+import http_cache
+import issue_plan
+import metrics
+
 # Configuration
-CSV_FILE = Path(__file__).parent.parent / "meeting_workbook_mp3s.csv"
-BASE_URL = "https://b.jw-cdn.org/apis/pub-media/GETPUBMEDIALINKS"
+PUB = 'mwb'
+CSV_FILE = config.DATA_DIR / "meeting_workbook_mp3s.csv"
+BASE_URL = config.PUB_MEDIA_URL
 MONTHS_TO_FETCH = 6  # Fetch 6 months ahead
+DEFAULT_CONCURRENCY = MONTHS_TO_FETCH  # Fetch every issue in the window at once
 
 
-def normalize_week(week_str):
-    """Normalize week string by replacing different dash types and removing zero-width chars"""
-    # Replace all types of dashes/hyphens with regular dash
-    normalized = week_str.replace('–', '-').replace('—', '-').replace('\u2013', '-').replace('\u2014', '-')
-    # Remove zero-width spaces and other invisible characters
-    normalized = normalized.replace('\u200b', '').replace('\u200c', '').replace('\u200d', '')
-    # Remove regular spaces around dashes for consistency
-    normalized = normalized.replace(' - ', '-').replace(' -', '-').replace('- ', '-')
-    return normalized.strip()
-
-
-def get_existing_weeks(csv_file):
-    """Read existing CSV and return set of normalized week strings"""
-    existing_weeks = set()
-    if csv_file.exists():
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                existing_weeks.add(normalize_week(row['Meeting Week']))
-    return existing_weeks
-
-
-def fetch_workbook_data(issue_code):
+def fetch_workbook_data(issue_code, lang='E'):
     """Fetch MP3 data for a specific issue from jw.org API"""
     params = {
         'issue': issue_code,
@@ -48,17 +32,16 @@ def fetch_workbook_data(issue_code):
         'pub': 'mwb',
         'fileformat': 'MP3',
         'alllangs': '0',
-        'langwritten': 'E',
-        'txtCMSLang': 'E'
+        'langwritten': lang,
+        'txtCMSLang': lang
     }
 
     try:
         url = f"{BASE_URL}?{urlencode(params)}"
-        with urlopen(url, timeout=10) as response:
-            data = response.read().decode('utf-8')
-            return json.loads(data)
+        return http_cache.fetch_json(url, timeout=10)
     except HTTPError as e:
         if e.code == 404:
+            issue_plan.note_unpublished(PUB, issue_code, lang)
             return None  # Issue not yet available
         else:
             print(f"Warning: Got HTTP error {e.code} for issue {issue_code}")
@@ -68,7 +51,8 @@ def fetch_workbook_data(issue_code):
         return None
 
 
-def parse_workbook_data(data):
+@metrics.timed('parse.workbook')
+def parse_workbook_data(data, issue_code=None):
     """Parse JSON response and extract week/URL pairs"""
     weeks = []
     if not data or 'files' not in data:
@@ -87,87 +71,89 @@ def parse_workbook_data(data):
                     # Titles are like "November 3-9" or similar
                     weeks.append({
                         'week': title,
-                        'url': mp3_url
+                        'url': mp3_url,
+                        'week_start': catalog.week_start_for(title, issue_code),
+                        'issue': issue_code,
+                        **catalog.media_fields(item),
                     })
 
     return weeks
 
 
-def generate_issue_codes(months_ahead):
-    """Generate issue codes for current month and months ahead"""
-    issue_codes = []
-    today = datetime.now()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Update Meeting Workbook CSV with new weeks")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum number of issues fetched in parallel (1 = sequential); the adaptive limit may use fewer")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate lookup when one is slower than the observed p95")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Fetch every issue in the window, not only those that can fill a gap")
+    metrics.add_arguments(parser)
+    return parser.parse_args(argv)
 
-    for i in range(months_ahead):
-        date = today + timedelta(days=30 * i)
-        # Issue code format: YYYYMM (e.g., 202511 for November 2025)
-        issue_code = date.strftime('%Y%m')
-        if issue_code not in issue_codes:
-            issue_codes.append(issue_code)
 
-    return issue_codes
+def run(concurrency=DEFAULT_CONCURRENCY, refresh=False):
+    """Update the catalog and CSV and return every week row, by date
 
-
-def update_csv(new_weeks):
-    """Append new weeks to CSV file"""
-    if not new_weeks:
-        print("No new weeks to add")
-        return
-
-    # Ensure parent directory exists
-    CSV_FILE.parent.mkdir(parents=True, exist_ok=True)
-
-    # If CSV doesn't exist, create it with header
-    if not CSV_FILE.exists():
-        with open(CSV_FILE, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Meeting Week', 'MP3 URL'])
-
-    # Append new weeks
-    with open(CSV_FILE, 'a', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        for week_data in new_weeks:
-            writer.writerow([week_data['week'], week_data['url']])
-
-    print(f"Added {len(new_weeks)} new week(s) to {CSV_FILE}")
-
-
-def main():
+    Only issues that can fill a missing week are fetched; refresh=True
+    fetches every issue in the window, picking up changed URLs too.
+    """
     print("Updating Meeting Workbook CSV...")
 
     # Get existing weeks
-    existing_weeks = get_existing_weeks(CSV_FILE)
-    print(f"Found {len(existing_weeks)} existing weeks in CSV")
+    store = catalog.get_catalog()
+    existing_weeks = store.week_starts(PUB)
+    print(f"Found {len(existing_weeks)} existing weeks in the catalog")
+
+    # Only the issues that can fill a gap in the next MONTHS_TO_FETCH months (all of them with refresh)
+    issue_codes = issue_plan.planned_issues(PUB, MONTHS_TO_FETCH, store=store, refresh=refresh)
+    if not issue_codes:
+        print(f"No gaps in the next {MONTHS_TO_FETCH} months that a new issue could fill")
+    fetched, unpublished = issue_plan.fetch_issues(PUB, fetch_workbook_data, issue_codes,
+                                                   concurrency=concurrency, store=store)
+    if fetched:
+        print(f"Checked {len(fetched)} issue codes: {', '.join(issue for issue, _ in fetched)}")
+    if unpublished:
+        print(f"Not published yet, not checked: {', '.join(unpublished)}")
 
-    # Generate issue codes to check
-    issue_codes = generate_issue_codes(MONTHS_TO_FETCH)
-    print(f"Checking {len(issue_codes)} issue codes: {', '.join(issue_codes)}")
-
-    # Fetch data for all issues
     all_weeks = []
-    for issue_code in issue_codes:
-        print(f"Fetching issue {issue_code}...", end=' ')
-        data = fetch_workbook_data(issue_code)
+    for issue_code, data in fetched:
+        print(f"Issue {issue_code}:", end=" ")
         if data:
-            weeks = parse_workbook_data(data)
+            weeks = parse_workbook_data(data, issue_code)
             all_weeks.extend(weeks)
             print(f"Found {len(weeks)} weeks")
         else:
             print("Not available")
 
-    # Filter out existing weeks (compare normalized versions)
-    new_weeks = [w for w in all_weeks if normalize_week(w['week']) not in existing_weeks]
+    unparsed = [w for w in all_weeks if not w['week_start']]
+    for week_data in unparsed:
+        print(f"Warning: could not work out the start date of {week_data['week']!r}")
+
+    # Filter out existing weeks (compared by start date)
+    new_weeks = [w for w in all_weeks if w['week_start'] and w['week_start'] not in existing_weeks]
 
     if new_weeks:
         print(f"\nNew weeks found:")
         for week_data in new_weeks:
             print(f"  - {week_data['week']}")
-
-        # Update CSV
-        update_csv(new_weeks)
     else:
-        print("\nNo new weeks found. CSV is up to date.")
+        print("\nNo new weeks found. Catalog is up to date.")
+
+    # Upsert everything fetched so URL/size changes to known weeks are picked up too (see refresh)
+    store.upsert_weeks(PUB, all_weeks)
+    if store.export_csv(PUB, CSV_FILE):
+        print(f"Updated {CSV_FILE}")
+
+    return store.week_rows(PUB)
+
 
+def main(argv=None):
+    args = parse_args(argv)
+    if args.hedge:
+        hedge.enable()
+    metrics.configure(args)
+    metrics.run_stage('workbook', run, args.concurrency, args.refresh)
     print("\nDone!")
 
 
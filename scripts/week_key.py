@@ -0,0 +1,180 @@
+"""
+Canonical week keys for meeting and study week labels
+A WeekKey is (start date, end date, publication): the one value every script
+joins and dedupes on. Labels such as "November 3-9", "December 29–January 4"
+or "January 5-11, 2026" are normalized with a single str.translate pass
+(zero-width characters dropped, dashes unified, separators spaced out),
+split into tokens, and parsed once each: the parse is memoized, so bulk
+parsing costs one dictionary lookup per repeated label.
+
+Labels carry no year of their own. It comes from the issue code the week was
+published in (given directly or read from an MP3 URL such as
+mwb_E_202511_01.mp3), never from the rows around it, so rows can be parsed
+in any order or in parallel. Rows without an issue (subsections) take the
+key of the same label among rows that have one.
+"""
+
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+          'august', 'september', 'october', 'november', 'december']
+MONTH_NUMBERS = {**{name[:3]: number for number, name in enumerate(MONTHS, start=1)},
+                 **{name: number for number, name in enumerate(MONTHS, start=1)}, 'sept': 9}
+
+# One pass: drop zero-width characters, unify dashes and spaces, and space out separators
+_NORMALIZE = str.maketrans({
+    '\u200b': None, '\u200c': None, '\u200d': None, '\ufeff': None,
+    '\xa0': ' ', '\u2009': ' ', '\u202f': ' ',
+    '\u2013': '-', '\u2014': '-', '\u2012': '-', '\u2212': '-',
+})
+_TOKENIZE = str.maketrans({'-': ' - ', ',': ' , ', '.': ' '})
+
+# The issue code in a pub-media file name: mwb_E_202511_01.mp3, w_E_202509_03.mp3
+_ISSUE_IN_URL = re.compile(r'_(\d{6})(?:_|\.)')
+
+LabelParts = namedtuple('LabelParts', ['start_month', 'start_day', 'end_month', 'end_day', 'year'])
+
+
+class WeekKey(namedtuple('WeekKey', ['start', 'end', 'pub'])):
+    """A week of a publication: start and end dates (datetime.date) and pub code"""
+
+    __slots__ = ()
+
+    @property
+    def week_start(self):
+        """ISO start date, as stored in the catalog"""
+        return self.start.isoformat()
+
+    def __str__(self):
+        return f"{self.pub}:{self.week_start}"
+
+
+def normalize(label):
+    """A week label with invisible characters removed, dashes unified and whitespace collapsed"""
+    return ' '.join(label.translate(_NORMALIZE).split())
+
+
+@lru_cache(maxsize=8192)
+def parse_label(label):
+    """LabelParts for a week label (year None unless the label has one); raises ValueError"""
+    tokens = label.translate(_NORMALIZE).translate(_TOKENIZE).split()
+    try:
+        start_month = MONTH_NUMBERS[tokens[0].lower()]
+        start_day = int(tokens[1])
+        position = 2
+        year = None
+        if tokens[position:position + 1] == [',']:
+            year = int(tokens[position + 1])
+            position += 2
+        end_month, end_day = start_month, None
+        if tokens[position:position + 1] == ['-']:
+            position += 1
+            if tokens[position].lower() in MONTH_NUMBERS:
+                end_month = MONTH_NUMBERS[tokens[position].lower()]
+                position += 1
+            end_day = int(tokens[position])
+            position += 1
+        if year is None and tokens[position:position + 1] == [',']:
+            year = int(tokens[position + 1])
+            if end_month < start_month:
+                year -= 1  # "December 29-January 4, 2026" starts in 2025
+    except (IndexError, KeyError, ValueError):
+        raise ValueError(f"not a week label: {label!r}") from None
+    return LabelParts(start_month, start_day, end_month, end_day, year)
+
+
+def issue_from_url(url):
+    """The YYYYMM issue code in a pub-media MP3 URL, or None"""
+    match = _ISSUE_IN_URL.search(url or '')
+    return match.group(1) if match else None
+
+
+def year_for(month, issue):
+    """Year of a week starting in month, published in issue (YYYYMM)
+
+    An issue's weeks fall in the twelve months from its own month, so a month
+    before the issue month is in the following year.
+    """
+    year, issue_month = int(issue[:4]), int(issue[4:6])
+    return year + 1 if month < issue_month else year
+
+
+def nearest_year(month, day, around):
+    """Year putting month/day closest to the date `around`"""
+    candidates = []
+    for year in (around.year - 1, around.year, around.year + 1):
+        try:
+            candidates.append((abs((date(year, month, day) - around).days), year))
+        except ValueError:
+            continue
+    if not candidates:
+        raise ValueError(f"no valid date for {month}/{day}")
+    return min(candidates)[1]
+
+
+def key_from_parts(parts, year, pub='mwb'):
+    start = date(year, parts.start_month, parts.start_day)
+    if parts.end_day is None:
+        return WeekKey(start, start + timedelta(days=6), pub)
+    end_year = year + 1 if parts.end_month < parts.start_month else year
+    return WeekKey(start, date(end_year, parts.end_month, parts.end_day), pub)
+
+
+def key_for(label, pub='mwb', issue=None, around=None):
+    """WeekKey for a label; the year comes from the label, the issue code, or the date `around`
+
+    Raises ValueError if the label can't be parsed or nothing gives its year.
+    """
+    parts = parse_label(label)
+    if parts.year is not None:
+        year = parts.year
+    elif issue:
+        year = year_for(parts.start_month, issue)
+    elif around is not None:
+        year = nearest_year(parts.start_month, parts.start_day, around)
+    else:
+        raise ValueError(f"no year for {label!r}: no issue code")
+    try:
+        return key_from_parts(parts, year, pub)
+    except ValueError as e:
+        raise ValueError(f"not a valid week: {label!r} ({e})") from None
+
+
+def resolve(labels, pub='mwb', issues=None, known=None):
+    """WeekKeys for many labels at once (None where one can't be parsed), independent of row order
+
+    issues[i] is row i's issue code. Rows without one take the key of the same
+    label in `known` (normalized label -> WeekKey, e.g. the workbook's weeks)
+    or among the rows that have one, and otherwise the year nearest the middle
+    of the rows already resolved. Each distinct label is parsed once.
+    """
+    labels = list(labels)
+    issues = list(issues) if issues is not None else [None] * len(labels)
+    keys = [None] * len(labels)
+    by_label = dict(known or {})
+    pending = []
+    for index, (label, issue) in enumerate(zip(labels, issues)):
+        if not issue:
+            pending.append(index)
+            continue
+        try:
+            keys[index] = key_for(label, pub, issue)
+        except ValueError:
+            continue
+        by_label.setdefault(normalize(label), keys[index])
+
+    resolved = sorted(key.start for key in keys if key is not None) or sorted(
+        key.start for key in by_label.values())
+    around = resolved[len(resolved) // 2] if resolved else date.today()
+    for index in pending:
+        label = labels[index]
+        match = by_label.get(normalize(label))
+        try:
+            keys[index] = (match._replace(pub=pub) if match is not None
+                           else key_for(label, pub, around=around))
+        except ValueError:
+            continue
+    return keys